@@ -1,7 +1,13 @@
+from datetime import datetime
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Avg, Count, Sum, F, Q
+from django.db.models import Count, Sum, F, Q, Value
+from django.db.models.lookups import GreaterThanOrEqual
+from django.core.cache import cache
+
+from core.cache import ContentVersion
 
 
 class UserManager(BaseUserManager):
@@ -110,18 +116,21 @@ class User(AbstractUser):
             end_date__gt=timezone.now()
         ).first()
 
+    def get_entitlements(self):
+        """Get the user's entitlements, cached per user."""
+        from subscription.entitlements import Entitlements
+
+        if not hasattr(self, '_entitlements'):
+            self._entitlements = Entitlements.for_user(self)
+        return self._entitlements
+
     def has_access_to_curriculum(self, curriculum):
         """Check if the user has access to a specific curriculum."""
         # Staff and superusers have access to everything
         if self.is_staff or self.is_superuser:
             return True
 
-        # Get the user's active subscription
-        subscription = self.get_active_subscription()
-        if not subscription:
-            return False
-
-        return subscription.has_access_to_curriculum(curriculum)
+        return self.get_entitlements().has_access_to_curriculum(curriculum.id)
 
     def has_access_to_class_level(self, curriculum, class_level):
         """Check if the user has access to a specific class level within a curriculum."""
@@ -129,12 +138,7 @@ class User(AbstractUser):
         if self.is_staff or self.is_superuser:
             return True
 
-        # Get the user's active subscription
-        subscription = self.get_active_subscription()
-        if not subscription:
-            return False
-
-        return subscription.has_access_to_class_level(curriculum, class_level)
+        return self.get_entitlements().has_access_to_class_level(curriculum.id, class_level.id)
 
     def has_access_to_content(self, note):
         """Check if the user has access to a specific note."""
@@ -142,25 +146,59 @@ class User(AbstractUser):
         if self.is_staff or self.is_superuser:
             return True
 
-        # Get the user's active subscription
-        subscription = self.get_active_subscription()
-        if not subscription:
-            return False
+        subject = note.topic.subject
+        return self.get_entitlements().has_access_to_class_level(subject.curriculum_id, subject.class_level_id)
+
+    QUIZ_STATS_CACHE_PREFIX = 'accounts:quiz_stats'
+    QUIZ_STATS_CACHE_TIMEOUT = 60 * 60 * 24
+
+    @classmethod
+    def quiz_stats_cache_key(cls, user_id):
+        # Quizzes are catalogue content, so a passing score change retires every entry
+        return f"{cls.QUIZ_STATS_CACHE_PREFIX}:{ContentVersion.get()}:{user_id}"
 
-        return subscription.has_access_to_content(note)
+    @classmethod
+    def invalidate_quiz_stats(cls, user_id):
+        """
+        Drop the cached quiz statistics for a user.
+
+        Args:
+            user_id: The ID of the user
+        """
+        cache.delete(cls.quiz_stats_cache_key(user_id))
 
     def get_quiz_stats(self):
-        """Get the user's quiz statistics."""
+        """Get the user's quiz statistics, cached until one of their attempts completes."""
+        key = self.quiz_stats_cache_key(self.pk)
+        stats = cache.get(key)
+        if stats is None:
+            stats = self.build_quiz_stats()
+            cache.set(key, stats, self.QUIZ_STATS_CACHE_TIMEOUT)
+        return stats
+
+    def build_quiz_stats(self):
+        """Compute the user's quiz statistics with one grouped query over completed attempts."""
         from quiz.models import QuizAttempt
+        from curriculum.models import Subject
 
-        # Get all completed quiz attempts
-        completed_attempts = QuizAttempt.objects.filter(
-            user=self,
-            status='completed'
+        # An attempt passes when its exact percentage reaches the quiz's passing score
+        passed = Q(
+            GreaterThanOrEqual(F('correct_answers') * 100, F('total_questions') * F('quiz__passing_score')),
+            total_questions__gt=0
         )
 
-        # Calculate statistics
-        total_attempts = completed_attempts.count()
+        rows = list(QuizAttempt.objects.filter(
+            user=self,
+            status='completed'
+        ).values('quiz__subject_id').annotate(
+            attempts=Count('id'),
+            passed=Count('id', filter=passed),
+            score_total=Sum('score'),
+            questions=Sum('total_questions'),
+            correct=Sum('correct_answers')
+        ).order_by())
+
+        total_attempts = sum(row['attempts'] for row in rows)
         if total_attempts == 0:
             return {
                 'total_attempts': 0,
@@ -171,94 +209,61 @@ class User(AbstractUser):
                 'subjects': [],
             }
 
-        average_score = completed_attempts.aggregate(Avg('score'))['score__avg'] or 0
-        total_questions = completed_attempts.aggregate(Sum('total_questions'))['total_questions__sum'] or 0
-        correct_answers = completed_attempts.aggregate(Sum('correct_answers'))['correct_answers__sum'] or 0
-
-        # Calculate passed attempts by comparing score to passing score for each attempt
-        passed_attempts = 0
-        for attempt in completed_attempts:
-            if attempt.score_percentage >= attempt.quiz.passing_score:
-                passed_attempts += 1
-
-        pass_rate = (passed_attempts / total_attempts) * 100 if total_attempts > 0 else 0
-
-        # Get subject-specific statistics
-        subject_stats = []
-        from curriculum.models import Subject
-        from quiz.models import Quiz
-
-        # Get all subjects that have quizzes attempted by this user
-        subject_ids = set()
-        for attempt in completed_attempts:
-            if hasattr(attempt.quiz, 'subject') and attempt.quiz.subject:
-                subject_ids.add(attempt.quiz.subject.id)
-
-        # Get the actual subject objects
-        subjects = Subject.objects.filter(id__in=subject_ids)
-
-        for subject in subjects:
-            # Get attempts for quizzes in this subject
-            subject_attempts = completed_attempts.filter(quiz__subject=subject)
-
-            if subject_attempts.count() > 0:
-                # Calculate pass rate manually
-                passed_subject_attempts = 0
-                for attempt in subject_attempts:
-                    if attempt.score_percentage >= attempt.quiz.passing_score:
-                        passed_subject_attempts += 1
-
-                pass_rate = (passed_subject_attempts / subject_attempts.count()) * 100 if subject_attempts.count() > 0 else 0
-
-                subject_stats.append({
-                    'subject': subject,
-                    'attempts': subject_attempts.count(),
-                    'average_score': subject_attempts.aggregate(Avg('score'))['score__avg'] or 0,
-                    'pass_rate': pass_rate,
-                })
+        subjects = Subject.objects.in_bulk([row['quiz__subject_id'] for row in rows])
+        subject_stats = [
+            {
+                'subject': subjects[row['quiz__subject_id']],
+                'attempts': row['attempts'],
+                'average_score': row['score_total'] / row['attempts'],
+                'pass_rate': (row['passed'] / row['attempts']) * 100,
+            }
+            for row in rows
+            if row['quiz__subject_id'] in subjects
+        ]
+        subject_stats.sort(key=lambda stat: stat['subject'].name)
 
         return {
             'total_attempts': total_attempts,
-            'average_score': average_score,
-            'total_questions': total_questions,
-            'correct_answers': correct_answers,
-            'pass_rate': pass_rate,
+            'average_score': sum(row['score_total'] for row in rows) / total_attempts,
+            'total_questions': sum(row['questions'] for row in rows),
+            'correct_answers': sum(row['correct'] for row in rows),
+            'pass_rate': (sum(row['passed'] for row in rows) / total_attempts) * 100,
             'subjects': subject_stats,
         }
 
     def get_study_progress(self):
-        """Get the user's study progress."""
-        from curriculum.models import Note, NoteCompletion, Topic
+        """Get the user's study progress from cached note totals and their grouped completions."""
+        from curriculum.cache import CurriculumTree, NoteTotals
+        from curriculum.models import NoteCompletion
 
-        # Get all topics with notes
-        topics_with_notes = Topic.objects.filter(notes__isnull=False).distinct()
+        note_totals = NoteTotals.get()
+        total_notes = sum(total for _, total in note_totals)
 
-        # Calculate overall progress
-        total_notes = Note.objects.filter(is_active=True).count()
-        completed_notes = NoteCompletion.objects.filter(user=self).count()
+        completed_by_topic = dict(NoteCompletion.objects.filter(
+            user=self
+        ).values('note__topic_id').annotate(
+            completed=Count('id')
+        ).order_by().values_list('note__topic_id', 'completed'))
+        completed_notes = sum(completed_by_topic.values())
         overall_progress = (completed_notes / total_notes) * 100 if total_notes > 0 else 0
 
-        # Calculate topic-specific progress
+        # Topics come from the in-memory catalogue tree, so only active topics are listed
+        tree = CurriculumTree.get()
         topic_progress = []
 
-        for topic in topics_with_notes:
-            topic_notes = Note.objects.filter(topic=topic, is_active=True)
-            topic_note_count = topic_notes.count()
-
-            if topic_note_count == 0:
+        for topic_id, topic_note_count in note_totals:
+            topic = tree.get_topic_by_id(topic_id)
+            if topic is None:
                 continue
 
-            completed_topic_notes = NoteCompletion.objects.filter(
-                user=self,
-                note__topic=topic
-            ).count()
+            completed_topic_notes = completed_by_topic.get(topic_id, 0)
 
             topic_progress.append({
                 'topic': topic,
                 'subject': topic.subject,
                 'total_notes': topic_note_count,
                 'completed_notes': completed_topic_notes,
-                'progress_percentage': (completed_topic_notes / topic_note_count) * 100 if topic_note_count > 0 else 0,
+                'progress_percentage': (completed_topic_notes / topic_note_count) * 100,
             })
 
         return {
@@ -268,43 +273,89 @@ class User(AbstractUser):
             'topics': topic_progress,
         }
 
-    def get_recent_activity(self, limit=10):
-        """Get the user's recent activity."""
+    def get_recent_activity(self, limit=10, cursor=None):
+        """
+        Get one page of the user's activity feed, newest first.
+
+        Quiz attempts and note completions are merged by one UNION query and
+        paged by keyset, so a page costs the same however long the history is.
+
+        Args:
+            limit: Maximum number of entries to return
+            cursor: The 'cursor' of the last entry of the previous page, or None
+                for the first page
+
+        Returns:
+            A list of dicts with 'type', 'date', 'object', 'details' and 'cursor'
+        """
         from quiz.models import QuizAttempt
         from curriculum.models import NoteCompletion
 
-        # Get recent quiz attempts
-        recent_quizzes = QuizAttempt.objects.filter(
-            user=self
-        ).order_by('-started_at')[:limit]
+        feeds = {
+            'quiz': (QuizAttempt.objects.filter(user=self), 'started_at'),
+            'note': (NoteCompletion.objects.filter(user=self), 'created_at'),
+        }
 
-        # Get recent note completions
-        recent_notes = NoteCompletion.objects.filter(
-            user=self
-        ).order_by('-created_at')[:limit]
+        before = self.parse_activity_cursor(cursor) if cursor else None
+        branches = []
+        for kind, (queryset, date_field) in feeds.items():
+            if before is not None:
+                queryset = queryset.filter(self._activity_after(kind, date_field, *before))
+            branches.append(queryset.annotate(
+                kind=Value(kind, output_field=models.CharField()),
+                activity_date=F(date_field)
+            ).values_list('kind', 'id', 'activity_date').order_by())
+
+        # Ties on the date are broken by kind, then by ID, to keep the order total
+        rows = list(branches[0].union(*branches[1:], all=True).order_by(
+            '-activity_date', '-kind', '-id'
+        )[:limit])
+
+        ids = {kind: [pk for row_kind, pk, _ in rows if row_kind == kind] for kind in feeds}
+        objects = {
+            'quiz': QuizAttempt.objects.select_related('quiz').in_bulk(ids['quiz']) if ids['quiz'] else {},
+            'note': NoteCompletion.objects.select_related('note').in_bulk(ids['note']) if ids['note'] else {},
+        }
 
-        # Combine and sort by date
         activity = []
-
-        for quiz in recent_quizzes:
-            activity.append({
-                'type': 'quiz',
-                'date': quiz.started_at,
-                'object': quiz,
-                'details': f"Took quiz: {quiz.quiz.title} - Score: {quiz.score}%"
-            })
-
-        for note in recent_notes:
+        for kind, pk, date in rows:
+            obj = objects[kind].get(pk)
+            if obj is None:
+                continue
+            if kind == 'quiz':
+                details = f"Took quiz: {obj.quiz.title} - Score: {obj.score}%"
+            else:
+                details = f"Completed note: {obj.note.title}"
             activity.append({
-                'type': 'note',
-                'date': note.created_at,
-                'object': note,
-                'details': f"Completed note: {note.note.title}"
+                'type': kind,
+                'date': date,
+                'object': obj,
+                'details': details,
+                'cursor': f"{date.isoformat()}|{kind}|{pk}",
             })
-
-        # Sort by date (newest first) and limit
-        activity.sort(key=lambda x: x['date'], reverse=True)
-        return activity[:limit]
+        return activity
+
+    @staticmethod
+    def parse_activity_cursor(cursor):
+        """
+        Split an activity feed cursor into its date, kind and ID.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        date, kind, pk = cursor.split('|')
+        if kind not in ('quiz', 'note'):
+            raise ValueError(f"Unknown activity kind: {kind}")
+        return datetime.fromisoformat(date), kind, int(pk)
+
+    @staticmethod
+    def _activity_after(kind, date_field, date, cursor_kind, cursor_pk):
+        # Entries that sort after the cursor, for a feed whose kind is constant
+        if kind < cursor_kind:
+            return Q(**{f'{date_field}__lte': date})
+        if kind == cursor_kind:
+            return Q(**{f'{date_field}__lt': date}) | Q(**{date_field: date, 'id__lt': cursor_pk})
+        return Q(**{f'{date_field}__lt': date})
 
 
 class UserGroup(models.Model):
@@ -7,8 +7,8 @@ from django.db.models import Count, Sum, Q
 from django.http import JsonResponse
 
 from .models import User, UserGroup
-from curriculum.models import Curriculum, ClassLevel, Subject, Topic
-from core.models import UserProgress, UserAchievement
+from curriculum.models import Curriculum, ClassLevel, Subject, Topic, Note
+from core.models import UserProgressRollup, UserAchievement
 from quiz.models import QuizAttempt
 
 
@@ -194,34 +194,17 @@ def progress_overview(request):
     """View for showing progress overview."""
     user = request.user
 
-    # Get user's progress records
-    progress_records = UserProgress.objects.filter(user=user)
-
-    # Group progress by subject
-    subjects = Subject.objects.filter(
-        id__in=progress_records.values_list('subject', flat=True)
-    ).distinct()
-
-    subject_progress = []
-    for subject in subjects:
-        # Calculate overall completion percentage for this subject
-        subject_records = progress_records.filter(subject=subject)
-        if subject_records.exists():
-            avg_completion = subject_records.aggregate(avg=Sum('completion_percentage') / Count('id'))['avg'] or 0
-            subject_progress.append({
-                'subject': subject,
-                'completion_percentage': round(avg_completion),
-                'last_activity': subject_records.order_by('-last_activity').first().last_activity,
-            })
-
-    # Sort by last activity
-    subject_progress.sort(key=lambda x: x['last_activity'], reverse=True)
+    # Get the subject rollups, most recent activity first
+    subject_progress = UserProgressRollup.objects.filter(
+        user=user,
+        level='subject'
+    ).select_related('subject__curriculum', 'subject__class_level').order_by('-last_activity')
 
     # Get recent quiz attempts
     recent_quizzes = QuizAttempt.objects.filter(user=user).order_by('-started_at')[:5]
 
     context = {
-        'subject_progress': subject_progress,
+        'subject_progress': list(subject_progress),
         'recent_quizzes': recent_quizzes,
     }
     return render(request, 'accounts/progress_overview.html', context)
@@ -231,30 +214,14 @@ def progress_overview(request):
 def subject_progress(request, subject_slug):
     """View for showing progress for a specific subject."""
     user = request.user
-    subject = get_object_or_404(Subject, slug=subject_slug)
-
-    # Get progress records for this subject
-    progress_records = UserProgress.objects.filter(user=user, subject=subject)
-
-    # Group progress by topic
-    topics = Topic.objects.filter(
-        id__in=progress_records.values_list('topic', flat=True)
-    ).distinct()
-
-    topic_progress = []
-    for topic in topics:
-        # Get progress record for this topic
-        topic_record = progress_records.filter(topic=topic, subtopic=None).first()
-        if topic_record:
-            topic_progress.append({
-                'topic': topic,
-                'completion_percentage': topic_record.completion_percentage,
-                'last_activity': topic_record.last_activity,
-                'notes_viewed': topic_record.notes_viewed.count(),
-            })
-
-    # Sort by last activity
-    topic_progress.sort(key=lambda x: x['last_activity'], reverse=True)
+    subject = get_object_or_404(Subject.objects.select_related('curriculum', 'class_level'), slug=subject_slug)
+
+    # Get the topic rollups for this subject, most recent activity first
+    topic_progress = UserProgressRollup.objects.filter(
+        user=user,
+        subject=subject,
+        level='topic'
+    ).select_related('topic').order_by('-last_activity')
 
     # Get quiz attempts for this subject
     quiz_attempts = QuizAttempt.objects.filter(
@@ -264,7 +231,7 @@ def subject_progress(request, subject_slug):
 
     context = {
         'subject': subject,
-        'topic_progress': topic_progress,
+        'topic_progress': list(topic_progress),
         'quiz_attempts': quiz_attempts,
     }
     return render(request, 'accounts/subject_progress.html', context)
@@ -274,31 +241,33 @@ def subject_progress(request, subject_slug):
 def topic_progress(request, topic_slug):
     """View for showing progress for a specific topic."""
     user = request.user
-    topic = get_object_or_404(Topic, slug=topic_slug)
-
-    # Get progress record for this topic
-    topic_progress = UserProgress.objects.filter(user=user, topic=topic, subtopic=None).first()
+    topic = get_object_or_404(
+        Topic.objects.select_related('subject__curriculum', 'subject__class_level'),
+        slug=topic_slug
+    )
 
-    # Get progress records for subtopics
+    # Get the rollups for this topic and its subtopics in one query
+    topic_progress = None
     subtopic_progress = []
-    if topic.subtopics.exists():
-        for subtopic in topic.subtopics.filter(is_active=True):
-            progress = UserProgress.objects.filter(user=user, topic=topic, subtopic=subtopic).first()
-            if progress:
-                subtopic_progress.append({
-                    'subtopic': subtopic,
-                    'completion_percentage': progress.completion_percentage,
-                    'last_activity': progress.last_activity,
-                    'notes_viewed': progress.notes_viewed.count(),
-                })
-
-    # Sort by last activity
-    subtopic_progress.sort(key=lambda x: x['last_activity'], reverse=True)
+    rollups = UserProgressRollup.objects.filter(
+        user=user,
+        topic=topic,
+        level__in=['topic', 'subtopic']
+    ).select_related('subtopic').order_by('-last_activity')
+    for rollup in rollups:
+        if rollup.level == 'topic':
+            topic_progress = rollup
+        elif rollup.subtopic.is_active:
+            subtopic_progress.append(rollup)
 
     # Get notes viewed for this topic
     notes_viewed = []
     if topic_progress:
-        notes_viewed = topic_progress.notes_viewed.all()
+        notes_viewed = Note.objects.filter(
+            viewed_by__user=user,
+            viewed_by__topic=topic,
+            viewed_by__subtopic=None
+        )
 
     # Get quiz attempts for this topic
     quiz_attempts = QuizAttempt.objects.filter(
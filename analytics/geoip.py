@@ -0,0 +1,242 @@
+"""
+Offline IP geolocation for the analytics app.
+This module resolves IP addresses against a local database file, so looking
+up a visitor's location never goes over the network.
+"""
+
+import csv
+import ipaddress
+import logging
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class GeoIPResolver:
+    """Interface of an IP geolocation resolver."""
+
+    def lookup(self, ip):
+        """
+        Find the location of an IP address.
+
+        Args:
+            ip: An ipaddress.IPv4Address or IPv6Address
+
+        Returns:
+            A dict with 'country', 'country_code', 'city' and 'region', or
+            None when the address is not in the database
+        """
+        raise NotImplementedError
+
+
+class NullResolver(GeoIPResolver):
+    """Resolver used when no database is configured; knows no address."""
+
+    def lookup(self, ip):
+        return None
+
+
+class PackedIntegers:
+    """
+    Sequence of unsigned integers of a fixed byte width, packed in one buffer.
+
+    Holds the 128-bit IPv6 range bounds, which an array cannot store,
+    without an int object per value; supports the indexing bisect needs.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self._buffer = bytearray()
+
+    def append(self, value):
+        self._buffer += value.to_bytes(self.width, 'big')
+
+    def __len__(self):
+        return len(self._buffer) // self.width
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError('PackedIntegers index out of range')
+        start = index * self.width
+        return int.from_bytes(self._buffer[start:start + self.width], 'big')
+
+
+class CSVRangeResolver(GeoIPResolver):
+    """
+    Resolver reading a CSV file of IP ranges through a memory map.
+
+    Each line holds start, end, country_code, country, region and city, in
+    the column order of the IP2Location LITE files; fields may be quoted.
+    The start and end of a range are IP addresses or their integer values,
+    and lines whose bounds are neither, such as a header, are skipped.
+
+    Loading keeps only the sorted range bounds and the byte offset of each
+    line in memory, in typed arrays for IPv4 and packed buffers for IPv6;
+    a lookup is a binary search over the bounds, and only the matching line
+    is read back from the mapped file.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as database:
+            # An empty file cannot be mapped
+            if os.fstat(database.fileno()).st_size:
+                self._data = mmap.mmap(database.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._data = b''
+
+        # Per IP version, the starts, ends and line offsets of the ranges
+        self._tables = {version: self._empty_table(version) for version in (4, 6)}
+        offset = 0
+        lines = 0
+        while offset < len(self._data):
+            line_end = self._line_end(offset)
+            fields = self.read_fields(offset, line_end)
+            lines += any(fields)
+            try:
+                start, end = self.parse_ip(fields[0]), self.parse_ip(fields[1])
+            except ValueError:
+                pass
+            else:
+                if start.version == end.version:
+                    self._append(self._tables[start.version], int(start), int(end), offset)
+            offset = line_end + 1
+
+        if lines and not any(len(starts) for starts, _, _ in self._tables.values()):
+            logger.warning("GeoIP database %s has no readable IP ranges", path)
+
+        # Published files are sorted by range start, so only an unsorted one is copied
+        for version, table in self._tables.items():
+            starts = table[0]
+            if any(starts[index] > starts[index + 1] for index in range(len(starts) - 1)):
+                sorted_table = self._empty_table(version)
+                for index in sorted(range(len(starts)), key=starts.__getitem__):
+                    self._append(sorted_table, *(column[index] for column in table))
+                self._tables[version] = sorted_table
+
+    @staticmethod
+    def _empty_table(version):
+        # array('L') holds at least 32 bits, enough for IPv4; IPv6 needs 128
+        if version == 4:
+            return array('L'), array('L'), array('Q')
+        return PackedIntegers(16), PackedIntegers(16), array('Q')
+
+    @staticmethod
+    def _append(table, start, end, offset):
+        starts, ends, offsets = table
+        starts.append(start)
+        ends.append(end)
+        offsets.append(offset)
+
+    def _line_end(self, offset):
+        line_end = self._data.find(b'\n', offset)
+        return len(self._data) if line_end == -1 else line_end
+
+    def read_fields(self, offset, line_end):
+        """Split the line between two offsets into its six CSV fields, padding missing ones."""
+        line = self._data[offset:line_end].decode('utf-8', 'replace').strip()
+        return (next(csv.reader([line]), []) + [''] * 6)[:6]
+
+    @staticmethod
+    def parse_ip(value):
+        """Parse an IP address given as text or as its integer value."""
+        value = value.strip()
+        return ipaddress.ip_address(int(value) if value.isdigit() else value)
+
+    def lookup(self, ip):
+        starts, ends, offsets = self._tables[ip.version]
+        value = int(ip)
+        index = bisect_right(starts, value) - 1
+        if index < 0 or value > ends[index]:
+            return None
+
+        fields = self.read_fields(offsets[index], self._line_end(offsets[index]))
+        return {
+            'country': fields[3],
+            'country_code': fields[2],
+            'city': fields[5],
+            'region': fields[4],
+        }
+
+
+class MaxMindResolver(GeoIPResolver):
+    """
+    Resolver reading a MaxMind GeoIP2 or GeoLite2 City database.
+
+    Needs the maxminddb package, which memory-maps the .mmdb file and
+    searches its tree on each lookup.
+    """
+
+    def __init__(self, path):
+        try:
+            import maxminddb
+        except ImportError as exc:
+            raise ImproperlyConfigured("MaxMindResolver needs the maxminddb package") from exc
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+
+    def lookup(self, ip):
+        record = self._reader.get(ip)
+        if not record:
+            return None
+        subdivisions = record.get('subdivisions') or [{}]
+        return {
+            'country': record.get('country', {}).get('names', {}).get('en', ''),
+            'country_code': record.get('country', {}).get('iso_code', ''),
+            'city': record.get('city', {}).get('names', {}).get('en', ''),
+            'region': subdivisions[0].get('names', {}).get('en', ''),
+        }
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def load_resolver(path, resolver_class=None):
+    """
+    Open a geolocation database.
+
+    Args:
+        path: Path of the database file; empty for none
+        resolver_class: Dotted path of the resolver class, or None to pick
+            one from the file extension
+
+    Returns:
+        A GeoIPResolver object, a NullResolver if the file cannot be opened
+    """
+    if not path:
+        return NullResolver()
+    if resolver_class is None:
+        resolver_class = ('analytics.geoip.MaxMindResolver' if str(path).endswith('.mmdb')
+                          else 'analytics.geoip.CSVRangeResolver')
+    try:
+        return import_string(resolver_class)(path)
+    except (OSError, ValueError) as exc:
+        logger.warning("GeoIP database %s could not be opened: %s", path, exc)
+        return NullResolver()
+
+
+def get_resolver():
+    """Return the resolver for the configured database, opening it once per process."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = load_resolver(
+                    getattr(settings, 'ANALYTICS_GEOIP_DATABASE', ''),
+                    getattr(settings, 'ANALYTICS_GEOIP_RESOLVER', None),
+                )
+    return _resolver
+
+
+def clear_resolver():
+    """Drop the resolver held by this process, so the next lookup reopens the database."""
+    global _resolver
+    with _resolver_lock:
+        _resolver = None
@@ -0,0 +1,263 @@
+"""
+Page view ingestion for the analytics app.
+This module buffers page view events in process memory and writes them to
+the database in batches from a background thread.
+"""
+
+import atexit
+import ipaddress
+import logging
+import threading
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.cache import LRUCache
+from .models import PageView, UserSession
+from .utils import get_client_ip, parse_user_agent, get_location_from_ip
+
+logger = logging.getLogger(__name__)
+
+PageViewEvent = namedtuple('PageViewEvent', [
+    'timestamp', 'user_id', 'session_key', 'path', 'page_title', 'referrer', 'ip_address', 'user_agent',
+])
+
+
+class PageViewBuffer:
+    """
+    Bounded ring buffer of page view events with a background flusher.
+
+    Recording an event only appends a tuple to a deque, which is safe
+    across threads. When the buffer is full the oldest events are dropped
+    rather than growing memory. A daemon thread, started on the first
+    event, drains the buffer every FLUSH_INTERVAL seconds or as soon as
+    BATCH_SIZE events are waiting. It writes the page views with bulk_create
+    and folds them into their sessions with one UPDATE per batch.
+
+    With ANALYTICS_ASYNC set to False no thread is started and a full batch
+    is flushed on the request that completes it.
+
+    The buffer lives in the web process, so a Celery task cannot drain it;
+    handing each event to the worker instead would put a broker round trip
+    back on the request. Events not yet flushed are lost if the process is
+    killed: up to FLUSH_INTERVAL seconds of page views, or BATCH_SIZE events
+    if that comes first. A clean shutdown flushes them.
+    """
+
+    def __init__(self, max_events=None, batch_size=None, flush_interval=None, run_async=None):
+        self.max_events = max_events or getattr(settings, 'ANALYTICS_BUFFER_SIZE', 10000)
+        self.batch_size = batch_size or getattr(settings, 'ANALYTICS_BATCH_SIZE', 500)
+        self.flush_interval = flush_interval or getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 5)
+        self.run_async = getattr(settings, 'ANALYTICS_ASYNC', True) if run_async is None else run_async
+
+        self._events = deque(maxlen=self.max_events)
+        self._dropped = 0
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._exit_hook_registered = False
+
+        # Parsing user agents is the costliest part of an event; browsers repeat them a lot
+        self._user_agents = LRUCache(maxsize=1024)
+
+    def record(self, event):
+        """
+        Queue a page view event without blocking.
+
+        Args:
+            event: A PageViewEvent
+        """
+        if len(self._events) >= self.max_events:
+            self._dropped += 1
+        self._events.append(event)
+
+        pending = len(self._events)
+        if not self.run_async:
+            if pending >= self.batch_size:
+                self.flush()
+            return
+
+        self._ensure_thread()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='analytics-flusher', daemon=True)
+                self._thread.start()
+                # Write what is left when the worker shuts down cleanly
+                if not self._exit_hook_registered:
+                    atexit.register(self._flush_at_exit)
+                    self._exit_hook_registered = True
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Analytics flush failed")
+            finally:
+                # This thread's connection is not managed by the request cycle
+                close_old_connections()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Analytics flush at exit failed")
+
+    def flush(self):
+        """
+        Write every buffered event to the database, in batches.
+
+        Returns:
+            The number of page views written
+        """
+        written = 0
+        with self._flush_lock:
+            while self._events:
+                batch = []
+                while self._events and len(batch) < self.batch_size:
+                    batch.append(self._events.popleft())
+                self.write(batch)
+                written += len(batch)
+
+            if self._dropped:
+                logger.warning("Analytics buffer full, dropped %d page views", self._dropped)
+                self._dropped = 0
+        return written
+
+    def write(self, events):
+        """
+        Store a batch of events as page views and session updates.
+
+        Args:
+            events: A list of PageViewEvent tuples
+        """
+        page_views = []
+        sessions = {}
+
+        for event in events:
+            device_info = self.parse_user_agent(event.user_agent)
+            location_info = get_location_from_ip(event.ip_address)
+
+            page_views.append(PageView(
+                user_id=event.user_id,
+                session_key=event.session_key,
+                path=event.path,
+                page_title=event.page_title,
+                referrer=event.referrer,
+                ip_address=event.ip_address,
+                user_agent=event.user_agent,
+                country=location_info.get('country', '')[:100],
+                country_code=location_info.get('country_code', '')[:2],
+                city=location_info.get('city', '')[:100],
+                region=location_info.get('region', '')[:100],
+                device_type=device_info.get('device_type', '')[:20],
+                browser=device_info.get('browser', '')[:50],
+                operating_system=device_info.get('os', '')[:50],
+                timestamp=event.timestamp,
+            ))
+
+            if event.session_key:
+                session = sessions.get(event.session_key)
+                if session is None:
+                    sessions[event.session_key] = [event, location_info.get('country', ''), 1, event.timestamp]
+                else:
+                    session[2] += 1
+                    session[3] = max(session[3], event.timestamp)
+
+        PageView.objects.bulk_create(page_views, batch_size=self.batch_size)
+        if sessions:
+            self.write_sessions(sessions)
+
+    @staticmethod
+    def write_sessions(sessions):
+        """
+        Create missing sessions and add the batch's page views to all of them.
+
+        Args:
+            sessions: A dict mapping session keys to (first event, country,
+                page view count, last activity) lists
+        """
+        UserSession.objects.bulk_create([
+            UserSession(
+                session_key=session_key,
+                user_id=first.user_id,
+                ip_address=first.ip_address,
+                user_agent=first.user_agent,
+                country=country,
+                started_at=first.timestamp,
+                last_activity=first.timestamp,
+                page_views=0,
+            )
+            for session_key, (first, country, _, _) in sessions.items()
+        ], ignore_conflicts=True)
+
+        UserSession.objects.filter(session_key__in=list(sessions)).update(
+            page_views=F('page_views') + Case(
+                *[When(session_key=session_key, then=Value(count))
+                  for session_key, (_, _, count, _) in sessions.items()],
+                default=Value(0),
+                output_field=PositiveIntegerField()
+            ),
+            last_activity=Greatest(F('last_activity'), Case(
+                *[When(session_key=session_key, then=Value(last_activity))
+                  for session_key, (_, _, _, last_activity) in sessions.items()],
+                default=F('last_activity')
+            ))
+        )
+
+    def parse_user_agent(self, user_agent):
+        """Parse a user agent string, reusing earlier results."""
+        device_info = self._user_agents.get(user_agent)
+        if device_info is None:
+            device_info = parse_user_agent(user_agent)
+            self._user_agents.set(user_agent, device_info)
+        return device_info
+
+    def __len__(self):
+        return len(self._events)
+
+
+page_view_buffer = PageViewBuffer()
+
+
+def record_page_view(request, page_title):
+    """
+    Queue a page view for the current request.
+
+    Values are trimmed to their column sizes here, so one odd request cannot
+    make a whole batch fail.
+
+    Args:
+        request: The HttpRequest object
+        page_title: Human-readable title of the page
+    """
+    ip_address = get_client_ip(request)
+    try:
+        ipaddress.ip_address(ip_address)
+    except ValueError:
+        return
+
+    user = request.user
+    page_view_buffer.record(PageViewEvent(
+        timestamp=timezone.now(),
+        user_id=user.pk if user.is_authenticated else None,
+        session_key=request.session.session_key,
+        path=request.path[:500],
+        page_title=page_title[:200],
+        referrer=request.META.get('HTTP_REFERER', '')[:200],
+        ip_address=ip_address,
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+    ))
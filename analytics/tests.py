@@ -0,0 +1,137 @@
+import ipaddress
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .geoip import CSVRangeResolver, PackedIntegers
+from .ingest import PageViewBuffer, PageViewEvent
+from .models import PageView, UserSession
+
+FIXTURE_DATABASE = os.path.join(os.path.dirname(__file__), 'testdata', 'ip_ranges.csv')
+
+
+class CSVRangeResolverTests(SimpleTestCase):
+    """Tests for CSVRangeResolver against the small IP2Location-style fixture."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.resolver = CSVRangeResolver(FIXTURE_DATABASE)
+
+    def lookup(self, address):
+        return self.resolver.lookup(ipaddress.ip_address(address))
+
+    def test_lookup_at_and_around_range_bounds(self):
+        # 1.0.0.0 - 1.0.0.255 is Australia, directly followed by China from 1.0.1.0
+        self.assertIsNone(self.lookup('0.255.255.255'))
+        self.assertEqual(self.lookup('1.0.0.0')['country_code'], 'AU')
+        self.assertEqual(self.lookup('1.0.0.255')['country_code'], 'AU')
+        self.assertEqual(self.lookup('1.0.1.0')['country_code'], 'CN')
+        self.assertEqual(self.lookup('1.0.3.255')['country_code'], 'CN')
+        self.assertIsNone(self.lookup('1.0.4.0'))
+
+        # Ranges listed out of order are still found
+        self.assertIsNone(self.lookup('8.8.7.255'))
+        self.assertEqual(self.lookup('8.8.8.8')['city'], 'Mountain View')
+        self.assertIsNone(self.lookup('8.8.9.0'))
+
+    def test_lookup_returns_all_fields(self):
+        self.assertEqual(self.lookup('41.214.0.1'), {
+            'country': 'Ghana',
+            'country_code': 'GH',
+            'city': 'Accra',
+            'region': 'Greater Accra',
+        })
+
+    def test_lookup_ipv6(self):
+        self.assertEqual(self.lookup('2001:db8::1')['city'], 'Amsterdam, Centrum')
+        self.assertIsNone(self.lookup('2001:db8::1:0'))
+
+    def test_packed_integers_round_trip_128_bit_values(self):
+        values = PackedIntegers(16)
+        for value in (0, 2 ** 64, 2 ** 128 - 1):
+            values.append(value)
+        self.assertEqual(list(values), [0, 2 ** 64, 2 ** 128 - 1])
+        with self.assertRaises(IndexError):
+            values[3]
+
+    def test_unreadable_database_logs_a_warning(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as database:
+            database.write('"from","to","code","country","region","city"\n"a","b","","","",""\n')
+        try:
+            with self.assertLogs('analytics.geoip', 'WARNING'):
+                resolver = CSVRangeResolver(database.name)
+        finally:
+            os.remove(database.name)
+        self.assertIsNone(resolver.lookup(ipaddress.ip_address('1.0.0.1')))
+
+
+@mock.patch('analytics.ingest.get_location_from_ip', return_value={'country': 'Ghana', 'country_code': 'GH'})
+class PageViewBufferTests(TestCase):
+    """Tests for PageViewBuffer, flushing on the recording thread."""
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def event(self, path, session_key='session-a', seconds=0):
+        return PageViewEvent(
+            timestamp=self.now + timedelta(seconds=seconds),
+            user_id=None,
+            session_key=session_key,
+            path=path,
+            page_title='',
+            referrer='',
+            ip_address='41.214.0.1',
+            user_agent='Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0',
+        )
+
+    def test_full_buffer_drops_oldest_events_and_counts_them(self, get_location):
+        buffer = PageViewBuffer(max_events=3, batch_size=100, run_async=False)
+        for number in range(5):
+            buffer.record(self.event(f'/page/{number}/'))
+
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer._dropped, 2)
+        with self.assertLogs('analytics.ingest', 'WARNING') as logs:
+            self.assertEqual(buffer.flush(), 3)
+        self.assertIn('dropped 2 page views', logs.output[0])
+        self.assertEqual(buffer._dropped, 0)
+        self.assertEqual(set(PageView.objects.values_list('path', flat=True)),
+                         {'/page/2/', '/page/3/', '/page/4/'})
+
+    def test_full_batch_is_flushed_on_record(self, get_location):
+        buffer = PageViewBuffer(batch_size=3, run_async=False)
+        buffer.record(self.event('/a/'))
+        buffer.record(self.event('/b/'))
+        self.assertFalse(PageView.objects.exists())
+
+        buffer.record(self.event('/c/'))
+        self.assertEqual(PageView.objects.count(), 3)
+        self.assertEqual(len(buffer), 0)
+        self.assertIsNone(buffer._thread)
+
+    def test_flushes_add_up_page_views_of_a_session(self, get_location):
+        buffer = PageViewBuffer(batch_size=100, run_async=False)
+        buffer.record(self.event('/a/', seconds=0))
+        buffer.record(self.event('/b/', seconds=10))
+        self.assertEqual(buffer.flush(), 2)
+
+        # A late event older than the stored activity must not move it back
+        buffer.record(self.event('/c/', seconds=5))
+        buffer.record(self.event('/d/', session_key='session-b', seconds=20))
+        self.assertEqual(buffer.flush(), 2)
+
+        self.assertEqual(PageView.objects.count(), 4)
+        self.assertEqual(PageView.objects.filter(session_key='session-a').count(), 3)
+        self.assertEqual(PageView.objects.get(path='/a/').country_code, 'GH')
+
+        session = UserSession.objects.get(session_key='session-a')
+        self.assertEqual(session.page_views, 3)
+        self.assertEqual(session.started_at, self.now)
+        self.assertEqual(session.last_activity, self.now + timedelta(seconds=10))
+        self.assertEqual(session.country, 'Ghana')
+        self.assertEqual(UserSession.objects.get(session_key='session-b').page_views, 1)
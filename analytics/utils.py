@@ -1,8 +1,12 @@
-import requests
-import json
+import ipaddress
+
 from user_agents import parse
+from django.conf import settings
 from django.core.cache import cache
 
+from core.cache import LRUCache
+from .geoip import get_resolver
+
 
 def get_client_ip(request):
     """Get the real IP address of the client."""
@@ -40,48 +44,55 @@ def parse_user_agent(user_agent_string):
         }
 
 
+# Locations of recently seen addresses, shared by the threads of this process
+_locations = LRUCache(maxsize=getattr(settings, 'ANALYTICS_GEOIP_CACHE_SIZE', 4096))
+
+LOCAL_LOCATION = {
+    'country': 'Local',
+    'country_code': 'LC',
+    'city': 'Local',
+    'region': 'Local',
+}
+
+UNKNOWN_LOCATION = {
+    'country': 'Unknown',
+    'country_code': 'UN',
+    'city': 'Unknown',
+    'region': 'Unknown',
+}
+
+
 def get_location_from_ip(ip_address):
-    """Get location information from IP address using a free service."""
-    # Skip for local/private IPs
-    if ip_address in ['127.0.0.1', 'localhost'] or ip_address.startswith('192.168.') or ip_address.startswith('10.'):
-        return {
-            'country': 'Local',
-            'country_code': 'LC',
-            'city': 'Local',
-            'region': 'Local',
-        }
-    
-    # Check cache first
-    cache_key = f"location_{ip_address}"
-    cached_location = cache.get(cache_key)
-    if cached_location:
-        return cached_location
-    
+    """
+    Get location information from an IP address using the offline GeoIP database.
+
+    Never goes over the network. Addresses missing from the database fall
+    back to locations cached under the older location_{ip} keys.
+
+    Args:
+        ip_address: The IP address as a string
+
+    Returns:
+        A dict with 'country', 'country_code', 'city' and 'region'
+    """
     try:
-        # Use ipapi.co (free tier: 1000 requests/day)
-        response = requests.get(f"https://ipapi.co/{ip_address}/json/", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            location_info = {
-                'country': data.get('country_name', ''),
-                'country_code': data.get('country_code', ''),
-                'city': data.get('city', ''),
-                'region': data.get('region', ''),
-            }
-            
-            # Cache for 24 hours
-            cache.set(cache_key, location_info, 86400)
-            return location_info
-    except Exception as e:
-        print(f"Error getting location for IP {ip_address}: {e}")
-    
-    # Fallback
-    return {
-        'country': 'Unknown',
-        'country_code': 'UN',
-        'city': 'Unknown',
-        'region': 'Unknown',
-    }
+        ip = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return dict(LOCAL_LOCATION if ip_address == 'localhost' else UNKNOWN_LOCATION)
+
+    # Skip for local/private IPs
+    if ip.is_private or ip.is_loopback:
+        return dict(LOCAL_LOCATION)
+
+    location_info = _locations.get(ip_address)
+    if location_info is None:
+        location_info = (
+            get_resolver().lookup(ip)
+            or cache.get(f"location_{ip_address}")
+            or UNKNOWN_LOCATION
+        )
+        _locations.set(ip_address, location_info)
+    return dict(location_info)
 
 
 def get_country_flag_emoji(country_code):
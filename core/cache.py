@@ -0,0 +1,142 @@
+"""
+Caching helpers shared across apps.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+
+class LRUCache:
+    """Small thread-safe, per-process least-recently-used cache."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value for a key, marking it as recently used."""
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """Remove every key for which predicate(key) is true."""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ContentVersion:
+    """
+    Global version number of the published catalogue.
+
+    Anything cached from curriculum or quiz content is keyed by this number, so
+    bumping it after an edit retires every such entry at once. The number lives
+    in the shared cache; when it is missing it restarts from the current time
+    so it never goes back to a version that was already in use.
+    """
+
+    CACHE_KEY = 'core:content_version'
+
+    @classmethod
+    def get(cls):
+        """Return the current content version."""
+        version = cache.get(cls.CACHE_KEY)
+        if version is None:
+            version = int(time.time() * 1000)
+            cache.add(cls.CACHE_KEY, version, None)
+            version = cache.get(cls.CACHE_KEY, version)
+        return version
+
+    @classmethod
+    def bump(cls):
+        """Move to a new content version."""
+        try:
+            return cache.incr(cls.CACHE_KEY)
+        except ValueError:
+            version = int(time.time() * 1000)
+            cache.set(cls.CACHE_KEY, version, None)
+            return version
+
+
+PAGE_CACHE_PREFIX = 'core:page'
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+
+def make_page_key(request, cache_class):
+    """
+    Build the cache key of a public page.
+
+    Args:
+        request: The HttpRequest object
+        cache_class: The entitlement class the page was rendered for
+
+    Returns:
+        A key scoped to the current content version
+    """
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"{PAGE_CACHE_PREFIX}:{ContentVersion.get()}:{cache_class}:{request.method}:{path}"
+
+
+def cache_public_page(timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Cache the whole response of a catalogue page for anonymous visitors.
+
+    Responses are keyed by content version, entitlement class and URL, so a
+    content version bump retires them. Pages for signed-in users carry
+    per-user chrome and are never cached whole; they rely on template
+    fragments keyed the same way (see core.context_processors.content_cache).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                    or len(get_messages(request))):
+                return view_func(request, *args, **kwargs)
+
+            from subscription.entitlements import get_entitlements
+
+            key = make_page_key(request, get_entitlements(request).cache_class)
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            # A page that set cookies or used a CSRF token belongs to this visitor only
+            if (response.status_code == 200 and not response.streaming and not response.cookies
+                    and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+                cache.set(key, response, timeout)
+            return response
+        return wrapper
+    return decorator
@@ -2,7 +2,10 @@
 Context processors for the core app.
 """
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from core.cache import ContentVersion
 from core.models import Notification
+from subscription.entitlements import get_entitlements
 
 
 def notifications(request):
@@ -78,3 +81,15 @@ def seo_context(request):
         })
 
     return seo_data
+
+
+def content_cache(request):
+    """
+    Add the keys that cached template fragments vary on.
+
+    Both values are resolved only when a template uses them.
+    """
+    return {
+        'content_version': SimpleLazyObject(ContentVersion.get),
+        'entitlement_class': SimpleLazyObject(lambda: get_entitlements(request).cache_class),
+    }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import User
+from core.services import ProgressRollupService
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds per-user progress rollups from progress records and completed notes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Only rebuild rollups for the user with this email address',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            Q(progress__isnull=False) | Q(completed_notes__isnull=False) | Q(progress_rollups__isnull=False)
+        ).distinct()
+        if options['user']:
+            users = users.filter(email=options['user'])
+
+        rebuilt = 0
+        for user in users.iterator():
+            with transaction.atomic():
+                ProgressRollupService.rebuild_for_user(user)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt progress rollups for {rebuilt} users'))
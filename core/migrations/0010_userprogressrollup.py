@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_systemconfiguration_enable_test_mode'),
+        ('curriculum', '0003_note_doc_document_note_extracted_text_note_file_type_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProgressRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('subject', 'Subject'), ('topic', 'Topic'), ('subtopic', 'Sub-Topic')], max_length=10)),
+                ('notes_viewed', models.PositiveIntegerField(default=0, help_text='Number of distinct notes viewed within this node')),
+                ('notes_total', models.PositiveIntegerField(default=0, help_text='Number of published notes within this node at the last activity')),
+                ('notes_completed', models.PositiveIntegerField(default=0, help_text='Number of notes marked as completed within this node')),
+                ('last_activity', models.DateTimeField(default=django.utils.timezone.now)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to='curriculum.subject')),
+                ('subtopic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to='curriculum.subtopic')),
+                ('topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to='curriculum.topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_activity'],
+                'indexes': [models.Index(fields=['user', 'level', '-last_activity'], name='progress_rollup_level_idx'), models.Index(fields=['user', 'subject', 'level'], name='progress_rollup_subject_idx'), models.Index(fields=['user', 'topic', 'level'], name='progress_rollup_topic_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='userprogressrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('level', 'subject')), fields=('user', 'subject'), name='progress_rollup_unique_subject'),
+        ),
+        migrations.AddConstraint(
+            model_name='userprogressrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('level', 'topic')), fields=('user', 'topic'), name='progress_rollup_unique_topic'),
+        ),
+        migrations.AddConstraint(
+            model_name='userprogressrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('level', 'subtopic')), fields=('user', 'subtopic'), name='progress_rollup_unique_subtopic'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:05
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def node_keys(subject_id, topic_id, subtopic_id):
+    keys = [('subject', subject_id, None, None), ('topic', subject_id, topic_id, None)]
+    if subtopic_id is not None:
+        keys.append(('subtopic', subject_id, topic_id, subtopic_id))
+    return keys
+
+
+def rebuild_progress_rollups(apps, schema_editor):
+    # Same aggregation as ProgressRollupService.rebuild_for_user, for every user at once
+    UserProgress = apps.get_model('core', 'UserProgress')
+    UserProgressRollup = apps.get_model('core', 'UserProgressRollup')
+    NoteCompletion = apps.get_model('curriculum', 'NoteCompletion')
+    Note = apps.get_model('curriculum', 'Note')
+
+    UserProgressRollup.objects.all().delete()
+
+    rollups = {}
+
+    def add(user_id, subject_id, topic_id, subtopic_id, last_activity, viewed=0, completed=0):
+        for key in node_keys(subject_id, topic_id, subtopic_id):
+            rollup = rollups.get((user_id, key))
+            if rollup is None:
+                level, node_subject_id, node_topic_id, node_subtopic_id = key
+                rollup = rollups[(user_id, key)] = UserProgressRollup(
+                    user_id=user_id,
+                    level=level,
+                    subject_id=node_subject_id,
+                    topic_id=node_topic_id,
+                    subtopic_id=node_subtopic_id,
+                    last_activity=last_activity,
+                )
+            rollup.notes_viewed += viewed
+            rollup.notes_completed += completed
+            rollup.last_activity = max(rollup.last_activity, last_activity)
+
+    progress_rows = UserProgress.objects.values(
+        'user_id', 'subject_id', 'topic_id', 'subtopic_id', 'last_activity'
+    ).annotate(viewed=Count('notes_viewed')).order_by()
+    for row in progress_rows.iterator():
+        add(row['user_id'], row['subject_id'], row['topic_id'], row['subtopic_id'], row['last_activity'],
+            viewed=row['viewed'])
+
+    completion_rows = NoteCompletion.objects.values(
+        'user_id', 'note__topic__subject_id', 'note__topic_id', 'note__subtopic_id', 'created_at'
+    )
+    for row in completion_rows.iterator():
+        add(row['user_id'], row['note__topic__subject_id'], row['note__topic_id'], row['note__subtopic_id'],
+            row['created_at'], completed=1)
+
+    totals = {}
+    note_rows = Note.objects.filter(is_published=True).values(
+        'topic__subject_id', 'topic_id', 'subtopic_id'
+    ).annotate(total=Count('id')).order_by()
+    for row in note_rows:
+        for key in node_keys(row['topic__subject_id'], row['topic_id'], row['subtopic_id']):
+            totals[key] = totals.get(key, 0) + row['total']
+    for (_, key), rollup in rollups.items():
+        rollup.notes_total = totals.get(key, 0)
+
+    UserProgressRollup.objects.bulk_create(rollups.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_userprogressrollup'),
+        ('curriculum', '0003_note_doc_document_note_extracted_text_note_file_type_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_progress_rollups, migrations.RunPython.noop),
+    ]
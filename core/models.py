@@ -1,3 +1,7 @@
+import threading
+import time
+
+from django.core.cache import cache
 from django.db import models
 from django.utils import timezone
 
@@ -52,12 +56,62 @@ class SystemConfiguration(models.Model):
     def __str__(self):
         return "System Configuration"
 
+    VERSION_CACHE_KEY = 'core:system_configuration_version'
+    LOCAL_TIMEOUT = 30
+
+    _cached = None
+    _version = None
+    _expires_at = 0
+    _lock = threading.Lock()
+
     @classmethod
     def get_settings(cls):
-        """Get the system settings, creating default settings if none exist."""
+        """
+        Get the system settings for reading.
+
+        A copy is kept in process memory and rechecked against the shared
+        version key at most every LOCAL_TIMEOUT seconds. It is shared between
+        requests, so callers must not modify or save it; use get_for_update()
+        to edit the settings. When no settings row exists yet, an unsaved
+        instance with the defaults is returned.
+
+        Returns:
+            A SystemConfiguration object
+        """
+        settings = cls._cached
+        if settings is not None and time.monotonic() < cls._expires_at:
+            return settings
+
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        if version is None:
+            # Restart from the current time so a lost key never matches an old copy
+            version = int(time.time() * 1000)
+            cache.add(cls.VERSION_CACHE_KEY, version, None)
+            version = cache.get(cls.VERSION_CACHE_KEY, version)
+
+        with cls._lock:
+            if cls._cached is None or version != cls._version:
+                cls._cached = cls.objects.filter(pk=1).first() or cls(pk=1)
+                cls._version = version
+            cls._expires_at = time.monotonic() + cls.LOCAL_TIMEOUT
+            return cls._cached
+
+    @classmethod
+    def get_for_update(cls):
+        """Get the stored system settings for editing, creating default settings if none exist."""
         settings, created = cls.objects.get_or_create(pk=1)
         return settings
 
+    @classmethod
+    def bump_version(cls):
+        """Make every process reload the settings on its next check."""
+        try:
+            cache.incr(cls.VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_CACHE_KEY, int(time.time() * 1000), None)
+        with cls._lock:
+            cls._cached = None
+
 
 class Notification(models.Model):
     """Model for storing user notifications."""
@@ -130,6 +184,62 @@ class UserProgress(models.Model):
         self.save()
 
 
+class UserProgressRollup(models.Model):
+    """
+    Model rolling up a user's progress for one subject, topic or subtopic.
+
+    Rows are maintained incrementally by ProgressRollupService from UserProgress
+    and NoteCompletion writes, so progress pages read them without walking the
+    catalogue.
+    """
+
+    LEVEL_CHOICES = (
+        ('subject', 'Subject'),
+        ('topic', 'Topic'),
+        ('subtopic', 'Sub-Topic'),
+    )
+
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='progress_rollups')
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES)
+
+    # The node itself, with its ancestors filled in
+    subject = models.ForeignKey('curriculum.Subject', on_delete=models.CASCADE, related_name='progress_rollups')
+    topic = models.ForeignKey('curriculum.Topic', on_delete=models.CASCADE, related_name='progress_rollups', null=True, blank=True)
+    subtopic = models.ForeignKey('curriculum.SubTopic', on_delete=models.CASCADE, related_name='progress_rollups', null=True, blank=True)
+
+    notes_viewed = models.PositiveIntegerField(default=0, help_text="Number of distinct notes viewed within this node")
+    notes_total = models.PositiveIntegerField(default=0, help_text="Number of published notes within this node at the last activity")
+    notes_completed = models.PositiveIntegerField(default=0, help_text="Number of notes marked as completed within this node")
+    last_activity = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-last_activity']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'subject'], condition=models.Q(level='subject'),
+                                    name='progress_rollup_unique_subject'),
+            models.UniqueConstraint(fields=['user', 'topic'], condition=models.Q(level='topic'),
+                                    name='progress_rollup_unique_topic'),
+            models.UniqueConstraint(fields=['user', 'subtopic'], condition=models.Q(level='subtopic'),
+                                    name='progress_rollup_unique_subtopic'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'level', '-last_activity'], name='progress_rollup_level_idx'),
+            models.Index(fields=['user', 'subject', 'level'], name='progress_rollup_subject_idx'),
+            models.Index(fields=['user', 'topic', 'level'], name='progress_rollup_topic_idx'),
+        ]
+
+    def __str__(self):
+        node = self.subtopic or self.topic or self.subject
+        return f"{self.user.email} - {node.name} ({self.notes_viewed}/{self.notes_total})"
+
+    @property
+    def completion_percentage(self):
+        """Percentage of the node's published notes the user has viewed."""
+        if self.notes_total == 0:
+            return 0
+        return min(100, round(self.notes_viewed * 100 / self.notes_total))
+
+
 class UserAchievement(models.Model):
     """Model for tracking user achievements and badges."""
 
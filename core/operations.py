@@ -0,0 +1,41 @@
+"""
+Migration operations shared across apps.
+"""
+
+from django.db.migrations.operations.base import Operation
+
+
+class PostgreSQLOnly(Operation):
+    """
+    Apply a schema operation on PostgreSQL only.
+
+    The wrapped operation always updates the migration state, so models can
+    declare PostgreSQL features such as GIN indexes while SQLite databases,
+    used in development, simply go without them.
+    """
+
+    reduces_to_sql = False
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.operation], {}
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            self.operation.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            self.operation.database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f"{self.operation.describe()} (PostgreSQL only)"
+
+    @property
+    def migration_name_fragment(self):
+        return self.operation.migration_name_fragment
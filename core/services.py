@@ -0,0 +1,203 @@
+"""
+Services for the core app.
+This module maintains the per-user progress rollups read by the progress pages.
+"""
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from curriculum.models import Note, NoteCompletion
+from .models import UserProgress, UserProgressRollup
+
+
+class ProgressRollupService:
+    """Service for maintaining per-user subject, topic and subtopic progress rollups."""
+
+    @staticmethod
+    def record_activity(user_id, subject_id, topic_id, subtopic_id=None, notes_viewed=0, notes_completed=0,
+                        when=None):
+        """
+        Fold an activity into the rollups of a node and its ancestors.
+
+        When the rows exist this is one UPDATE moving the viewed and completed
+        counters by the given deltas and the last activity time, whatever the
+        depth of the node. On the first activity within a node the missing rows
+        are created with their note totals, which are afterwards refreshed by
+        refresh_note_totals when the catalogue changes.
+
+        Args:
+            user_id: The ID of the user
+            subject_id: The ID of the subject
+            topic_id: The ID of the topic
+            subtopic_id: The ID of the subtopic, or None for topic-level activity
+            notes_viewed: Change in the number of distinct notes viewed
+            notes_completed: Change in the number of notes marked as completed
+            when: Time of the activity, defaults to now
+        """
+        when = when or timezone.now()
+
+        # Each level with the condition matching its rollup row and its notes
+        levels = {
+            'subject': (Q(subject_id=subject_id), Q(topic__subject_id=subject_id)),
+            'topic': (Q(topic_id=topic_id), Q(topic_id=topic_id)),
+        }
+        if subtopic_id is not None:
+            levels['subtopic'] = (Q(subtopic_id=subtopic_id), Q(subtopic_id=subtopic_id))
+
+        updates = {'last_activity': when}
+        if notes_viewed:
+            updates['notes_viewed'] = Greatest(F('notes_viewed') + notes_viewed, 0)
+        if notes_completed:
+            updates['notes_completed'] = Greatest(F('notes_completed') + notes_completed, 0)
+
+        def node_rows(level_names):
+            node_filter = Q()
+            for level in level_names:
+                node_filter |= Q(level=level) & levels[level][0]
+            return UserProgressRollup.objects.filter(node_filter, user_id=user_id)
+
+        if node_rows(levels).update(**updates) == len(levels):
+            return
+
+        # First activity within this node: create the missing rows, then apply the activity to them
+        missing = set(levels) - set(node_rows(levels).values_list('level', flat=True))
+        totals = Note.objects.filter(topic__subject_id=subject_id, is_published=True).aggregate(**{
+            f'{level}_total': Count('id', filter=levels[level][1]) for level in missing
+        })
+
+        nodes = {
+            'subject': {'topic_id': None, 'subtopic_id': None},
+            'topic': {'topic_id': topic_id, 'subtopic_id': None},
+            'subtopic': {'topic_id': topic_id, 'subtopic_id': subtopic_id},
+        }
+        UserProgressRollup.objects.bulk_create([
+            UserProgressRollup(
+                user_id=user_id,
+                level=level,
+                subject_id=subject_id,
+                notes_total=totals[f'{level}_total'],
+                last_activity=when,
+                **nodes[level]
+            )
+            for level in missing
+        ], ignore_conflicts=True)
+        node_rows(missing).update(**updates)
+
+    @staticmethod
+    def refresh_note_totals(subject_id):
+        """
+        Recount the published notes behind every rollup of a subject.
+
+        Run when notes are added, removed, published or moved, so the rows
+        are not recounted on each activity.
+
+        Args:
+            subject_id: The ID of the subject
+        """
+        published = Note.objects.filter(is_published=True).order_by()
+        counts = {
+            'subject': published.filter(topic__subject_id=OuterRef('subject_id')).values('topic__subject_id'),
+            'topic': published.filter(topic_id=OuterRef('topic_id')).values('topic_id'),
+            'subtopic': published.filter(subtopic_id=OuterRef('subtopic_id')).values('subtopic_id'),
+        }
+        for level, notes in counts.items():
+            UserProgressRollup.objects.filter(subject_id=subject_id, level=level).update(
+                notes_total=Coalesce(Subquery(notes.annotate(total=Count('id')).values('total')), 0)
+            )
+
+    @staticmethod
+    def record_progress(progress, notes_viewed=0):
+        """
+        Fold a UserProgress write into the user's rollups.
+
+        Args:
+            progress: The UserProgress object that was saved or had notes added
+            notes_viewed: Number of notes newly added to, or removed from (negative),
+                the progress record
+        """
+        ProgressRollupService.record_activity(
+            progress.user_id,
+            progress.subject_id,
+            progress.topic_id,
+            progress.subtopic_id,
+            notes_viewed=notes_viewed
+        )
+
+    @staticmethod
+    def record_note_completion(completion, completed):
+        """
+        Fold a note being marked or unmarked as completed into the user's rollups.
+
+        Args:
+            completion: The NoteCompletion object
+            completed: True when the completion was created, False when it was deleted
+        """
+        note = Note.objects.select_related('topic').get(pk=completion.note_id)
+        ProgressRollupService.record_activity(
+            completion.user_id,
+            note.topic.subject_id,
+            note.topic_id,
+            note.subtopic_id,
+            notes_completed=1 if completed else -1
+        )
+
+    @staticmethod
+    def rebuild_for_user(user):
+        """
+        Rebuild a user's progress rollups from their progress records and completed notes.
+
+        Args:
+            user: The User object
+        """
+        UserProgressRollup.objects.filter(user=user).delete()
+
+        rollups = {}
+
+        def node_keys(subject_id, topic_id, subtopic_id):
+            keys = [('subject', subject_id, None, None), ('topic', subject_id, topic_id, None)]
+            if subtopic_id is not None:
+                keys.append(('subtopic', subject_id, topic_id, subtopic_id))
+            return keys
+
+        def add(subject_id, topic_id, subtopic_id, last_activity, viewed=0, completed=0):
+            for key in node_keys(subject_id, topic_id, subtopic_id):
+                rollup = rollups.get(key)
+                if rollup is None:
+                    level, node_subject_id, node_topic_id, node_subtopic_id = key
+                    rollup = rollups[key] = UserProgressRollup(
+                        user=user,
+                        level=level,
+                        subject_id=node_subject_id,
+                        topic_id=node_topic_id,
+                        subtopic_id=node_subtopic_id,
+                        last_activity=last_activity,
+                    )
+                rollup.notes_viewed += viewed
+                rollup.notes_completed += completed
+                rollup.last_activity = max(rollup.last_activity, last_activity)
+
+        progress_rows = UserProgress.objects.filter(user=user).values(
+            'subject_id', 'topic_id', 'subtopic_id', 'last_activity'
+        ).annotate(viewed=Count('notes_viewed')).order_by()
+        for row in progress_rows:
+            add(row['subject_id'], row['topic_id'], row['subtopic_id'], row['last_activity'], viewed=row['viewed'])
+
+        completion_rows = NoteCompletion.objects.filter(user=user).values(
+            'note__topic__subject_id', 'note__topic_id', 'note__subtopic_id', 'created_at'
+        )
+        for row in completion_rows:
+            add(row['note__topic__subject_id'], row['note__topic_id'], row['note__subtopic_id'],
+                row['created_at'], completed=1)
+
+        subject_ids = {key[1] for key in rollups}
+        note_rows = Note.objects.filter(
+            topic__subject_id__in=subject_ids,
+            is_published=True
+        ).values('topic__subject_id', 'topic_id', 'subtopic_id').annotate(total=Count('id')).order_by()
+        for row in note_rows:
+            for key in node_keys(row['topic__subject_id'], row['topic_id'], row['subtopic_id']):
+                if key in rollups:
+                    rollups[key].notes_total += row['total']
+
+        UserProgressRollup.objects.bulk_create(rollups.values(), batch_size=500)
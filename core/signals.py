@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from curriculum.models import Note, NoteCompletion, Topic
+from .cache import ContentVersion
+from .models import HeroSection, KidFriendlyTheme, SystemConfiguration, UserProgress
+from .services import ProgressRollupService
+
+
+@receiver(post_save, sender=HeroSection)
+@receiver(post_delete, sender=HeroSection)
+@receiver(post_save, sender=KidFriendlyTheme)
+@receiver(post_delete, sender=KidFriendlyTheme)
+def page_content_changed(sender, instance, **kwargs):
+    """Move to a new content version when home page content changes."""
+    transaction.on_commit(ContentVersion.bump)
+
+
+@receiver(post_save, sender=SystemConfiguration)
+@receiver(post_delete, sender=SystemConfiguration)
+def system_configuration_changed(sender, instance, **kwargs):
+    """Make every process reload the system settings once the change is committed."""
+    transaction.on_commit(SystemConfiguration.bump_version)
+
+
+@receiver(post_save, sender=UserProgress)
+def progress_saved(sender, instance, **kwargs):
+    """Record started topics and subtopics, and later activity, in the progress rollups."""
+    ProgressRollupService.record_progress(instance)
+
+
+@receiver(m2m_changed, sender=UserProgress.notes_viewed.through)
+def progress_notes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Count notes newly added to or removed from a progress record in the progress rollups."""
+    if reverse or action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    # pk_set only holds the notes that were actually added or removed
+    delta = len(pk_set) if action == 'post_add' else -len(pk_set)
+    ProgressRollupService.record_progress(instance, notes_viewed=delta)
+
+
+@receiver(post_save, sender=NoteCompletion)
+def note_completed(sender, instance, created, **kwargs):
+    """Count a note marked as completed in the progress rollups."""
+    if created:
+        ProgressRollupService.record_note_completion(instance, completed=True)
+
+
+@receiver(post_delete, sender=NoteCompletion)
+def note_uncompleted(sender, instance, origin=None, **kwargs):
+    """Uncount a note unmarked as completed, unless it goes with a deleted note or user."""
+    if origin is instance or (isinstance(origin, QuerySet) and origin.model is NoteCompletion):
+        ProgressRollupService.record_note_completion(instance, completed=False)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def note_changed(sender, instance, **kwargs):
+    """Recount the note totals of the subject's progress rollups once a note change is committed."""
+    subject_id = Topic.objects.filter(pk=instance.topic_id).values_list('subject_id', flat=True).first()
+    if subject_id is not None:
+        transaction.on_commit(lambda: ProgressRollupService.refresh_note_totals(subject_id))
@@ -4,11 +4,15 @@ from django.http import JsonResponse
 from django.contrib import messages
 from django.db.models import Count, Q
 
+from .cache import cache_public_page
+from .context_processors import content_cache
 from .models import Notification, UserAchievement, HeroSection, KidFriendlyTheme
 from curriculum.models import Curriculum, ClassLevel, Subject, Topic
 from quiz.models import QuizAttempt
+from subscription.entitlements import get_entitlements
 
 
+@cache_public_page()
 def home(request):
     """Home page view."""
     # Get featured content for the home page
@@ -48,6 +52,9 @@ def home(request):
         'hero_sections': hero_sections,
         'theme': theme,
     }
+    # The template's cache fragments vary on these keys; pass them here as well so they
+    # are set even under settings modules without the content_cache context processor
+    context.update(content_cache(request))
     return render(request, 'core/home.html', context)
 
 
@@ -67,54 +74,41 @@ def dashboard(request):
     if not class_level and curriculum:
         class_level = ClassLevel.objects.filter(curriculum=curriculum, is_active=True).first()
 
-    # Get user's active subscription
-    from subscription.models import Subscription, CurriculumAccess, SubscriptionPlan
-    from django.utils import timezone
-
-    active_subscription = Subscription.objects.filter(
-        user=user,
-        status='active',
-        end_date__gt=timezone.now()
-    ).first()
+    # Get user's entitlements and active subscription
+    entitlements = get_entitlements(request)
+    active_subscription = entitlements.subscription
 
     # Check if the user needs to complete setup (free user without curriculum/class selection)
     needs_setup = False
-    if active_subscription and active_subscription.plan.plan_type == 'free':
+    if active_subscription and entitlements.plan_type == 'free':
         # Check if the user has selected a curriculum and class level
         if not user.preferred_curriculum or not user.preferred_class_level:
             needs_setup = True
 
         # Check if the subscription has a curriculum access
-        if not CurriculumAccess.objects.filter(subscription=active_subscription).exists():
+        if not entitlements.access_pairs:
             needs_setup = True
 
     # Get all curricula for tier three users
     all_curricula = []
-    if active_subscription and active_subscription.plan.all_curriculums:
+    if active_subscription and entitlements.all_curriculums:
         all_curricula = Curriculum.objects.filter(is_active=True)
 
     # Get class levels for tier two users
     class_levels = []
-    if active_subscription and active_subscription.plan.all_grade_levels and curriculum:
+    if active_subscription and entitlements.all_grade_levels and curriculum:
         class_levels = ClassLevel.objects.filter(curriculum=curriculum, is_active=True).order_by('level_order')
 
     # Get free tier curriculum and class level
     free_curriculum = None
     free_class_level = None
 
-    if not active_subscription or active_subscription.plan.plan_type == 'free':
-        # Find a free subscription to determine what's available in free tier
-        from subscription.models import SubscriptionPlan
-        free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-        if free_plan:
-            # Find a sample curriculum access for the free tier
-            sample_access = CurriculumAccess.objects.filter(
-                subscription__plan=free_plan
-            ).first()
-
-            if sample_access:
-                free_curriculum = sample_access.curriculum
-                free_class_level = sample_access.class_level
+    if not active_subscription or entitlements.plan_type == 'free':
+        free_curriculum_id, free_class_level_id = entitlements.free_sample
+        if free_curriculum_id:
+            free_curriculum = Curriculum.objects.filter(id=free_curriculum_id).first()
+        if free_class_level_id:
+            free_class_level = ClassLevel.objects.filter(id=free_class_level_id).first()
 
     # Get recent activity
     recent_activity = user.get_recent_activity(limit=5)
@@ -142,20 +136,14 @@ def dashboard(request):
         # Check subscription-based access
         elif active_subscription:
             # Tier three has access to all curricula
-            if active_subscription.plan.all_curriculums:
+            if entitlements.all_curriculums:
                 has_access = True
             # Tier two has access to all grade levels of selected curriculum
-            elif active_subscription.plan.all_grade_levels:
-                # Check if user has access to this curriculum
-                curriculum_accesses = active_subscription.curriculum_accesses.filter(curriculum=curriculum)
-                has_access = curriculum_accesses.exists()
+            elif entitlements.all_grade_levels:
+                has_access = curriculum.id in entitlements.accessible_curriculum_ids
             # Tier one has access to specific curriculum and class level
             else:
-                # Check if user has access to this specific curriculum and class level
-                has_access = active_subscription.curriculum_accesses.filter(
-                    curriculum=curriculum,
-                    class_level=class_level
-                ).exists()
+                has_access = (curriculum.id, class_level.id) in entitlements.access_pairs
         # Free tier users have access to free content
         elif free_curriculum and free_class_level:
             has_access = (curriculum.id == free_curriculum.id and class_level.id == free_class_level.id)
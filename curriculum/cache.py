@@ -0,0 +1,376 @@
+"""
+Caching for the curriculum app.
+This module keeps lookup maps of curricula and class levels in the shared cache,
+and the navigation tree of the catalogue in process memory.
+"""
+
+import threading
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import Count, prefetch_related_objects
+from django.http import Http404
+
+from core.cache import ContentVersion
+from .models import Curriculum, ClassLevel, Subject, Note
+
+
+class CurriculumMap:
+    """
+    Cached map of curriculum codes and class level IDs.
+
+    The map holds every curriculum by code as ``(id, name)`` and every class
+    level by ID as ``(curriculum_id, name)``. It is rebuilt on the next read
+    after a Curriculum or ClassLevel is saved or deleted.
+    """
+
+    CACHE_KEY = 'curriculum:id_map'
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    @classmethod
+    def get(cls):
+        """
+        Get the curriculum map, building it on a cache miss.
+
+        Returns:
+            A dict with 'curricula' and 'class_levels' maps
+        """
+        data = cache.get(cls.CACHE_KEY)
+        if data is None:
+            data = cls.build()
+            cache.set(cls.CACHE_KEY, data, cls.CACHE_TIMEOUT)
+        return data
+
+    @staticmethod
+    def build():
+        """Load the curriculum map from the database."""
+        return {
+            'curricula': {
+                code: (curriculum_id, name)
+                for curriculum_id, code, name in Curriculum.objects.values_list('id', 'code', 'name')
+            },
+            'class_levels': {
+                class_level_id: (curriculum_id, name)
+                for class_level_id, curriculum_id, name in ClassLevel.objects.values_list('id', 'curriculum_id', 'name')
+            },
+        }
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the cached curriculum map."""
+        cache.delete(cls.CACHE_KEY)
+
+    @classmethod
+    def get_curriculum(cls, code):
+        """Return ``(id, name)`` for a curriculum code, or None."""
+        return cls.get()['curricula'].get(code)
+
+    @classmethod
+    def get_class_level(cls, class_level_id):
+        """Return ``(curriculum_id, name)`` for a class level ID, or None."""
+        try:
+            return cls.get()['class_levels'].get(int(class_level_id))
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def get_curriculum_name(cls, curriculum_id):
+        """Return the name of a curriculum by ID, or an empty string."""
+        for code_curriculum_id, name in cls.get()['curricula'].values():
+            if code_curriculum_id == curriculum_id:
+                return name
+        return ''
+
+
+class NoteTotals:
+    """
+    Cached count of active notes per topic.
+
+    The counts are stored in the shared cache under the current content
+    version, so they are recounted on the first read after a note or topic
+    changes.
+    """
+
+    CACHE_PREFIX = 'curriculum:note_totals'
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    @classmethod
+    def get(cls):
+        """
+        Get the note totals, counting them on a cache miss.
+
+        Returns:
+            A list of (topic_id, note_count) pairs in topic display order
+        """
+        key = f"{cls.CACHE_PREFIX}:{ContentVersion.get()}"
+        totals = cache.get(key)
+        if totals is None:
+            totals = cls.build()
+            cache.set(key, totals, cls.CACHE_TIMEOUT)
+        return totals
+
+    @staticmethod
+    def build():
+        """Count the active notes of each topic in one grouped query."""
+        return list(Note.objects.filter(is_active=True).values('topic_id').annotate(
+            total=Count('id')
+        ).order_by('topic__order', 'topic__name', 'topic_id').values_list('topic_id', 'total'))
+
+
+TreePath = namedtuple('TreePath', ['curriculum', 'class_level', 'subject', 'branch', 'topic', 'subtopic'])
+
+# Marker for topic lookups that accept a topic under any branch
+ANY_BRANCH = object()
+
+
+class CurriculumTree:
+    """
+    In-memory tree of the active catalogue.
+
+    The tree holds Curriculum -> ClassLevel -> Subject -> Branch -> Topic ->
+    SubTopic as model instances, with parent relations and the ``topics``,
+    ``branches`` and ``subtopics`` related managers already loaded, so
+    templates can walk it without queries. Children are kept in display
+    order, which also gives the previous/next sibling of a topic or subtopic.
+
+    One tree is built per process and per content version, and replaced on
+    the first read after ContentVersion is bumped. The instances are shared
+    between requests and must be treated as read-only.
+    """
+
+    _tree = None
+    _lock = threading.Lock()
+
+    def __init__(self, version, curricula, class_levels, subjects):
+        self.version = version
+        self.curricula = list(curricula)
+        self.curricula_by_code = {curriculum.code: curriculum for curriculum in self.curricula}
+        self.curricula_by_id = {curriculum.id: curriculum for curriculum in self.curricula}
+
+        self.class_levels_by_id = {}
+        self.class_levels_by_curriculum = {}
+        for class_level in class_levels:
+            curriculum = self.curricula_by_id.get(class_level.curriculum_id)
+            if curriculum is None:
+                continue
+            class_level.curriculum = curriculum
+            self.class_levels_by_id[class_level.id] = class_level
+            self.class_levels_by_curriculum.setdefault(curriculum.id, []).append(class_level)
+
+        self.subjects_by_slug = {}
+        self.subjects_by_class_level = {}
+        self.branches_by_slug = {}
+        self.branches_by_subject = {}
+        self.topics_by_id = {}
+        self.topics_by_slug = {}
+        self.topics_by_parent = {}
+        self.subtopics_by_id = {}
+        self.subtopics_by_slug = {}
+        self.subtopics_by_topic = {}
+
+        for subject in subjects:
+            class_level = self.class_levels_by_id.get(subject.class_level_id)
+            if class_level is None or class_level.curriculum_id != subject.curriculum_id:
+                continue
+            subject.curriculum = class_level.curriculum
+            subject.class_level = class_level
+            self.subjects_by_slug[(class_level.id, subject.slug)] = subject
+            self.subjects_by_class_level.setdefault(class_level.id, []).append(subject)
+            self._add_subject_children(subject)
+
+    def _add_subject_children(self, subject):
+        branches = {}
+        for branch in subject.branches.all():
+            if not branch.is_active:
+                continue
+            branch.subject = subject
+            branches[branch.id] = branch
+            self.branches_by_slug[(subject.id, branch.slug)] = branch
+            self.branches_by_subject.setdefault(subject.id, []).append(branch)
+
+        for topic in subject.topics.all():
+            if not topic.is_active:
+                continue
+            if topic.branch_id is not None:
+                if topic.branch_id not in branches:
+                    continue
+                topic.branch = branches[topic.branch_id]
+            self.topics_by_id[topic.id] = topic
+            self.topics_by_slug.setdefault((subject.id, topic.slug), []).append(topic)
+            self.topics_by_parent.setdefault((subject.id, topic.branch_id), []).append(topic)
+
+            for subtopic in topic.subtopics.all():
+                if not subtopic.is_active:
+                    continue
+                self.subtopics_by_id[subtopic.id] = subtopic
+                self.subtopics_by_slug[(topic.id, subtopic.slug)] = subtopic
+                self.subtopics_by_topic.setdefault(topic.id, []).append(subtopic)
+
+    @classmethod
+    def get(cls):
+        """
+        Get the tree for the current content version, building it on a miss.
+
+        Returns:
+            A CurriculumTree object
+        """
+        version = ContentVersion.get()
+        tree = cls._tree
+        if tree is not None and tree.version == version:
+            return tree
+
+        with cls._lock:
+            tree = cls._tree
+            if tree is None or tree.version != version:
+                tree = cls.build(version)
+                cls._tree = tree
+        return tree
+
+    @classmethod
+    def build(cls, version):
+        """Load the active catalogue from the database."""
+        subjects = list(Subject.objects.filter(is_active=True))
+        # Related managers are loaded in full, as the templates expect
+        prefetch_related_objects(subjects, 'branches', 'topics', 'topics__subtopics')
+        return cls(
+            version,
+            Curriculum.objects.filter(is_active=True),
+            ClassLevel.objects.filter(is_active=True).order_by('curriculum', 'level_order'),
+            subjects,
+        )
+
+    @classmethod
+    def clear(cls):
+        """Drop the tree held by this process."""
+        with cls._lock:
+            cls._tree = None
+
+    def get_curriculum(self, code):
+        """Return the active curriculum with a code, or None."""
+        return self.curricula_by_code.get(code)
+
+    def get_class_level(self, curriculum, class_level_id):
+        """Return an active class level within a curriculum, or None."""
+        class_level = self.class_levels_by_id.get(class_level_id)
+        if class_level is None or class_level.curriculum_id != curriculum.id:
+            return None
+        return class_level
+
+    def get_subject(self, class_level, slug):
+        """Return an active subject of a class level by slug, or None."""
+        return self.subjects_by_slug.get((class_level.id, slug))
+
+    def get_branch(self, subject, slug):
+        """Return an active branch of a subject by slug, or None."""
+        return self.branches_by_slug.get((subject.id, slug))
+
+    def get_topic(self, subject, slug, branch=None):
+        """
+        Return an active topic of a subject by slug, or None.
+
+        Args:
+            subject: The Subject the topic belongs to
+            slug: The topic slug
+            branch: The Branch the topic belongs to, None for topics outside any
+                branch, or ANY_BRANCH to accept either
+
+        Returns:
+            The Topic, or None
+        """
+        branch_id = None if branch is None or branch is ANY_BRANCH else branch.id
+        for topic in self.topics_by_slug.get((subject.id, slug), ()):
+            if branch is ANY_BRANCH or topic.branch_id == branch_id:
+                return topic
+        return None
+
+    def get_subtopic(self, topic, slug):
+        """Return an active subtopic of a topic by slug, or None."""
+        return self.subtopics_by_slug.get((topic.id, slug))
+
+    def get_topic_by_id(self, topic_id):
+        """Return an active topic by ID, or None."""
+        return self.topics_by_id.get(topic_id)
+
+    def get_subtopic_by_id(self, subtopic_id):
+        """Return an active subtopic by ID, or None."""
+        return self.subtopics_by_id.get(subtopic_id)
+
+    def resolve(self, curriculum_code, class_level_id, subject_slug=None, branch_slug=None,
+                topic_slug=None, subtopic_slug=None, topic_branch=None):
+        """
+        Resolve a navigation URL down to the deepest slug given.
+
+        Args:
+            curriculum_code: The curriculum code
+            class_level_id: The class level ID
+            subject_slug: The subject slug, if any
+            branch_slug: The branch slug, if any
+            topic_slug: The topic slug, if any
+            subtopic_slug: The subtopic slug, if any
+            topic_branch: Pass ANY_BRANCH to accept a topic under any branch when
+                no branch slug is given
+
+        Returns:
+            A TreePath with None for the levels that were not requested
+
+        Raises:
+            Http404: If any requested level does not exist or is inactive
+        """
+        curriculum = self.get_curriculum(curriculum_code)
+        class_level = curriculum and self.get_class_level(curriculum, class_level_id)
+        if class_level is None:
+            raise Http404("No class level matches the given query.")
+
+        subject = branch = topic = subtopic = None
+        if subject_slug is not None:
+            subject = self.get_subject(class_level, subject_slug)
+            if subject is None:
+                raise Http404("No subject matches the given query.")
+        if branch_slug is not None:
+            branch = self.get_branch(subject, branch_slug)
+            if branch is None:
+                raise Http404("No branch matches the given query.")
+        if topic_slug is not None:
+            topic = self.get_topic(subject, topic_slug, branch if branch_slug is not None else topic_branch)
+            if topic is None:
+                raise Http404("No topic matches the given query.")
+        if subtopic_slug is not None:
+            subtopic = self.get_subtopic(topic, subtopic_slug)
+            if subtopic is None:
+                raise Http404("No subtopic matches the given query.")
+        return TreePath(curriculum, class_level, subject, branch, topic, subtopic)
+
+    def class_levels(self, curriculum):
+        """Return the active class levels of a curriculum in level order."""
+        return self.class_levels_by_curriculum.get(curriculum.id, [])
+
+    def subjects(self, class_level):
+        """Return the active subjects of a class level in name order."""
+        return self.subjects_by_class_level.get(class_level.id, [])
+
+    def branches(self, subject):
+        """Return the active branches of a subject in name order."""
+        return self.branches_by_subject.get(subject.id, [])
+
+    def topics(self, subject, branch=None):
+        """Return the active topics of a subject or branch in display order."""
+        return self.topics_by_parent.get((subject.id, branch.id if branch else None), [])
+
+    def subtopics(self, topic):
+        """Return the active subtopics of a topic in display order."""
+        return self.subtopics_by_topic.get(topic.id, [])
+
+    def topic_siblings(self, topic):
+        """Return the (previous, next) active topics around a topic in its subject or branch."""
+        return self._siblings(self.topics_by_parent.get((topic.subject_id, topic.branch_id), []), topic)
+
+    def subtopic_siblings(self, subtopic):
+        """Return the (previous, next) active subtopics around a subtopic in its topic."""
+        return self._siblings(self.subtopics_by_topic.get(subtopic.topic_id, []), subtopic)
+
+    @staticmethod
+    def _siblings(siblings, node):
+        index = siblings.index(node)
+        prev_node = siblings[index - 1] if index > 0 else None
+        next_node = siblings[index + 1] if index + 1 < len(siblings) else None
+        return prev_node, next_node
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0003_note_doc_document_note_extracted_text_note_file_type_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notecompletion',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='note_completion_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, TextField, Value
+
+from core.operations import PostgreSQLOnly
+
+
+def populate_search_vectors(apps, schema_editor):
+    # The documents are spelled out here rather than imported from the search
+    # app, so later changes to it cannot change what this migration writes
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    using = schema_editor.connection.alias
+    name_document = SearchVector('name', weight='A') + SearchVector('description', weight='B')
+    stripped_content = Func(F('content'), Value('<[^>]*>'), Value(' '), Value('g'),
+                            function='REGEXP_REPLACE', output_field=TextField())
+    documents = {
+        'Subject': name_document,
+        'Topic': name_document,
+        'Note': (SearchVector('title', weight='A') + SearchVector(stripped_content, weight='B')
+                 + SearchVector('extracted_text', weight='C')),
+    }
+    for model_name, document in documents.items():
+        apps.get_model('curriculum', model_name).objects.using(using).update(search_vector=document)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0004_notecompletion_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Full-text search document, maintained by the search app', null=True),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Full-text search document, maintained by the search app', null=True),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Full-text search document, maintained by the search app', null=True),
+        ),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='note',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='note_search_vector_idx'),
+        )),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='subject',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='subject_search_vector_idx'),
+        )),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='topic',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='topic_search_vector_idx'),
+        )),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.text import slugify
 from django.urls import reverse
@@ -54,10 +56,14 @@ class Subject(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False, help_text="Full-text search document, maintained by the search app")
 
     class Meta:
         ordering = ['name']
         unique_together = ['curriculum', 'class_level', 'name']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='subject_search_vector_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.class_level.name})"
@@ -122,10 +128,14 @@ class Topic(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False, help_text="Full-text search document, maintained by the search app")
 
     class Meta:
         ordering = ['order', 'name']
         unique_together = ['subject', 'branch', 'name']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='topic_search_vector_idx'),
+        ]
 
     def __str__(self):
         if self.branch:
@@ -226,10 +236,14 @@ class Note(models.Model):
     updated_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, related_name='updated_notes')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False, help_text="Full-text search document, maintained by the search app")
 
     class Meta:
         ordering = ['-updated_at']
         unique_together = ['topic', 'subtopic', 'title']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='note_search_vector_idx'),
+        ]
 
     def __str__(self):
         if self.subtopic:
@@ -311,6 +325,10 @@ class NoteCompletion(models.Model):
     class Meta:
         unique_together = ['user', 'note']
         ordering = ['-created_at']
+        indexes = [
+            # Serves the newest-first activity feed
+            models.Index(fields=['user', '-created_at', '-id'], name='note_completion_feed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.note.title}"
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import ContentVersion
+from .models import Curriculum, ClassLevel, Subject, Branch, Topic, SubTopic, Note
+from .cache import CurriculumMap
+
+
+@receiver(post_save, sender=Curriculum)
+@receiver(post_delete, sender=Curriculum)
+@receiver(post_save, sender=ClassLevel)
+@receiver(post_delete, sender=ClassLevel)
+def curriculum_structure_changed(sender, instance, **kwargs):
+    """Rebuild the cached curriculum map when a curriculum or class level changes."""
+    transaction.on_commit(CurriculumMap.invalidate)
+
+
+@receiver(post_save, sender=Curriculum)
+@receiver(post_delete, sender=Curriculum)
+@receiver(post_save, sender=ClassLevel)
+@receiver(post_delete, sender=ClassLevel)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=SubTopic)
+@receiver(post_delete, sender=SubTopic)
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def catalogue_changed(sender, instance, **kwargs):
+    """Move to a new content version when any level of the catalogue changes."""
+    transaction.on_commit(ContentVersion.bump)
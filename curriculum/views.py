@@ -2,12 +2,17 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import Http404
 
-from .models import Curriculum, ClassLevel, Subject, Branch, Topic, SubTopic, Note
+from .models import Note
+from .cache import CurriculumTree, ANY_BRANCH
+from core.cache import cache_public_page
+from core.context_processors import content_cache
+from subscription.entitlements import get_entitlements
 
 
+@cache_public_page()
 def curriculum_list(request):
     """View for listing all available curricula."""
-    curricula = Curriculum.objects.filter(is_active=True)
+    curricula = CurriculumTree.get().curricula
 
     # If user is authenticated, filter curricula based on subscription
     if request.user.is_authenticated:
@@ -15,54 +20,40 @@ def curriculum_list(request):
         if request.user.is_staff or request.user.is_superuser:
             pass  # No filtering needed
         else:
-            # Get user's active subscription
-            from subscription.models import Subscription
-            from django.utils import timezone
+            entitlements = get_entitlements(request)
 
-            active_subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
-
-            if active_subscription:
+            if entitlements.has_subscription:
                 # If tier three, show all curricula
-                if active_subscription.plan.all_curriculums:
+                if entitlements.all_curriculums:
                     pass  # No filtering needed
                 else:
                     # Get the curricula the user has access to
-                    accessible_curricula_ids = active_subscription.curriculum_accesses.values_list('curriculum_id', flat=True)
-                    curricula = curricula.filter(id__in=accessible_curricula_ids)
+                    accessible_curriculum_ids = set(entitlements.accessible_curriculum_ids)
+                    curricula = [c for c in curricula if c.id in accessible_curriculum_ids]
             else:
                 # No active subscription, show only free tier curriculum
-                from subscription.models import SubscriptionPlan, CurriculumAccess
-
-                # Find a free subscription to determine what's available in free tier
-                free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-                if free_plan:
-                    # Find a sample curriculum access for the free tier
-                    sample_access = CurriculumAccess.objects.filter(
-                        subscription__plan=free_plan
-                    ).first()
-
-                    if sample_access:
-                        free_curriculum = sample_access.curriculum
-                        curricula = curricula.filter(id=free_curriculum.id)
-                    else:
-                        curricula = curricula.none()  # No free curriculum defined
+                free_curriculum_id, _ = entitlements.free_sample
+                if free_curriculum_id:
+                    curricula = [c for c in curricula if c.id == free_curriculum_id]
                 else:
-                    curricula = curricula.none()  # No free plan defined
+                    curricula = []  # No free curriculum defined
 
     context = {
         'curricula': curricula,
     }
+    # The template's cache fragments vary on these keys; pass them here as well so they
+    # are set even under settings modules without the content_cache context processor
+    context.update(content_cache(request))
     return render(request, 'curriculum/curriculum_list.html', context)
 
 
 def class_level_list(request, curriculum_code):
     """View for listing all class levels for a specific curriculum."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_levels = ClassLevel.objects.filter(curriculum=curriculum, is_active=True).order_by('level_order')
+    tree = CurriculumTree.get()
+    curriculum = tree.get_curriculum(curriculum_code)
+    if curriculum is None:
+        raise Http404("No curriculum matches the given query.")
+    class_levels = tree.class_levels(curriculum)
 
     # If user is authenticated, filter class levels based on subscription
     if request.user.is_authenticated:
@@ -70,50 +61,31 @@ def class_level_list(request, curriculum_code):
         if request.user.is_staff or request.user.is_superuser:
             pass  # No filtering needed
         else:
-            # Get user's active subscription
-            from subscription.models import Subscription
-            from django.utils import timezone
-
-            active_subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
+            entitlements = get_entitlements(request)
 
-            if active_subscription:
+            if entitlements.has_subscription:
                 # If tier three or tier two, show all class levels for this curriculum
-                if active_subscription.plan.all_curriculums or active_subscription.plan.all_grade_levels:
+                if entitlements.all_curriculums or entitlements.all_grade_levels:
                     # Check if user has access to this curriculum
-                    if active_subscription.has_access_to_curriculum(curriculum):
+                    if entitlements.has_access_to_curriculum(curriculum.id):
                         pass  # No filtering needed
                     else:
-                        class_levels = class_levels.none()  # No access to this curriculum
+                        class_levels = []  # No access to this curriculum
                 else:
                     # Get the class levels the user has access to
-                    accessible_class_level_ids = active_subscription.curriculum_accesses.filter(
-                        curriculum=curriculum
-                    ).values_list('class_level_id', flat=True)
-                    class_levels = class_levels.filter(id__in=accessible_class_level_ids)
+                    accessible_class_level_ids = {
+                        class_level_id
+                        for curriculum_id, class_level_id in entitlements.access_pairs
+                        if curriculum_id == curriculum.id
+                    }
+                    class_levels = [cl for cl in class_levels if cl.id in accessible_class_level_ids]
             else:
                 # No active subscription, show only free tier class level
-                from subscription.models import SubscriptionPlan, CurriculumAccess
-
-                # Find a free subscription to determine what's available in free tier
-                free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-                if free_plan:
-                    # Find a sample curriculum access for the free tier
-                    sample_access = CurriculumAccess.objects.filter(
-                        subscription__plan=free_plan,
-                        curriculum=curriculum
-                    ).first()
-
-                    if sample_access and sample_access.class_level:
-                        free_class_level = sample_access.class_level
-                        class_levels = class_levels.filter(id=free_class_level.id)
-                    else:
-                        class_levels = class_levels.none()  # No free class level defined
+                free_class_level_id = entitlements.free_class_level_id_for(curriculum.id)
+                if free_class_level_id:
+                    class_levels = [cl for cl in class_levels if cl.id == free_class_level_id]
                 else:
-                    class_levels = class_levels.none()  # No free plan defined
+                    class_levels = []  # No free class level defined
 
     context = {
         'curriculum': curriculum,
@@ -124,9 +96,9 @@ def class_level_list(request, curriculum_code):
 
 def subject_list(request, curriculum_code, class_level_id):
     """View for listing all subjects for a specific class level."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subjects = Subject.objects.filter(curriculum=curriculum, class_level=class_level, is_active=True).order_by('name')
+    tree = CurriculumTree.get()
+    curriculum, class_level = tree.resolve(curriculum_code, class_level_id)[:2]
+    subjects = tree.subjects(class_level)
 
     context = {
         'curriculum': curriculum,
@@ -138,15 +110,14 @@ def subject_list(request, curriculum_code, class_level_id):
 
 def subject_detail(request, curriculum_code, class_level_id, subject_slug):
     """View for showing details of a specific subject."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subject = get_object_or_404(Subject, slug=subject_slug, curriculum=curriculum, class_level=class_level, is_active=True)
+    tree = CurriculumTree.get()
+    curriculum, class_level, subject = tree.resolve(curriculum_code, class_level_id, subject_slug)[:3]
 
     # Get branches if any
-    branches = Branch.objects.filter(subject=subject, is_active=True).order_by('name')
+    branches = tree.branches(subject)
 
     # Get topics that don't belong to any branch
-    topics = Topic.objects.filter(subject=subject, branch=None, is_active=True).order_by('order', 'name')
+    topics = tree.topics(subject)
 
     # Get quizzes for this subject
     from quiz.models import Quiz
@@ -160,7 +131,7 @@ def subject_detail(request, curriculum_code, class_level_id, subject_slug):
     # Get user progress if authenticated
     progress = None
     completed_topics = 0
-    total_topics = topics.count()
+    total_topics = len(topics)
 
     if request.user.is_authenticated:
         from core.models import UserProgress
@@ -198,13 +169,13 @@ def subject_detail(request, curriculum_code, class_level_id, subject_slug):
 
 def branch_detail(request, curriculum_code, class_level_id, subject_slug, branch_slug):
     """View for showing details of a specific branch."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subject = get_object_or_404(Subject, slug=subject_slug, curriculum=curriculum, class_level=class_level, is_active=True)
-    branch = get_object_or_404(Branch, slug=branch_slug, subject=subject, is_active=True)
+    tree = CurriculumTree.get()
+    curriculum, class_level, subject, branch = tree.resolve(
+        curriculum_code, class_level_id, subject_slug, branch_slug=branch_slug
+    )[:4]
 
     # Get topics for this branch
-    topics = Topic.objects.filter(subject=subject, branch=branch, is_active=True).order_by('order', 'name')
+    topics = tree.topics(subject, branch)
 
     context = {
         'curriculum': curriculum,
@@ -218,13 +189,12 @@ def branch_detail(request, curriculum_code, class_level_id, subject_slug, branch
 
 def topic_detail(request, curriculum_code, class_level_id, subject_slug, topic_slug):
     """View for showing details of a specific topic (without branch)."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subject = get_object_or_404(Subject, slug=subject_slug, curriculum=curriculum, class_level=class_level, is_active=True)
-    topic = get_object_or_404(Topic, slug=topic_slug, subject=subject, branch=None, is_active=True)
+    tree = CurriculumTree.get()
+    path = tree.resolve(curriculum_code, class_level_id, subject_slug, topic_slug=topic_slug)
+    curriculum, class_level, subject, topic = path.curriculum, path.class_level, path.subject, path.topic
 
     # Get subtopics if any
-    subtopics = SubTopic.objects.filter(topic=topic, is_active=True).order_by('order', 'name')
+    subtopics = tree.subtopics(topic)
 
     # Get notes directly associated with this topic (not with subtopics)
     notes = Note.objects.filter(topic=topic, subtopic=None, is_published=True).order_by('-updated_at')
@@ -240,19 +210,7 @@ def topic_detail(request, curriculum_code, class_level_id, subject_slug, topic_s
     )[:5]  # Limit to 5 quizzes for the sidebar
 
     # Get previous and next topics for navigation
-    prev_topic = Topic.objects.filter(
-        subject=subject,
-        branch=None,
-        order__lt=topic.order,
-        is_active=True
-    ).order_by('-order').first()
-
-    next_topic = Topic.objects.filter(
-        subject=subject,
-        branch=None,
-        order__gt=topic.order,
-        is_active=True
-    ).order_by('order').first()
+    prev_topic, next_topic = tree.topic_siblings(topic)
 
     # Get user progress if authenticated
     progress = None
@@ -284,14 +242,13 @@ def topic_detail(request, curriculum_code, class_level_id, subject_slug, topic_s
 
 def branch_topic_detail(request, curriculum_code, class_level_id, subject_slug, branch_slug, topic_slug):
     """View for showing details of a specific topic (with branch)."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subject = get_object_or_404(Subject, slug=subject_slug, curriculum=curriculum, class_level=class_level, is_active=True)
-    branch = get_object_or_404(Branch, slug=branch_slug, subject=subject, is_active=True)
-    topic = get_object_or_404(Topic, slug=topic_slug, subject=subject, branch=branch, is_active=True)
+    tree = CurriculumTree.get()
+    curriculum, class_level, subject, branch, topic = tree.resolve(
+        curriculum_code, class_level_id, subject_slug, branch_slug=branch_slug, topic_slug=topic_slug
+    )[:5]
 
     # Get subtopics if any
-    subtopics = SubTopic.objects.filter(topic=topic, is_active=True).order_by('order', 'name')
+    subtopics = tree.subtopics(topic)
 
     # Get notes directly associated with this topic (not with subtopics)
     notes = Note.objects.filter(topic=topic, subtopic=None, is_published=True).order_by('-updated_at')
@@ -310,11 +267,10 @@ def branch_topic_detail(request, curriculum_code, class_level_id, subject_slug,
 
 def subtopic_detail(request, curriculum_code, class_level_id, subject_slug, topic_slug, subtopic_slug):
     """View for showing details of a specific subtopic (without branch)."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subject = get_object_or_404(Subject, slug=subject_slug, curriculum=curriculum, class_level=class_level, is_active=True)
-    topic = get_object_or_404(Topic, slug=topic_slug, subject=subject, branch=None, is_active=True)
-    subtopic = get_object_or_404(SubTopic, slug=subtopic_slug, topic=topic, is_active=True)
+    tree = CurriculumTree.get()
+    path = tree.resolve(curriculum_code, class_level_id, subject_slug, topic_slug=topic_slug, subtopic_slug=subtopic_slug)
+    curriculum, class_level, subject = path.curriculum, path.class_level, path.subject
+    topic, subtopic = path.topic, path.subtopic
 
     # Get notes associated with this subtopic
     notes = Note.objects.filter(topic=topic, subtopic=subtopic, is_published=True).order_by('-updated_at')
@@ -330,17 +286,7 @@ def subtopic_detail(request, curriculum_code, class_level_id, subject_slug, topi
     )[:5]  # Limit to 5 quizzes for the sidebar
 
     # Get next and previous subtopics for navigation
-    next_subtopic = SubTopic.objects.filter(
-        topic=topic,
-        order__gt=subtopic.order,
-        is_active=True
-    ).order_by('order').first()
-
-    prev_subtopic = SubTopic.objects.filter(
-        topic=topic,
-        order__lt=subtopic.order,
-        is_active=True
-    ).order_by('-order').first()
+    prev_subtopic, next_subtopic = tree.subtopic_siblings(subtopic)
 
     # Get user progress if authenticated
     progress = None
@@ -372,10 +318,10 @@ def subtopic_detail(request, curriculum_code, class_level_id, subject_slug, topi
 
 def note_detail(request, curriculum_code, class_level_id, subject_slug, topic_slug, note_slug):
     """View for showing a specific note (without subtopic)."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subject = get_object_or_404(Subject, slug=subject_slug, curriculum=curriculum, class_level=class_level, is_active=True)
-    topic = get_object_or_404(Topic, slug=topic_slug, subject=subject, is_active=True)
+    path = CurriculumTree.get().resolve(
+        curriculum_code, class_level_id, subject_slug, topic_slug=topic_slug, topic_branch=ANY_BRANCH
+    )
+    curriculum, class_level, subject, topic = path.curriculum, path.class_level, path.subject, path.topic
     note = get_object_or_404(Note, slug=note_slug, topic=topic, subtopic=None, is_published=True)
 
     # Check if premium content is accessible
@@ -445,11 +391,12 @@ def note_detail(request, curriculum_code, class_level_id, subject_slug, topic_sl
 
 def subtopic_note_detail(request, curriculum_code, class_level_id, subject_slug, topic_slug, subtopic_slug, note_slug):
     """View for showing a specific note (with subtopic)."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subject = get_object_or_404(Subject, slug=subject_slug, curriculum=curriculum, class_level=class_level, is_active=True)
-    topic = get_object_or_404(Topic, slug=topic_slug, subject=subject, is_active=True)
-    subtopic = get_object_or_404(SubTopic, slug=subtopic_slug, topic=topic, is_active=True)
+    path = CurriculumTree.get().resolve(
+        curriculum_code, class_level_id, subject_slug, topic_slug=topic_slug,
+        subtopic_slug=subtopic_slug, topic_branch=ANY_BRANCH
+    )
+    curriculum, class_level, subject = path.curriculum, path.class_level, path.subject
+    topic, subtopic = path.topic, path.subtopic
     note = get_object_or_404(Note, slug=note_slug, topic=topic, subtopic=subtopic, is_published=True)
 
     # Check if premium content is accessible
@@ -524,7 +471,9 @@ def mark_topic_started(request, topic_id):
     from django.http import HttpResponse
     from django.template.loader import render_to_string
 
-    topic = get_object_or_404(Topic, id=topic_id, is_active=True)
+    topic = CurriculumTree.get().get_topic_by_id(topic_id)
+    if topic is None:
+        raise Http404("No topic matches the given query.")
 
     # Get curriculum, class level, and subject
     subject = topic.subject
@@ -564,7 +513,9 @@ def mark_subtopic_started(request, subtopic_id):
     from django.http import HttpResponse
     from django.template.loader import render_to_string
 
-    subtopic = get_object_or_404(SubTopic, id=subtopic_id, is_active=True)
+    subtopic = CurriculumTree.get().get_subtopic_by_id(subtopic_id)
+    if subtopic is None:
+        raise Http404("No subtopic matches the given query.")
     topic = subtopic.topic
 
     # Get curriculum, class level, and subject
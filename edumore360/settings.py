@@ -101,7 +101,7 @@ MIDDLEWARE = [
     'django_htmx.middleware.HtmxMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'subscription.middleware.SubscriptionMiddleware',  # Subscription restrictions
-    # 'analytics.middleware.AnalyticsMiddleware',  # Analytics tracking - DISABLED for memory optimization
+    'analytics.middleware.AnalyticsMiddleware',  # Analytics tracking, buffered and written in batches
 ]
 
 ROOT_URLCONF = 'edumore360.urls'
@@ -118,6 +118,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.notifications',
+                'core.context_processors.content_cache',
             ],
         },
     },
@@ -304,6 +305,21 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'expire-quiz-attempts': {
+        'task': 'quiz.tasks.expire_quiz_attempts',
+        'schedule': 300.0,  # Every 5 minutes
+    },
+}
+
+# Analytics ingestion: page views are buffered in memory and written in batches
+ANALYTICS_BUFFER_SIZE = 10000  # Oldest page views are dropped beyond this
+ANALYTICS_BATCH_SIZE = 500
+ANALYTICS_FLUSH_INTERVAL = 5  # Seconds between background flushes
+
+# Offline IP geolocation: a MaxMind .mmdb file or a CSV of IP ranges (see analytics.geoip)
+ANALYTICS_GEOIP_DATABASE = env('GEOIP_DATABASE', default='')
+ANALYTICS_GEOIP_CACHE_SIZE = 4096  # Resolved addresses kept per process
 
 # Summernote settings
 SUMMERNOTE_CONFIG = {
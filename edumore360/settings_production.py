@@ -135,7 +135,6 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 # Admin media prefix
 ADMIN_MEDIA_PREFIX = '/static/admin/'
 
-# Disable analytics middleware in production for better performance
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -147,8 +146,8 @@ MIDDLEWARE = [
     'django_htmx.middleware.HtmxMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'subscription.middleware.SubscriptionMiddleware',
-    # Analytics middleware disabled for performance
-    # 'analytics.middleware.AnalyticsMiddleware',
+    # Page views are buffered and written in batches off the request thread
+    'analytics.middleware.AnalyticsMiddleware',
 ]
 
 # Paystack settings (for payments)
@@ -663,7 +663,7 @@ def edit_curriculum(request, curriculum_id):
 @admin_required
 def site_settings_general(request):
     """View for general site settings."""
-    settings = SystemConfiguration.get_settings()
+    settings = SystemConfiguration.get_for_update()
 
     if request.method == 'POST':
         # Update settings
@@ -692,7 +692,7 @@ def site_settings_general(request):
 @admin_required
 def site_settings_email(request):
     """View for email settings."""
-    settings = SystemConfiguration.get_settings()
+    settings = SystemConfiguration.get_for_update()
 
     if request.method == 'POST':
         # Update settings
@@ -745,7 +745,7 @@ def site_settings_test_email(request):
 @admin_required
 def site_settings_quiz(request):
     """View for quiz settings."""
-    settings = SystemConfiguration.get_settings()
+    settings = SystemConfiguration.get_for_update()
 
     if request.method == 'POST':
         # Update settings
@@ -773,7 +773,7 @@ def site_settings_quiz(request):
 @admin_required
 def site_settings_payment(request):
     """View for payment settings."""
-    settings = SystemConfiguration.get_settings()
+    settings = SystemConfiguration.get_for_update()
 
     if request.method == 'POST':
         # Update settings
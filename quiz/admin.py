@@ -3,6 +3,7 @@ from .models import (
     Question, QuestionChoice, ShortAnswer,
     Quiz, QuizAttempt, QuestionAttempt
 )
+from .cache import QuestionBundleCache
 
 
 class QuestionChoiceInline(admin.TabularInline):
@@ -27,6 +28,11 @@ class QuestionAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     inlines = [QuestionChoiceInline, ShortAnswerInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Choices and answers are saved after the question, so refresh the cached bundle
+        QuestionBundleCache.invalidate(form.instance.pk)
+
     def text_preview(self, obj):
         return obj.text[:50] + ('...' if len(obj.text) > 50 else '')
     text_preview.short_description = 'Question Text'
@@ -56,7 +62,7 @@ class QuizAdmin(admin.ModelAdmin):
 class QuestionAttemptInline(admin.TabularInline):
     model = QuestionAttempt
     extra = 0
-    readonly_fields = ('question', 'selected_choice', 'provided_answer', 'is_correct', 'answered_at', 'time_spent', 'timed_out')
+    readonly_fields = ('question', 'selected_choice', 'provided_answer', 'is_correct', 'is_answered', 'answered_at', 'time_spent', 'timed_out')
     can_delete = False
     max_num = 0
 
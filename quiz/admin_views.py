@@ -11,6 +11,7 @@ import logging
 from django.utils.text import slugify
 
 from .models import Quiz, Question, QuestionChoice, ShortAnswer
+from .cache import QuestionBundleCache
 from curriculum.models import Curriculum, ClassLevel, Subject, Topic, SubTopic
 
 # Set up logging
@@ -211,6 +212,7 @@ def delete_question(request, question_id):
 
     try:
         question.delete()
+        QuestionBundleCache.invalidate(question_id)
         return JsonResponse({
             'success': True,
             'message': 'Question deleted successfully.',
@@ -300,7 +302,7 @@ def update_question(request, question_id):
             # Handle multiple choice questions
             if question_type == 'multiple_choice':
                 # Delete existing choices
-                question.questionchoice_set.all().delete()
+                question.choices.all().delete()
 
                 # Add new choices
                 choices = request.POST.getlist('choices[]')
@@ -317,7 +319,7 @@ def update_question(request, question_id):
             # Handle short answer questions
             elif question_type == 'short_answer':
                 # Delete existing answers
-                question.shortanswer_set.all().delete()
+                question.short_answers.all().delete()
 
                 # Add new answers
                 answers = request.POST.getlist('answers[]')
@@ -329,6 +331,9 @@ def update_question(request, question_id):
                             text=answer,
                         )
 
+            # Drop the cached bundle now that the choices and answers have changed
+            QuestionBundleCache.invalidate(question.id)
+
         return JsonResponse({
             'success': True,
             'message': 'Question updated successfully.',
@@ -0,0 +1,160 @@
+"""
+Caching for the quiz app.
+This module keeps read-only snapshots of questions for the quiz-taking pages.
+"""
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.cache import LRUCache
+from .models import Question, QuestionChoice, ShortAnswer
+from .validators import ShortAnswerMatcher
+
+
+class QuestionBundle:
+    """Read-only snapshot of a question with its choices and accepted answers."""
+
+    def __init__(self, question_id, question_type, text, explanation, choices, short_answers):
+        self.question_id = question_id
+        self.question_type = question_type
+        self.text = text
+        self.explanation = explanation
+        self.choices = tuple(choices)
+        self.short_answers = tuple(short_answers)
+        self._matcher = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a bundle from the primitive form stored in the shared cache."""
+        question_id = data['id']
+        return cls(
+            question_id=question_id,
+            question_type=data['question_type'],
+            text=data['text'],
+            explanation=data['explanation'],
+            choices=[
+                QuestionChoice(id=choice_id, question_id=question_id, text=text, is_correct=is_correct)
+                for choice_id, text, is_correct in data['choices']
+            ],
+            short_answers=[
+                ShortAnswer(id=answer_id, question_id=question_id, text=text, is_exact_match=is_exact_match)
+                for answer_id, text, is_exact_match in data['short_answers']
+            ],
+        )
+
+    def to_dict(self):
+        """Return the primitive form stored in the shared cache."""
+        return {
+            'id': self.question_id,
+            'question_type': self.question_type,
+            'text': self.text,
+            'explanation': self.explanation,
+            'choices': [(c.id, c.text, c.is_correct) for c in self.choices],
+            'short_answers': [(a.id, a.text, a.is_exact_match) for a in self.short_answers],
+        }
+
+    def get_choice(self, choice_id):
+        """Return the choice with the given ID, or None if it is not part of this question."""
+        try:
+            choice_id = int(choice_id)
+        except (TypeError, ValueError):
+            return None
+        for choice in self.choices:
+            if choice.id == choice_id:
+                return choice
+        return None
+
+    @property
+    def matcher(self):
+        """Compiled short-answer matcher, built on first use and kept with the bundle."""
+        if self._matcher is None:
+            self._matcher = ShortAnswerMatcher(self.short_answers)
+        return self._matcher
+
+    @property
+    def correct_choice(self):
+        """Return the correct choice for a multiple-choice question."""
+        for choice in self.choices:
+            if choice.is_correct:
+                return choice
+        return None
+
+    @property
+    def correct_answer_text(self):
+        """Return the correct answer text shown in feedback."""
+        if self.question_type == 'multiple_choice':
+            correct_choice = self.correct_choice
+            return correct_choice.text if correct_choice else None
+        if self.short_answers:
+            return ", ".join(answer.text for answer in self.short_answers)
+        return None
+
+
+class QuestionBundleCache:
+    """
+    Read-through cache of question bundles.
+
+    Bundles are keyed by question ID and ``updated_at``, so saving a question
+    makes older bundles unreachable. A per-process LRU sits in front of the
+    Django cache backend.
+    """
+
+    CACHE_PREFIX = 'quiz:question_bundle'
+    CACHE_TIMEOUT = 60 * 60 * 24
+    local_cache = LRUCache(maxsize=1024)
+
+    @classmethod
+    def make_key(cls, question):
+        return f"{cls.CACHE_PREFIX}:{question.id}:{question.updated_at.timestamp()}"
+
+    @classmethod
+    def get(cls, question):
+        """
+        Get the bundle for a question, loading and caching it on a miss.
+
+        Args:
+            question: The Question object
+
+        Returns:
+            A QuestionBundle
+        """
+        key = cls.make_key(question)
+
+        bundle = cls.local_cache.get(key)
+        if bundle is not None:
+            return bundle
+
+        data = cache.get(key)
+        if data is None:
+            data = cls.build(question).to_dict()
+            cache.set(key, data, cls.CACHE_TIMEOUT)
+
+        bundle = QuestionBundle.from_dict(data)
+        cls.local_cache.set(key, bundle)
+        return bundle
+
+    @staticmethod
+    def build(question):
+        """Load a bundle for a question from the database."""
+        return QuestionBundle(
+            question_id=question.id,
+            question_type=question.question_type,
+            text=question.text,
+            explanation=question.explanation,
+            choices=QuestionChoice.objects.filter(question_id=question.id).order_by('id'),
+            short_answers=ShortAnswer.objects.filter(question_id=question.id).order_by('id'),
+        )
+
+    @classmethod
+    def invalidate(cls, question_id):
+        """
+        Invalidate the bundle for a question after its choices or answers change.
+
+        Bumping ``updated_at`` moves every process onto a new cache key.
+
+        Args:
+            question_id: The ID of the question
+        """
+        Question.objects.filter(pk=question_id).update(updated_at=timezone.now())
+        prefix = f"{cls.CACHE_PREFIX}:{question_id}:"
+        cls.local_cache.delete_matching(lambda key: key.startswith(prefix))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from quiz.services import QuestionStatService
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds per-user question and topic statistics from answered question attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Only rebuild statistics for the user with this email address',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(quiz_attempts__isnull=False).distinct()
+        if options['user']:
+            users = users.filter(email=options['user'])
+
+        rebuilt = 0
+        for user in users.iterator():
+            with transaction.atomic():
+                QuestionStatService.rebuild_for_user(user)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt question statistics for {rebuilt} users'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_quiz_is_featured'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='question_plan',
+            field=models.JSONField(blank=True, default=list, help_text='Ordered list of question IDs for this attempt'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_answered_question_attempts(apps, schema_editor):
+    QuestionAttempt = apps.get_model('quiz', 'QuestionAttempt')
+    QuestionAttempt.objects.filter(
+        models.Q(selected_choice__isnull=False) |
+        ~models.Q(provided_answer='') |
+        models.Q(timed_out=True) |
+        models.Q(is_correct=True)
+    ).update(is_answered=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0003_note_doc_document_note_extracted_text_note_file_type_and_more'),
+        ('quiz', '0007_quizattempt_question_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionattempt',
+            name='is_answered',
+            field=models.BooleanField(default=False, help_text='Whether an answer has been submitted for this question'),
+        ),
+        migrations.CreateModel(
+            name='UserQuestionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of quiz attempts in which this question was answered')),
+                ('correct', models.PositiveIntegerField(default=0, help_text='Number of those answers that were correct')),
+                ('last_is_correct', models.BooleanField(default=False)),
+                ('last_answered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to='quiz.question')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_question_stats', to='curriculum.topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'topic'], name='quiz_uqstat_user_topic_idx')],
+                'unique_together': {('user', 'question')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserTopicStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('questions_seen', models.PositiveIntegerField(default=0, help_text='Number of distinct questions answered')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('last_answered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to='curriculum.topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'topic')},
+            },
+        ),
+        migrations.RunPython(mark_answered_question_attempts, migrations.RunPython.noop),
+    ]
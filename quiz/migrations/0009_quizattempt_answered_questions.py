@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_answered_questions(apps, schema_editor):
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    QuestionAttempt = apps.get_model('quiz', 'QuestionAttempt')
+    answered = QuestionAttempt.objects.filter(
+        quiz_attempt=OuterRef('pk'),
+        is_answered=True
+    ).order_by().values('quiz_attempt').annotate(total=Count('id')).values('total')
+    QuizAttempt.objects.update(answered_questions=Coalesce(Subquery(answered), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_user_question_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='answered_questions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_answered_questions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_quizattempt_answered_questions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['user', 'quiz', '-started_at'], name='quiz_attempt_in_progress_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['started_at'], name='quiz_attempt_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_quizattempt_in_progress_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', '-started_at', '-id'], name='quiz_attempt_feed_idx'),
+        ),
+    ]
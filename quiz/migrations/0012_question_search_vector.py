@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+from core.operations import PostgreSQLOnly
+
+
+def populate_search_vectors(apps, schema_editor):
+    # The document is spelled out here rather than imported from the search
+    # app, so later changes to it cannot change what this migration writes
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Question = apps.get_model('quiz', 'Question')
+    Question.objects.using(schema_editor.connection.alias).update(
+        search_vector=SearchVector('text', weight='A') + SearchVector('explanation', weight='B')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0005_search_vectors'),
+        ('quiz', '0011_quizattempt_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Full-text search document, maintained by the search app', null=True),
+        ),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='question',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='question_search_vector_idx'),
+        )),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
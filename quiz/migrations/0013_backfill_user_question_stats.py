@@ -0,0 +1,79 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:02
+
+from itertools import islice
+
+from django.db import migrations
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+
+
+def bulk_create_in_batches(model, objs, batch_size=500):
+    objs = iter(objs)
+    while batch := list(islice(objs, batch_size)):
+        model.objects.bulk_create(batch)
+
+
+def rebuild_user_question_stats(apps, schema_editor):
+    # Same aggregation as QuestionStatService.rebuild_for_user, for every user at once
+    QuestionAttempt = apps.get_model('quiz', 'QuestionAttempt')
+    UserQuestionStat = apps.get_model('quiz', 'UserQuestionStat')
+    UserTopicStat = apps.get_model('quiz', 'UserTopicStat')
+
+    UserQuestionStat.objects.all().delete()
+    UserTopicStat.objects.all().delete()
+
+    answered = QuestionAttempt.objects.filter(is_answered=True)
+
+    # The most recent answer of each user to each question gives its last result
+    latest = answered.filter(
+        quiz_attempt__user_id=OuterRef('quiz_attempt__user_id'),
+        question_id=OuterRef('question_id')
+    ).order_by('-answered_at', '-id')
+    rows = answered.values(
+        'quiz_attempt__user_id', 'question_id', 'question__topic_id'
+    ).annotate(
+        attempts=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True)),
+        last_answered_at=Max('answered_at'),
+        last_is_correct=Subquery(latest.values('is_correct')[:1])
+    ).order_by()
+    bulk_create_in_batches(UserQuestionStat, (
+        UserQuestionStat(
+            user_id=row['quiz_attempt__user_id'],
+            question_id=row['question_id'],
+            topic_id=row['question__topic_id'],
+            attempts=row['attempts'],
+            correct=row['correct'],
+            last_is_correct=bool(row['last_is_correct']),
+            last_answered_at=row['last_answered_at'],
+        )
+        for row in rows.iterator()
+    ))
+
+    topic_rows = UserQuestionStat.objects.values('user_id', 'topic_id').annotate(
+        questions_seen=Count('id'),
+        total_attempts=Sum('attempts'),
+        total_correct=Sum('correct'),
+        last_answered_at=Max('last_answered_at')
+    ).order_by()
+    bulk_create_in_batches(UserTopicStat, (
+        UserTopicStat(
+            user_id=row['user_id'],
+            topic_id=row['topic_id'],
+            questions_seen=row['questions_seen'],
+            attempts=row['total_attempts'],
+            correct=row['total_correct'],
+            last_answered_at=row['last_answered_at'],
+        )
+        for row in topic_rows.iterator()
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_question_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_user_question_stats, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from django_summernote.fields import SummernoteTextField
 
@@ -38,9 +41,13 @@ class Question(models.Model):
     created_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, related_name='created_questions')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False, help_text="Full-text search document, maintained by the search app")
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='question_search_vector_idx'),
+        ]
 
     def __str__(self):
         return self.text[:50] + ('...' if len(self.text) > 50 else '')
@@ -151,9 +158,28 @@ class QuizAttempt(models.Model):
     score = models.PositiveIntegerField(default=0)
     total_questions = models.PositiveIntegerField(default=0)
     correct_answers = models.PositiveIntegerField(default=0)
+    answered_questions = models.PositiveIntegerField(default=0)
+
+    # Ordered question IDs drawn once when the attempt is created
+    question_plan = models.JSONField(default=list, blank=True, help_text="Ordered list of question IDs for this attempt")
 
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            # Partial indexes keep the live set of in-progress attempts small
+            models.Index(
+                fields=['user', 'quiz', '-started_at'],
+                condition=models.Q(status='in_progress'),
+                name='quiz_attempt_in_progress_idx'
+            ),
+            models.Index(
+                fields=['started_at'],
+                condition=models.Q(status='in_progress'),
+                name='quiz_attempt_expiry_idx'
+            ),
+            # Serves the newest-first activity feed
+            models.Index(fields=['user', '-started_at', '-id'], name='quiz_attempt_feed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.quiz.title} ({self.started_at.strftime('%Y-%m-%d %H:%M')})"
@@ -177,12 +203,45 @@ class QuizAttempt(models.Model):
             return (self.completed_at - self.started_at).total_seconds() // 60
         return (timezone.now() - self.started_at).total_seconds() // 60
 
+    def get_question_id_at(self, position):
+        """Return the question ID at the given zero-based position in the plan."""
+        if 0 <= position < len(self.question_plan):
+            return self.question_plan[position]
+        return None
+
+    def get_question_position(self, question_id):
+        """Return the zero-based position of a question in the plan, or None."""
+        try:
+            return self.question_plan.index(int(question_id))
+        except (ValueError, TypeError):
+            return None
+
+    def record_answer(self, correct_delta, answered_delta):
+        """
+        Apply the score change from an answered question in a single UPDATE.
+
+        The counters are then reloaded, so they include concurrent answers;
+        call this inside the transaction that saves the answer.
+
+        Args:
+            correct_delta: Change in the number of correct answers (-1, 0 or 1)
+            answered_delta: Change in the number of answered questions (0 or 1)
+        """
+        updates = {
+            'correct_answers': F('correct_answers') + correct_delta,
+            'answered_questions': F('answered_questions') + answered_delta,
+        }
+        if self.total_questions > 0:
+            updates['score'] = (F('correct_answers') + correct_delta) * 100 / self.total_questions
+        QuizAttempt.objects.filter(pk=self.pk).update(**updates)
+        self.refresh_from_db(fields=['correct_answers', 'answered_questions', 'score'])
+
     def complete(self):
         """Mark the quiz attempt as completed."""
         if self.status == 'in_progress':
             self.status = 'completed'
             self.completed_at = timezone.now()
-            self.save()
+            self.save(update_fields=['status', 'completed_at'])
 
 
 class QuestionAttempt(models.Model):
@@ -198,6 +257,7 @@ class QuestionAttempt(models.Model):
     provided_answer = models.CharField(max_length=255, blank=True)
 
     is_correct = models.BooleanField(default=False)
+    is_answered = models.BooleanField(default=False, help_text="Whether an answer has been submitted for this question")
     answered_at = models.DateTimeField(auto_now_add=True)
     time_spent = models.PositiveIntegerField(default=0, help_text="Time spent on this question in seconds")
     timed_out = models.BooleanField(default=False, help_text="Whether the user ran out of time for this question")
@@ -207,3 +267,55 @@ class QuestionAttempt(models.Model):
 
     def __str__(self):
         return f"{self.quiz_attempt.user.email} - {self.question.text[:30]}"
+
+
+class UserQuestionStat(models.Model):
+    """Model summarising a user's answers to a single question across all quiz attempts."""
+
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='question_stats')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='user_stats')
+    topic = models.ForeignKey('curriculum.Topic', on_delete=models.CASCADE, related_name='user_question_stats')
+
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of quiz attempts in which this question was answered")
+    correct = models.PositiveIntegerField(default=0, help_text="Number of those answers that were correct")
+    last_is_correct = models.BooleanField(default=False)
+    last_answered_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['user', 'question']
+        indexes = [
+            models.Index(fields=['user', 'topic'], name='quiz_uqstat_user_topic_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.question} ({self.correct}/{self.attempts})"
+
+    @property
+    def incorrect(self):
+        """Number of answers to this question that were incorrect."""
+        return self.attempts - self.correct
+
+
+class UserTopicStat(models.Model):
+    """Model rolling up a user's question statistics for a topic."""
+
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='topic_stats')
+    topic = models.ForeignKey('curriculum.Topic', on_delete=models.CASCADE, related_name='user_stats')
+
+    questions_seen = models.PositiveIntegerField(default=0, help_text="Number of distinct questions answered")
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    last_answered_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['user', 'topic']
+
+    def __str__(self):
+        return f"{self.user.email} - {self.topic.name} ({self.correct}/{self.attempts})"
+
+    @property
+    def success_rate(self):
+        """Proportion of answers in this topic that were correct."""
+        if self.attempts == 0:
+            return 0
+        return self.correct / self.attempts
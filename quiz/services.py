@@ -3,35 +3,112 @@ Services for the quiz app.
 This module contains business logic for the quiz app.
 """
 
+import hashlib
 import random
-from django.db.models import Count, Q, F, Case, When, Value, IntegerField
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (
+    BooleanField, Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
-from .models import Question, Quiz, QuizAttempt, QuestionAttempt
+from .cache import QuestionBundleCache
+from .models import (
+    Question, QuestionChoice, ShortAnswer, Quiz, QuizAttempt, QuestionAttempt,
+    UserQuestionStat, UserTopicStat
+)
+from .validators import ShortAnswerMatcher
+
+
+class QuestionSampler:
+    """
+    In-memory sampler that draws questions by adaptive priority.
+
+    Candidates are bucketed by a priority key derived from the user's success
+    rate, and buckets are drawn in order with a uniform random sample inside
+    the last bucket needed. This gives the same result as ordering the pool by
+    the priority columns followed by a random tiebreak, without sorting the
+    whole pool in the database.
+    """
+
+    DIFFICULTY_WEIGHTS = {'easy': 1, 'medium': 2, 'hard': 3}
+
+    def __init__(self, candidates, seen_ids=(), incorrect_ids=(), success_rate=0.5, rng=None):
+        """
+        Args:
+            candidates: Iterable of (question_id, difficulty) pairs
+            seen_ids: Set of question IDs the user has attempted before
+            incorrect_ids: Set of question IDs the user has answered incorrectly
+            success_rate: The user's overall success rate (0.0 to 1.0)
+            rng: Optional random.Random instance
+        """
+        self.candidates = candidates
+        self.seen_ids = seen_ids
+        self.incorrect_ids = incorrect_ids
+        self.success_rate = success_rate
+        self.rng = rng or random.Random()
+
+    def priority(self, question_id, difficulty):
+        """Return the sort key for a question; lower keys are drawn first."""
+        attempted = 1 if question_id in self.seen_ids else 0
+        incorrect = 1 if question_id in self.incorrect_ids else 0
+        difficulty_weight = self.DIFFICULTY_WEIGHTS.get(difficulty, 2)
+
+        # If user is doing well (>70% correct), prioritize harder questions and new questions
+        # If user is struggling (<50% correct), prioritize easier questions and review incorrect ones
+        if self.success_rate > 0.7:
+            return (attempted, -difficulty_weight)
+        elif self.success_rate < 0.5:
+            return (-incorrect, difficulty_weight)
+        return (attempted, -incorrect)
+
+    def sample(self, count):
+        """
+        Draw up to ``count`` question IDs.
+
+        Args:
+            count: Number of questions to draw
+
+        Returns:
+            A list of question IDs in priority order
+        """
+        buckets = {}
+        for question_id, difficulty in self.candidates:
+            buckets.setdefault(self.priority(question_id, difficulty), []).append(question_id)
+
+        selected = []
+        for key in sorted(buckets):
+            remaining = count - len(selected)
+            if remaining <= 0:
+                break
+            bucket = buckets[key]
+            if len(bucket) > remaining:
+                selected.extend(self.rng.sample(bucket, remaining))
+            else:
+                self.rng.shuffle(bucket)
+                selected.extend(bucket)
+
+        return selected
 
 
 class QuestionRandomizer:
     """Service for randomizing questions for quizzes."""
 
     @staticmethod
-    def get_questions_for_quiz(quiz, user, question_count=None):
+    def get_question_pool(quiz, user):
         """
-        Get randomized questions for a quiz based on quiz settings and user's history.
+        Get the active questions a user may be asked for a quiz.
 
         Args:
             quiz: The Quiz object
             user: The User object
-            question_count: Optional override for the number of questions
 
         Returns:
             A queryset of Question objects
         """
-        if question_count is None:
-            question_count = quiz.question_count
-
-        # Limit questions to prevent memory issues (max 30)
-        question_count = min(question_count, 30)
-
         # Base query to get questions for this quiz
         if quiz.quiz_type == 'general':
             # For general quizzes, get questions from the subject
@@ -55,85 +132,85 @@ class QuestionRandomizer:
         if not user.is_premium:
             questions = questions.filter(is_premium=False)
 
-        # If there aren't enough questions, return all available
-        if questions.count() <= question_count:
-            return questions
+        return questions
 
-        # Get user's question history
-        user_attempts = QuestionAttempt.objects.filter(
-            quiz_attempt__user=user,
-            question__in=questions
-        ).select_related('question')
+    @staticmethod
+    def get_question_ids_for_quiz(quiz, user, question_count=None):
+        """
+        Get an ordered sample of question IDs for a quiz based on the user's history.
+
+        Args:
+            quiz: The Quiz object
+            user: The User object
+            question_count: Optional override for the number of questions
+
+        Returns:
+            A list of question IDs in priority order
+        """
+        if question_count is None:
+            question_count = quiz.question_count
+
+        # Limit questions to prevent memory issues (max 30)
+        question_count = min(question_count, 30)
 
-        # Get questions the user has attempted before
-        attempted_question_ids = user_attempts.values_list('question_id', flat=True)
+        questions = QuestionRandomizer.get_question_pool(quiz, user)
+        candidates = list(questions.values_list('id', 'difficulty'))
 
-        # Get questions the user has answered incorrectly
-        incorrect_question_ids = user_attempts.filter(is_correct=False).values_list('question_id', flat=True)
+        # If there aren't enough questions, return all available
+        if len(candidates) <= question_count:
+            return [question_id for question_id, _ in candidates]
 
-        # Calculate weights for each question
-        # 1. Prioritize questions the user has never seen
-        # 2. Then questions the user has answered incorrectly
-        # 3. Then questions by difficulty (if user is doing well, give harder questions)
+        # Get user's question history from the per-question summary table
+        history = UserQuestionStat.objects.filter(
+            user=user,
+            question__in=questions.values('id')
+        ).values_list('question_id', 'attempts', 'correct')
+
+        seen_ids = set()
+        incorrect_ids = set()
+        correct_count = 0
+        total_count = 0
+        for question_id, attempts, correct in history:
+            seen_ids.add(question_id)
+            if correct < attempts:
+                incorrect_ids.add(question_id)
+            correct_count += correct
+            total_count += attempts
 
         # Get user's overall performance
-        correct_count = user_attempts.filter(is_correct=True).count()
-        total_count = user_attempts.count()
         success_rate = correct_count / total_count if total_count > 0 else 0.5
 
-        # Annotate questions with weights
-        questions = questions.annotate(
-            # Has the user attempted this question before?
-            attempted=Case(
-                When(id__in=attempted_question_ids, then=Value(1)),
-                default=Value(0),
-                output_field=IntegerField()
-            ),
-            # Has the user answered this question incorrectly?
-            incorrect=Case(
-                When(id__in=incorrect_question_ids, then=Value(1)),
-                default=Value(0),
-                output_field=IntegerField()
-            ),
-            # Difficulty weight
-            difficulty_weight=Case(
-                When(difficulty='easy', then=Value(1)),
-                When(difficulty='medium', then=Value(2)),
-                When(difficulty='hard', then=Value(3)),
-                default=Value(2),
-                output_field=IntegerField()
-            )
-        )
+        sampler = QuestionSampler(candidates, seen_ids, incorrect_ids, success_rate)
+        return sampler.sample(question_count)
 
-        # Calculate the final weight for each question
-        # This is a complex formula that balances:
-        # - Showing new questions
-        # - Reviewing incorrect questions
-        # - Adjusting difficulty based on performance
+    @staticmethod
+    def get_questions_for_quiz(quiz, user, question_count=None):
+        """
+        Get randomized questions for a quiz based on quiz settings and user's history.
 
-        # If user is doing well (>70% correct), prioritize harder questions and new questions
-        # If user is struggling (<50% correct), prioritize easier questions and review incorrect ones
-        if success_rate > 0.7:
-            # User is doing well, prioritize harder questions and new content
-            questions = questions.order_by('attempted', '-difficulty_weight', '?')
-        elif success_rate < 0.5:
-            # User is struggling, prioritize easier questions and review incorrect ones
-            questions = questions.order_by('-incorrect', 'difficulty_weight', '?')
-        else:
-            # Balanced approach
-            questions = questions.order_by('attempted', '-incorrect', '?')
+        Args:
+            quiz: The Quiz object
+            user: The User object
+            question_count: Optional override for the number of questions
 
-        # Return the requested number of questions
-        return questions[:question_count]
+        Returns:
+            A queryset of Question objects
+        """
+        question_ids = QuestionRandomizer.get_question_ids_for_quiz(quiz, user, question_count)
+        return Question.objects.filter(id__in=question_ids)
 
     @staticmethod
     def randomize_choices(question, seed=None):
         """
         Randomize the choices for a multiple-choice question.
 
+        With a seed, the order is a stable permutation derived from a hash of
+        the seed, question ID and choice ID, so the same attempt always sees
+        the same order without touching the global random state.
+
         Args:
             question: The Question object
-            seed: Optional random seed for reproducible randomization
+            seed: Optional seed, usually the quiz attempt ID, for reproducible ordering
 
         Returns:
             A list of QuestionChoice objects in random order
@@ -141,23 +218,35 @@ class QuestionRandomizer:
         if question.question_type != 'multiple_choice':
             return []
 
-        choices = list(question.choices.all())
+        choices = QuestionBundleCache.get(question).choices
 
-        if seed is not None:
-            random.seed(seed)
+        if seed is None:
+            return random.sample(choices, len(choices))
 
-        random.shuffle(choices)
-        return choices
+        prefix = f"{seed}:{question.id}:".encode()
+        return sorted(
+            choices,
+            key=lambda choice: hashlib.blake2b(prefix + str(choice.id).encode(), digest_size=8).digest()
+        )
 
 
 class QuizService:
     """Service for managing quizzes."""
 
+    # Largest value QuestionAttempt.time_spent can store
+    MAX_TIME_SPENT = 2147483647
+
+    # How long past its time limit an in-progress attempt is kept open by expire_attempts
+    EXPIRY_GRACE_PERIOD = timedelta(hours=1)
+
     @staticmethod
     def create_quiz_attempt(user, quiz):
         """
         Create a new quiz attempt for a user.
 
+        The questions for the attempt are drawn once here and stored, in order,
+        on the attempt's question plan.
+
         Args:
             user: The User object
             quiz: The Quiz object
@@ -166,21 +255,74 @@ class QuizService:
             A new QuizAttempt object
         """
         # Get randomized questions with memory optimization
-        questions = QuestionRandomizer.get_questions_for_quiz(quiz, user)
+        question_plan = QuestionRandomizer.get_question_ids_for_quiz(quiz, user)
 
-        # Limit questions to prevent memory issues (max 30 questions)
-        max_questions = min(quiz.question_count, 30, questions.count())
+        if quiz.randomize_questions:
+            random.shuffle(question_plan)
 
         # Create the quiz attempt
         quiz_attempt = QuizAttempt.objects.create(
             user=user,
             quiz=quiz,
             status='in_progress',
-            total_questions=max_questions
+            total_questions=len(question_plan),
+            question_plan=question_plan
         )
 
         return quiz_attempt
 
+    @staticmethod
+    def get_question_plan(quiz_attempt):
+        """
+        Get the ordered question IDs for a quiz attempt.
+
+        Attempts created before question plans existed get one built here from
+        the questions already attempted plus a fresh draw for the remainder.
+
+        Args:
+            quiz_attempt: The QuizAttempt object
+
+        Returns:
+            A list of question IDs
+        """
+        if quiz_attempt.question_plan:
+            return quiz_attempt.question_plan
+
+        question_plan = list(QuestionAttempt.objects.filter(
+            quiz_attempt=quiz_attempt
+        ).order_by('id').values_list('question_id', flat=True))
+
+        remaining = quiz_attempt.total_questions - len(question_plan)
+        if remaining > 0 and quiz_attempt.quiz.quiz_type != 'practice':
+            questions = QuestionRandomizer.get_question_pool(
+                quiz_attempt.quiz, quiz_attempt.user
+            ).exclude(id__in=question_plan)
+            if quiz_attempt.quiz.randomize_questions:
+                questions = questions.order_by('?')
+            question_plan += list(questions.values_list('id', flat=True)[:remaining])
+
+        quiz_attempt.question_plan = question_plan
+        quiz_attempt.save(update_fields=['question_plan'])
+        return question_plan
+
+    @staticmethod
+    def get_question_at(quiz_attempt, position):
+        """
+        Get the question at a position in a quiz attempt's plan.
+
+        Args:
+            quiz_attempt: The QuizAttempt object
+            position: Zero-based position in the plan
+
+        Returns:
+            A Question object or None if the position is out of range
+        """
+        QuizService.get_question_plan(quiz_attempt)
+        question_id = quiz_attempt.get_question_id_at(position)
+        if question_id is None:
+            return None
+        return Question.objects.filter(id=question_id, is_active=True).first()
+
     @staticmethod
     def get_next_question(quiz_attempt):
         """
@@ -192,52 +334,26 @@ class QuizService:
         Returns:
             A Question object or None if all questions have been answered
         """
-        # Get the quiz
-        quiz = quiz_attempt.quiz
+        question_plan = QuizService.get_question_plan(quiz_attempt)
 
-        # Find questions that haven't been attempted yet
-        attempted_questions = QuestionAttempt.objects.filter(
+        # Find questions that have been attempted already
+        attempted_questions = set(QuestionAttempt.objects.filter(
             quiz_attempt=quiz_attempt
-        ).values_list('question_id', flat=True)
+        ).values_list('question_id', flat=True))
 
-        # Get all questions for this quiz that haven't been attempted yet
-        if quiz.quiz_type == 'general':
-            # For general quizzes, get questions from the subject
-            unattempted_questions = Question.objects.filter(
-                curriculum=quiz.curriculum,
-                class_level=quiz.class_level,
-                subject=quiz.subject,
-                is_active=True
-            ).exclude(id__in=attempted_questions)
-        elif quiz.quiz_type == 'practice':
-            # For practice exams, we've already created question attempts for all questions
-            # So if there are no unattempted questions, return None
+        if len(attempted_questions) >= quiz_attempt.total_questions:
             return None
-        else:
-            # For topic quizzes, get questions from the specific topic
-            unattempted_questions = Question.objects.filter(
-                curriculum=quiz.curriculum,
-                class_level=quiz.class_level,
-                subject=quiz.subject,
-                topic=quiz.topic,
-                is_active=True
-            ).exclude(id__in=attempted_questions)
 
-        # Filter out premium questions if user is not premium
-        if not quiz_attempt.user.is_premium:
-            unattempted_questions = unattempted_questions.filter(is_premium=False)
-
-        # Limit to the number of questions needed
-        total_needed = quiz_attempt.total_questions - QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt).count()
-        if total_needed <= 0:
+        # Walk the plan in order and return the first unattempted question
+        unattempted_ids = [qid for qid in question_plan if qid not in attempted_questions]
+        if not unattempted_ids:
             return None
 
-        if unattempted_questions.exists():
-            # If randomize_questions is True, return a random question
-            if quiz.randomize_questions:
-                return unattempted_questions.order_by('?').first()
-            else:
-                return unattempted_questions.first()
+        questions = Question.objects.in_bulk(unattempted_ids)
+        for question_id in unattempted_ids:
+            question = questions.get(question_id)
+            if question and question.is_active:
+                return question
 
         return None
 
@@ -257,74 +373,478 @@ class QuizService:
         Returns:
             A new QuizAttempt object
         """
-        # Create a practice exam quiz
-        quiz = Quiz.objects.create(
-            title=f"Practice Exam - {subject.name}",
-            description=f"Practice exam for {subject.name}",
+        # Reuse the practice exam quiz for this subject, creating it on first use
+        quiz = Quiz.objects.filter(
             quiz_type='practice',
             curriculum=curriculum,
             class_level=class_level,
             subject=subject,
-            question_count=question_count,
-            per_question_time=30,  # 30 seconds per question
-            randomize_questions=True,
-            randomize_choices=True,
-            show_immediate_feedback=True,
-            passing_score=70,
-            is_active=True,
-            created_by=user if user.is_staff else None,
-        )
+            topic__isnull=True
+        ).order_by('id').first()
+
+        if not quiz:
+            quiz = Quiz.objects.create(
+                title=f"Practice Exam - {subject.name}",
+                description=f"Practice exam for {subject.name}",
+                quiz_type='practice',
+                curriculum=curriculum,
+                class_level=class_level,
+                subject=subject,
+                per_question_time=30,  # 30 seconds per question
+                randomize_questions=True,
+                randomize_choices=True,
+                show_immediate_feedback=True,
+                passing_score=70,
+                is_active=True,
+            )
 
-        # Create a new quiz attempt
-        quiz_attempt = QuizAttempt.objects.create(
-            user=user,
-            quiz=quiz,
-            status='in_progress',
-            total_questions=question_count
+        # Get questions for the practice exam
+        questions = Question.objects.filter(
+            curriculum=curriculum,
+            class_level=class_level,
+            subject=subject,
+            is_active=True
         )
 
-        # Get questions for the practice exam
         if topics:
             # Get questions from selected topics
-            topic_ids = [topic.id for topic in topics]
-            questions = Question.objects.filter(
-                curriculum=curriculum,
-                class_level=class_level,
-                subject=subject,
-                topic_id__in=topic_ids,
-                is_active=True
-            )
-        else:
-            # Get questions from all topics in the subject
-            questions = Question.objects.filter(
-                curriculum=curriculum,
-                class_level=class_level,
-                subject=subject,
-                is_active=True
-            )
+            questions = questions.filter(topic__in=topics)
 
         # Filter out premium questions if user is not premium
         if not user.is_premium:
             questions = questions.filter(is_premium=False)
 
         # Randomize and limit to question count
-        questions = list(questions.order_by('?')[:question_count])
+        candidates = list(questions.values_list('id', 'difficulty'))
+        question_plan = QuestionSampler(candidates).sample(question_count)
 
-        # If no questions are available, adjust the total_questions
-        if not questions:
-            quiz_attempt.total_questions = 0
-            quiz_attempt.save()
-            return quiz_attempt
+        # Any earlier practice exam left open for this subject is abandoned
+        QuizAttempt.objects.filter(
+            user=user,
+            quiz=quiz,
+            status='in_progress'
+        ).update(status='abandoned', completed_at=timezone.now())
 
-        # Update total_questions to match actual number of questions
-        quiz_attempt.total_questions = len(questions)
-        quiz_attempt.save()
+        # Create a new quiz attempt
+        quiz_attempt = QuizAttempt.objects.create(
+            user=user,
+            quiz=quiz,
+            status='in_progress',
+            total_questions=len(question_plan),
+            question_plan=question_plan
+        )
 
         # Create question attempts for each question
-        for question in questions:
-            QuestionAttempt.objects.create(
+        QuestionAttempt.objects.bulk_create([
+            QuestionAttempt(quiz_attempt=quiz_attempt, question_id=question_id)
+            for question_id in question_plan
+        ])
+
+        return quiz_attempt
+
+    @staticmethod
+    def grade_answer_sheet(quiz_attempt, answer_sheet):
+        """
+        Grade a whole answer sheet for a quiz attempt in one transaction.
+
+        Each entry is a dict with ``question_id`` and either ``choice_id`` or
+        ``answer``, plus optional ``time_spent`` and ``timed_out``. Entries for
+        questions outside the attempt's plan are ignored. Once graded, the
+        attempt is completed.
+
+        Args:
+            quiz_attempt: The QuizAttempt object
+            answer_sheet: A list of answer dicts
+
+        Returns:
+            The number of answers graded
+
+        Raises:
+            ValueError: If the quiz attempt is no longer in progress
+        """
+        with transaction.atomic():
+            quiz_attempt = QuizAttempt.objects.select_for_update().get(pk=quiz_attempt.pk)
+            if quiz_attempt.status != 'in_progress':
+                raise ValueError("This quiz is no longer in progress.")
+
+            planned_ids = set(QuizService.get_question_plan(quiz_attempt))
+
+            # Keep the last entry for each planned question
+            entries = {}
+            for entry in answer_sheet:
+                try:
+                    question_id = int(entry.get('question_id'))
+                except (AttributeError, TypeError, ValueError, OverflowError):
+                    continue
+                if question_id in planned_ids:
+                    entries[question_id] = entry
+
+            if entries:
+                question_ids = list(entries)
+                questions = Question.objects.only('id', 'question_type', 'topic_id').in_bulk(question_ids)
+
+                # Load every choice and accepted answer for the sheet in two queries
+                choices = QuestionChoice.objects.filter(question_id__in=question_ids).in_bulk()
+                short_answers = defaultdict(list)
+                for answer in ShortAnswer.objects.filter(question_id__in=question_ids):
+                    short_answers[answer.question_id].append(answer)
+
+                question_attempts = {
+                    attempt.question_id: attempt
+                    for attempt in QuestionAttempt.objects.filter(
+                        quiz_attempt=quiz_attempt,
+                        question_id__in=question_ids
+                    )
+                }
+                new_attempts = [
+                    QuestionAttempt(quiz_attempt=quiz_attempt, question_id=question_id)
+                    for question_id in question_ids
+                    if question_id not in question_attempts
+                ]
+                QuestionAttempt.objects.bulk_create(new_attempts)
+                for attempt in QuestionAttempt.objects.filter(
+                    quiz_attempt=quiz_attempt,
+                    question_id__in=[attempt.question_id for attempt in new_attempts]
+                ):
+                    question_attempts[attempt.question_id] = attempt
+
+                results = []
+                graded = []
+                for question_id, entry in entries.items():
+                    question = questions.get(question_id)
+                    question_attempt = question_attempts.get(question_id)
+                    if question is None or question_attempt is None:
+                        continue
+
+                    previous_is_correct = question_attempt.is_correct if question_attempt.is_answered else None
+
+                    try:
+                        time_spent = int(entry.get('time_spent') or 0)
+                    except (TypeError, ValueError, OverflowError):
+                        time_spent = 0
+                    question_attempt.time_spent = min(max(time_spent, 0), QuizService.MAX_TIME_SPENT)
+                    question_attempt.timed_out = bool(entry.get('timed_out'))
+
+                    is_correct = False
+                    if not question_attempt.timed_out:
+                        if question.question_type == 'multiple_choice':
+                            try:
+                                choice = choices.get(int(entry.get('choice_id')))
+                            except (TypeError, ValueError, OverflowError):
+                                choice = None
+                            if choice is not None and choice.question_id == question_id:
+                                question_attempt.selected_choice = choice
+                                is_correct = choice.is_correct
+                        else:
+                            provided_answer = str(entry.get('answer') or '').strip()[:255]
+                            question_attempt.provided_answer = provided_answer
+                            is_correct = ShortAnswerMatcher(short_answers[question_id]).matches(provided_answer)
+
+                    question_attempt.is_correct = is_correct
+                    question_attempt.is_answered = True
+                    graded.append(question_attempt)
+                    results.append((question_id, question.topic_id, is_correct, previous_is_correct))
+
+                QuestionAttempt.objects.bulk_update(graded, [
+                    'selected_choice', 'provided_answer', 'is_correct',
+                    'is_answered', 'time_spent', 'timed_out',
+                ])
+                QuestionStatService.record_answers(quiz_attempt.user, results)
+            else:
+                graded = []
+
+            # Finalise the attempt from the graded question attempts
+            totals = QuestionAttempt.objects.filter(
                 quiz_attempt=quiz_attempt,
-                question=question
+                is_answered=True
+            ).aggregate(
+                answered=Count('id'),
+                correct=Count('id', filter=Q(is_correct=True))
             )
+            quiz_attempt.answered_questions = totals['answered']
+            quiz_attempt.correct_answers = totals['correct']
+            if quiz_attempt.total_questions > 0:
+                quiz_attempt.score = quiz_attempt.correct_answers * 100 // quiz_attempt.total_questions
+            quiz_attempt.status = 'completed'
+            quiz_attempt.completed_at = timezone.now()
+            quiz_attempt.save(update_fields=[
+                'answered_questions', 'correct_answers', 'score', 'status', 'completed_at',
+            ])
+
+        return len(graded)
 
-        return quiz_attempt
+    @staticmethod
+    def expire_attempts(now=None):
+        """
+        Close in-progress quiz attempts whose time limit has long passed.
+
+        The time limit follows the same rule as the quiz views: the quiz's
+        per-question time multiplied by the attempt's question count. Attempts
+        are only closed EXPIRY_GRACE_PERIOD after that, which leaves room for
+        feedback pages and for answer sheets sent after working offline.
+        Expired attempts with at least one answer are marked timed out; the
+        rest are abandoned. Attempts are updated in bulk, one pair of UPDATEs
+        per distinct time limit.
+
+        Args:
+            now: Optional current time, mainly for testing
+
+        Returns:
+            A tuple of (timed_out_count, abandoned_count)
+        """
+        now = now or timezone.now()
+        in_progress = QuizAttempt.objects.filter(status='in_progress')
+
+        time_limits = in_progress.values_list(
+            'quiz__per_question_time', 'total_questions'
+        ).distinct().order_by()
+
+        timed_out_count = 0
+        abandoned_count = 0
+        for per_question_time, question_count in time_limits:
+            total_time_limit_seconds = per_question_time * question_count
+            if total_time_limit_seconds <= 0:
+                continue
+
+            expired = in_progress.filter(
+                quiz__per_question_time=per_question_time,
+                total_questions=question_count,
+                started_at__lt=now - timedelta(seconds=total_time_limit_seconds) - QuizService.EXPIRY_GRACE_PERIOD
+            )
+            timed_out_count += expired.filter(answered_questions__gt=0).update(
+                status='timed_out', completed_at=now
+            )
+            abandoned_count += expired.filter(answered_questions=0).update(
+                status='abandoned', completed_at=now
+            )
+
+        return timed_out_count, abandoned_count
+
+
+class QuestionStatService:
+    """Service for maintaining per-user question and topic statistics."""
+
+    @staticmethod
+    def record_answer(user, question, is_correct, previous_is_correct=None):
+        """
+        Fold a submitted answer into the user's question and topic statistics.
+
+        Call this inside the same transaction that saves the QuestionAttempt.
+
+        Args:
+            user: The User object
+            question: The Question object
+            is_correct: Whether the submitted answer is correct
+            previous_is_correct: None for the first answer to this question in a
+                quiz attempt, otherwise the correctness of the answer being replaced
+        """
+        now = timezone.now()
+
+        stat, created = UserQuestionStat.objects.get_or_create(
+            user=user,
+            question=question,
+            defaults={
+                'topic_id': question.topic_id,
+                'attempts': 1,
+                'correct': int(is_correct),
+                'last_is_correct': is_correct,
+                'last_answered_at': now,
+            }
+        )
+
+        if created:
+            attempts_delta = 1
+            correct_delta = int(is_correct)
+        else:
+            if previous_is_correct is None:
+                attempts_delta = 1
+                correct_delta = int(is_correct)
+            else:
+                attempts_delta = 0
+                correct_delta = int(is_correct) - int(previous_is_correct)
+
+            UserQuestionStat.objects.filter(pk=stat.pk).update(
+                attempts=F('attempts') + attempts_delta,
+                correct=Greatest(F('correct') + correct_delta, 0),
+                last_is_correct=is_correct,
+                last_answered_at=now
+            )
+
+        topic_stat, topic_created = UserTopicStat.objects.get_or_create(
+            user=user,
+            topic_id=question.topic_id,
+            defaults={
+                'questions_seen': 1,
+                'attempts': attempts_delta,
+                'correct': max(correct_delta, 0),
+                'last_answered_at': now,
+            }
+        )
+
+        if not topic_created:
+            UserTopicStat.objects.filter(pk=topic_stat.pk).update(
+                questions_seen=F('questions_seen') + int(created),
+                attempts=F('attempts') + attempts_delta,
+                correct=Greatest(F('correct') + correct_delta, 0),
+                last_answered_at=now
+            )
+
+    @staticmethod
+    def record_answers(user, results):
+        """
+        Fold a batch of graded answers into the user's statistics with set-based queries.
+
+        Missing rows are inserted at zero, ignoring rows created concurrently,
+        and every row is then moved by its delta in one UPDATE per table, so
+        answers recorded at the same time by record_answer are not lost.
+
+        Call this inside the same transaction that saves the QuestionAttempts.
+
+        Args:
+            user: The User object
+            results: Iterable of (question_id, topic_id, is_correct, previous_is_correct)
+                tuples, with previous_is_correct as in record_answer
+        """
+        results = list(results)
+        if not results:
+            return
+
+        now = timezone.now()
+        question_ids = [question_id for question_id, _, _, _ in results]
+        topic_ids = {topic_id for _, topic_id, _, _ in results}
+
+        existing_ids = set(UserQuestionStat.objects.filter(
+            user=user, question_id__in=question_ids
+        ).values_list('question_id', flat=True))
+        UserQuestionStat.objects.bulk_create([
+            UserQuestionStat(user=user, question_id=question_id, topic_id=topic_id,
+                             attempts=0, correct=0, last_is_correct=False, last_answered_at=now)
+            for question_id, topic_id, _, _ in results
+            if question_id not in existing_ids
+        ], ignore_conflicts=True)
+
+        # Rows still at zero attempts were inserted by this batch
+        created_ids = set(UserQuestionStat.objects.filter(
+            user=user, question_id__in=question_ids, attempts=0
+        ).values_list('question_id', flat=True))
+
+        question_deltas = {}
+        topic_deltas = defaultdict(lambda: [0, 0, 0])
+        for question_id, topic_id, is_correct, previous_is_correct in results:
+            if previous_is_correct is None or question_id not in existing_ids:
+                attempts_delta = 1
+                correct_delta = int(is_correct)
+            else:
+                attempts_delta = 0
+                correct_delta = int(is_correct) - int(previous_is_correct)
+            question_deltas[question_id] = (attempts_delta, correct_delta, is_correct)
+
+            deltas = topic_deltas[topic_id]
+            deltas[0] += int(question_id in created_ids)
+            deltas[1] += attempts_delta
+            deltas[2] += correct_delta
+
+        UserQuestionStat.objects.filter(user=user, question_id__in=question_ids).update(
+            attempts=F('attempts') + Case(
+                *[When(question_id=question_id, then=Value(attempts_delta))
+                  for question_id, (attempts_delta, _, _) in question_deltas.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+            correct=Greatest(F('correct') + Case(
+                *[When(question_id=question_id, then=Value(correct_delta))
+                  for question_id, (_, correct_delta, _) in question_deltas.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            ), 0),
+            last_is_correct=Case(
+                *[When(question_id=question_id, then=Value(is_correct))
+                  for question_id, (_, _, is_correct) in question_deltas.items()],
+                default=F('last_is_correct'),
+                output_field=BooleanField()
+            ),
+            last_answered_at=now
+        )
+
+        UserTopicStat.objects.bulk_create([
+            UserTopicStat(user=user, topic_id=topic_id, questions_seen=0, attempts=0, correct=0,
+                          last_answered_at=now)
+            for topic_id in topic_ids
+        ], ignore_conflicts=True)
+
+        UserTopicStat.objects.filter(user=user, topic_id__in=topic_ids).update(
+            questions_seen=F('questions_seen') + Case(
+                *[When(topic_id=topic_id, then=Value(seen_delta))
+                  for topic_id, (seen_delta, _, _) in topic_deltas.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+            attempts=F('attempts') + Case(
+                *[When(topic_id=topic_id, then=Value(attempts_delta))
+                  for topic_id, (_, attempts_delta, _) in topic_deltas.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+            correct=Greatest(F('correct') + Case(
+                *[When(topic_id=topic_id, then=Value(correct_delta))
+                  for topic_id, (_, _, correct_delta) in topic_deltas.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            ), 0),
+            last_answered_at=now
+        )
+
+    @staticmethod
+    def rebuild_for_user(user):
+        """
+        Rebuild a user's question and topic statistics from their answered question attempts.
+
+        Args:
+            user: The User object
+        """
+        UserQuestionStat.objects.filter(user=user).delete()
+        UserTopicStat.objects.filter(user=user).delete()
+
+        answered = QuestionAttempt.objects.filter(quiz_attempt__user=user, is_answered=True)
+
+        # The most recent answer to each question gives its last result
+        latest = answered.filter(question_id=OuterRef('question_id')).order_by('-answered_at', '-id')
+        rows = answered.values('question_id', 'question__topic_id').annotate(
+            attempts=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True)),
+            last_answered_at=Max('answered_at'),
+            last_is_correct=Subquery(latest.values('is_correct')[:1])
+        ).order_by()
+
+        question_stats = [
+            UserQuestionStat(
+                user=user,
+                question_id=row['question_id'],
+                topic_id=row['question__topic_id'],
+                attempts=row['attempts'],
+                correct=row['correct'],
+                last_is_correct=bool(row['last_is_correct']),
+                last_answered_at=row['last_answered_at'],
+            )
+            for row in rows
+        ]
+        UserQuestionStat.objects.bulk_create(question_stats, batch_size=500)
+
+        topic_rows = UserQuestionStat.objects.filter(user=user).values('topic_id').annotate(
+            questions_seen=Count('id'),
+            total_attempts=Sum('attempts'),
+            total_correct=Sum('correct'),
+            last_answered_at=Max('last_answered_at')
+        ).order_by()
+
+        UserTopicStat.objects.bulk_create([
+            UserTopicStat(
+                user=user,
+                topic_id=row['topic_id'],
+                questions_seen=row['questions_seen'],
+                attempts=row['total_attempts'],
+                correct=row['total_correct'],
+                last_answered_at=row['last_answered_at'],
+            )
+            for row in topic_rows
+        ], batch_size=500)
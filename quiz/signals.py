@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import ContentVersion
+from .models import Quiz, QuizAttempt
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def quiz_catalogue_changed(sender, instance, **kwargs):
+    """Move to a new content version when a quiz is added, edited or removed."""
+    transaction.on_commit(ContentVersion.bump)
+
+
+@receiver(post_save, sender=QuizAttempt)
+@receiver(post_delete, sender=QuizAttempt)
+def quiz_attempt_changed(sender, instance, **kwargs):
+    """Drop the user's cached quiz statistics when a completed attempt is saved or removed."""
+    if instance.status != 'completed':
+        return
+    user_id = instance.user_id
+    transaction.on_commit(lambda: get_user_model().invalidate_quiz_stats(user_id))
@@ -0,0 +1,19 @@
+"""
+Celery tasks for the quiz app.
+"""
+
+import logging
+
+from celery import shared_task
+
+from .services import QuizService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def expire_quiz_attempts():
+    """Close in-progress quiz attempts that have run past their time limit."""
+    timed_out, abandoned = QuizService.expire_attempts()
+    if timed_out or abandoned:
+        logger.info("Expired quiz attempts: %d timed out, %d abandoned", timed_out, abandoned)
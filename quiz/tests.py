@@ -1,3 +1,123 @@
+import json
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from curriculum.models import Curriculum, ClassLevel, Subject, Topic
+from .models import Question, QuestionChoice, Quiz, QuizAttempt, QuestionAttempt, UserQuestionStat, UserTopicStat
+from .services import QuestionStatService
+
+
+class SubmitAnswerSheetTests(TestCase):
+    """Tests for grading a whole answer sheet through the submit_answer_sheet view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student@example.com', 'password', first_name='S', last_name='T')
+        curriculum = Curriculum.objects.create(name='Ghana', code='GH')
+        class_level = ClassLevel.objects.create(name='SHS1', curriculum=curriculum, level_order=1)
+        subject = Subject.objects.create(name='Mathematics', curriculum=curriculum, class_level=class_level)
+        cls.topic = Topic.objects.create(name='Algebra', subject=subject)
+        cls.quiz = Quiz.objects.create(title='Algebra', curriculum=curriculum, class_level=class_level,
+                                       subject=subject, question_count=3)
+
+        cls.questions = []
+        cls.correct_choices = {}
+        cls.wrong_choices = {}
+        for number in range(3):
+            question = Question.objects.create(
+                text=f'What is {number} + {number}?', explanation='Add them.', curriculum=curriculum,
+                class_level=class_level, subject=subject, topic=cls.topic
+            )
+            cls.correct_choices[question.id] = QuestionChoice.objects.create(
+                question=question, text=str(2 * number), is_correct=True
+            )
+            cls.wrong_choices[question.id] = QuestionChoice.objects.create(question=question, text=str(2 * number + 1))
+            cls.questions.append(question)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.attempt = QuizAttempt.objects.create(
+            user=self.user,
+            quiz=self.quiz,
+            total_questions=len(self.questions),
+            question_plan=[question.id for question in self.questions]
+        )
+        self.url = reverse('quiz:submit_answer_sheet', args=[self.attempt.id])
+
+    def post(self, body):
+        return self.client.post(self.url, body if isinstance(body, str) else json.dumps(body),
+                                content_type='application/json')
+
+    def sheet(self, correct_ids):
+        return {'answers': [
+            {
+                'question_id': question.id,
+                'choice_id': (self.correct_choices if question.id in correct_ids else self.wrong_choices)[question.id].id,
+                'time_spent': 5,
+            }
+            for question in self.questions
+        ]}
+
+    def test_invalid_json_returns_400(self):
+        response = self.post('{not json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+
+    def test_sheet_without_answers_list_returns_400(self):
+        for body in ({}, {'answers': 'all'}, []):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+    def test_attempt_not_in_progress_returns_409(self):
+        QuizAttempt.objects.filter(pk=self.attempt.pk).update(status='completed')
+        response = self.post(self.sheet(set()))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(QuestionAttempt.objects.filter(quiz_attempt=self.attempt).exists())
+
+    def test_second_submission_returns_409(self):
+        self.assertEqual(self.post(self.sheet(set())).status_code, 200)
+        self.assertEqual(self.post(self.sheet(set())).status_code, 409)
+
+    def test_grades_sheet_and_completes_attempt(self):
+        correct_ids = {self.questions[0].id, self.questions[2].id}
+        response = self.post(self.sheet(correct_ids))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['graded'], 3)
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'completed')
+        self.assertEqual((self.attempt.answered_questions, self.attempt.correct_answers, self.attempt.score),
+                         (3, 2, 66))
+        self.assertEqual(
+            set(UserQuestionStat.objects.filter(user=self.user).values_list('question_id', 'attempts', 'correct')),
+            {(question.id, 1, int(question.id in correct_ids)) for question in self.questions}
+        )
+        topic_stat = UserTopicStat.objects.get(user=self.user, topic=self.topic)
+        self.assertEqual((topic_stat.questions_seen, topic_stat.attempts, topic_stat.correct), (3, 3, 2))
+
+    def test_adds_to_existing_statistics(self):
+        # Statistics already recorded, e.g. by an answer on another attempt
+        question = self.questions[0]
+        UserQuestionStat.objects.create(user=self.user, question=question, topic=self.topic,
+                                        attempts=3, correct=1, last_is_correct=False)
+        UserTopicStat.objects.create(user=self.user, topic=self.topic, questions_seen=1, attempts=3, correct=1)
+
+        self.post(self.sheet({question.id}))
+
+        stat = UserQuestionStat.objects.get(user=self.user, question=question)
+        self.assertEqual((stat.attempts, stat.correct, stat.last_is_correct), (4, 2, True))
+        topic_stat = UserTopicStat.objects.get(user=self.user, topic=self.topic)
+        self.assertEqual((topic_stat.questions_seen, topic_stat.attempts, topic_stat.correct), (3, 6, 2))
+
+    def test_failure_rolls_back_the_whole_sheet(self):
+        with mock.patch.object(QuestionStatService, 'record_answers', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post(self.sheet({question.id for question in self.questions}))
 
-# Create your tests here.
+        self.attempt.refresh_from_db()
+        self.assertEqual((self.attempt.status, self.attempt.answered_questions), ('in_progress', 0))
+        self.assertFalse(QuestionAttempt.objects.filter(quiz_attempt=self.attempt).exists())
+        self.assertEqual(self.post(self.sheet(set())).status_code, 200)
@@ -11,6 +11,7 @@ urlpatterns = [
     path('take/<int:quiz_id>/', views.take_quiz, name='take_quiz'),
     path('question/<int:quiz_attempt_id>/<int:question_id>/', views.answer_question, name='answer_question'),
     path('submit-answer/<int:quiz_attempt_id>/<int:question_id>/', views.submit_answer, name='submit_answer'),
+    path('submit-answer-sheet/<int:quiz_attempt_id>/', views.submit_answer_sheet, name='submit_answer_sheet'),
     path('feedback/<int:quiz_attempt_id>/<int:question_id>/', views.question_feedback, name='question_feedback'),
     path('feedback/<int:quiz_attempt_id>/<int:question_id>/<str:next_question_id>/', views.question_feedback, name='question_feedback_with_next'),
 
@@ -5,11 +5,20 @@ This module contains validation logic for quiz answers.
 
 import re
 import difflib
+from collections import Counter
+
+WORD_RE = re.compile(r'\b\w+\b')
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Thresholds shared by the validator and the compiled matcher
+FUZZY_THRESHOLD = 0.8
+KEYWORD_THRESHOLD = 0.7
 
 # Simple word tokenizer that doesn't require NLTK
 def simple_tokenize(text):
     """Split text into words without using NLTK."""
-    return re.findall(r'\b\w+\b', text.lower())
+    return WORD_RE.findall(text.lower())
 
 # Common English stop words
 STOP_WORDS = {
@@ -54,10 +63,10 @@ class ShortAnswerValidator:
         text = text.lower()
 
         # Remove punctuation
-        text = re.sub(r'[^\w\s]', '', text)
+        text = PUNCTUATION_RE.sub('', text)
 
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = WHITESPACE_RE.sub(' ', text).strip()
 
         # Remove stop words using our simple tokenizer
         words = simple_tokenize(text)
@@ -81,7 +90,7 @@ class ShortAnswerValidator:
         return ShortAnswerValidator.normalize_text(student_answer) == ShortAnswerValidator.normalize_text(correct_answer)
 
     @staticmethod
-    def fuzzy_match(student_answer, correct_answer, threshold=0.8):
+    def fuzzy_match(student_answer, correct_answer, threshold=FUZZY_THRESHOLD):
         """
         Check if the student's answer is similar to the correct answer using fuzzy matching.
 
@@ -107,7 +116,7 @@ class ShortAnswerValidator:
         return similarity >= threshold
 
     @staticmethod
-    def contains_keywords(student_answer, keywords, threshold=0.7):
+    def contains_keywords(student_answer, keywords, threshold=KEYWORD_THRESHOLD):
         """
         Check if the student's answer contains the required keywords.
 
@@ -149,20 +158,87 @@ class ShortAnswerValidator:
         Returns:
             True if the answer is correct, False otherwise
         """
+        return ShortAnswerMatcher(correct_answers).matches(student_answer)
+
+
+class ShortAnswerMatcher:
+    """
+    Compiled matcher for the accepted answers of a short-answer question.
+
+    Accepted answers are normalised once when the matcher is built. Exact
+    answers are looked up in a set, and fuzzy answers skip the full
+    SequenceMatcher comparison unless cheap upper bounds on its ratio, from
+    the string lengths and shared characters, can reach the threshold. The
+    results are the same as the ShortAnswerValidator methods.
+    """
+
+    def __init__(self, correct_answers, fuzzy_threshold=FUZZY_THRESHOLD, keyword_threshold=KEYWORD_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.keyword_threshold = keyword_threshold
+        self.exact_answers = set()
+        self.fuzzy_answers = []
+
         for answer in correct_answers:
+            normalized = ShortAnswerValidator.normalize_text(answer.text)
             if answer.is_exact_match:
-                # For exact match answers, use exact matching
-                if ShortAnswerValidator.exact_match(student_answer, answer.text):
-                    return True
-            else:
-                # For fuzzy match answers, use fuzzy matching
-                if ShortAnswerValidator.fuzzy_match(student_answer, answer.text):
-                    return True
+                self.exact_answers.add(normalized)
+                continue
+
+            keywords = ()
+            if ',' in answer.text:
+                keywords = tuple(
+                    ShortAnswerValidator.normalize_text(keyword.strip())
+                    for keyword in answer.text.split(',')
+                )
+            self.fuzzy_answers.append((normalized, Counter(normalized), keywords))
+
+    def matches(self, student_answer):
+        """
+        Check a student's answer against the accepted answers.
+
+        Args:
+            student_answer: The student's answer
+
+        Returns:
+            True if the answer is correct, False otherwise
+        """
+        norm_student = ShortAnswerValidator.normalize_text(student_answer)
+        if norm_student in self.exact_answers:
+            return True
 
-                # Also check for keywords if the answer contains commas (indicating a list of keywords)
-                if ',' in answer.text:
-                    keywords = [k.strip() for k in answer.text.split(',')]
-                    if ShortAnswerValidator.contains_keywords(student_answer, keywords):
-                        return True
+        if not self.fuzzy_answers:
+            return False
+
+        student_counts = None
+        for norm_correct, correct_counts, keywords in self.fuzzy_answers:
+            if norm_student and norm_correct:
+                total_length = len(norm_student) + len(norm_correct)
+
+                # Length bound, equivalent to SequenceMatcher.real_quick_ratio()
+                if 2.0 * min(len(norm_student), len(norm_correct)) / total_length >= self.fuzzy_threshold:
+                    # Shared character bound, equivalent to SequenceMatcher.quick_ratio()
+                    if student_counts is None:
+                        student_counts = Counter(norm_student)
+                    shared = sum((student_counts & correct_counts).values())
+                    if 2.0 * shared / total_length >= self.fuzzy_threshold:
+                        ratio = difflib.SequenceMatcher(None, norm_student, norm_correct).ratio()
+                        if ratio >= self.fuzzy_threshold:
+                            return True
+
+            if keywords and self._contains_keywords(norm_student, keywords):
+                return True
 
         return False
+
+    def _contains_keywords(self, norm_student, keywords):
+        """Check the keyword threshold, stopping as soon as the result is known."""
+        total = len(keywords)
+        matches = 0
+        for index, keyword in enumerate(keywords):
+            if keyword in norm_student:
+                matches += 1
+                if matches / total >= self.keyword_threshold:
+                    return True
+            elif (matches + total - index - 1) / total < self.keyword_threshold:
+                return False
+        return matches / total >= self.keyword_threshold
@@ -2,111 +2,65 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, Http404
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 
 from curriculum.models import Curriculum, ClassLevel, Subject, Topic, Note, NoteCompletion
-from .models import Quiz, Question, QuestionChoice, ShortAnswer, QuizAttempt, QuestionAttempt
-from .services import QuestionRandomizer, QuizService
-from .validators import ShortAnswerValidator
+from curriculum.cache import CurriculumTree
+from core.cache import cache_public_page
+from subscription.entitlements import get_entitlements
+from .models import Quiz, Question, QuizAttempt, QuestionAttempt
+from .cache import QuestionBundleCache
+from .services import QuestionRandomizer, QuizService, QuestionStatService
 
 
 def quiz_home(request):
     """Home page for quizzes."""
     # Initialize variables
     curricula = None
-    active_subscription = None
-    free_plan = None
-    sample_accesses = None
     is_tier_one = False  # Flag to identify Tier One users
     accessible_curricula_ids = []
     accessible_class_level_ids = []
 
     # Get user's subscription information
-    if request.user.is_authenticated:
-        if request.user.is_staff or request.user.is_superuser:
-            # Staff and superusers see all curricula
+    entitlements = get_entitlements(request)
+    is_staff = request.user.is_authenticated and (request.user.is_staff or request.user.is_superuser)
+
+    if is_staff:
+        # Staff and superusers see all curricula
+        curricula = Curriculum.objects.filter(is_active=True)
+    elif entitlements.has_subscription:
+        # Check if this is a Tier One subscription (one curriculum, one class level)
+        if entitlements.plan_type == 'tier_one':
+            is_tier_one = True
+            # Get the single curriculum and class level the user has access to
+            if entitlements.access_pairs:
+                curriculum_id, class_level_id = entitlements.access_pairs[0]
+                accessible_curricula_ids = [curriculum_id]
+                accessible_class_level_ids = [class_level_id]
+                curricula = Curriculum.objects.filter(id__in=accessible_curricula_ids, is_active=True)
+
+        # If tier three, show all curricula
+        elif entitlements.all_curriculums:
             curricula = Curriculum.objects.filter(is_active=True)
         else:
-            # Get user's active subscription
-            from subscription.models import Subscription
-            from django.utils import timezone
-
-            active_subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
-
-            if active_subscription:
-                # Check if this is a Tier One subscription (one curriculum, one class level)
-                if active_subscription.plan.plan_type == 'tier_one':
-                    is_tier_one = True
-                    # Get the single curriculum and class level the user has access to
-                    curriculum_access = active_subscription.curriculum_accesses.first()
-                    if curriculum_access:
-                        accessible_curricula_ids = [curriculum_access.curriculum_id]
-                        accessible_class_level_ids = [curriculum_access.class_level_id]
-                        curricula = Curriculum.objects.filter(id__in=accessible_curricula_ids, is_active=True)
-
-                # If tier three, show all curricula
-                elif active_subscription.plan.all_curriculums:
-                    curricula = Curriculum.objects.filter(is_active=True)
-                else:
-                    # Get the curricula the user has access to
-                    accessible_curricula_ids = list(active_subscription.curriculum_accesses.values_list('curriculum_id', flat=True).distinct())
-                    accessible_class_level_ids = list(active_subscription.curriculum_accesses.values_list('class_level_id', flat=True).distinct())
-                    curricula = Curriculum.objects.filter(id__in=accessible_curricula_ids, is_active=True)
-            else:
-                # No active subscription, show only free tier curricula
-                from subscription.models import SubscriptionPlan, CurriculumAccess
-
-                # Find a free subscription to determine what's available in free tier
-                free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-                if free_plan:
-                    # Find sample curriculum accesses for the free tier
-                    sample_accesses = CurriculumAccess.objects.filter(
-                        subscription__plan=free_plan
-                    )
-
-                    if sample_accesses.exists():
-                        free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True).distinct()
-                        accessible_curricula_ids = list(free_curriculum_ids)
-                        accessible_class_level_ids = list(sample_accesses.values_list('class_level_id', flat=True).distinct())
-                        curricula = Curriculum.objects.filter(id__in=free_curriculum_ids, is_active=True)
-
-                        # Free tier is similar to Tier One (one curriculum, one class level)
-                        is_tier_one = True
-                    else:
-                        curricula = Curriculum.objects.none()
-                else:
-                    curricula = Curriculum.objects.none()
+            # Get the curricula the user has access to
+            accessible_curricula_ids = entitlements.accessible_curriculum_ids
+            accessible_class_level_ids = entitlements.accessible_class_level_ids
+            curricula = Curriculum.objects.filter(id__in=accessible_curricula_ids, is_active=True)
+    elif entitlements.free_pairs:
+        # No active subscription or not authenticated, show only free tier curricula
+        accessible_curricula_ids = entitlements.free_curriculum_ids
+        accessible_class_level_ids = entitlements.free_class_level_ids
+        curricula = Curriculum.objects.filter(id__in=accessible_curricula_ids, is_active=True)
+
+        # Free tier is similar to Tier One (one curriculum, one class level)
+        is_tier_one = True
     else:
-        # Not authenticated, show only free tier curricula
-        from subscription.models import SubscriptionPlan, CurriculumAccess
-
-        # Find a free subscription to determine what's available in free tier
-        free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-        if free_plan:
-            # Find sample curriculum accesses for the free tier
-            sample_accesses = CurriculumAccess.objects.filter(
-                subscription__plan=free_plan
-            )
-
-            if sample_accesses.exists():
-                free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True).distinct()
-                accessible_curricula_ids = list(free_curriculum_ids)
-                accessible_class_level_ids = list(sample_accesses.values_list('class_level_id', flat=True).distinct())
-                curricula = Curriculum.objects.filter(id__in=free_curriculum_ids, is_active=True)
-
-                # Free tier is similar to Tier One (one curriculum, one class level)
-                is_tier_one = True
-            else:
-                curricula = Curriculum.objects.none()
-        else:
-            curricula = Curriculum.objects.none()
+        curricula = Curriculum.objects.none()
 
     # Get filter parameters
     selected_curriculum = request.GET.get('curriculum', '')
@@ -145,134 +99,43 @@ def quiz_home(request):
         topics = Topic.objects.filter(subject__slug=selected_subject, subject__class_level_id=selected_class_level, subject__curriculum__code=selected_curriculum, is_active=True).order_by('order', 'name')
 
     # Filter quizzes based on user's subscription tier
-    if request.user.is_authenticated:
-        # Staff and superusers see all quizzes
-        if request.user.is_staff or request.user.is_superuser:
-            quizzes = Quiz.objects.filter(quiz_filter).order_by('-created_at')
-            # Get featured quizzes if any, otherwise get the most recent quizzes
-            featured_quizzes = Quiz.objects.filter(is_active=True, is_featured=True).order_by('-created_at')[:3]
-            if not featured_quizzes.exists():
-                featured_quizzes = Quiz.objects.filter(is_active=True).order_by('-created_at')[:3]
-        else:
-            # Get user's active subscription
-            from subscription.models import Subscription
-            from django.utils import timezone
-
-            active_subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
-
-            if active_subscription:
-                # If tier three, show all quizzes
-                if active_subscription.plan.all_curriculums:
-                    quizzes = Quiz.objects.filter(quiz_filter).order_by('-created_at')
-                    featured_quizzes = Quiz.objects.filter(is_active=True, is_featured=True).order_by('-created_at')[:3]
-                else:
-                    # Get the curricula and class levels the user has access to
-                    accessible_curricula_ids = active_subscription.curriculum_accesses.values_list('curriculum_id', flat=True)
-                    accessible_class_level_ids = active_subscription.curriculum_accesses.values_list('class_level_id', flat=True)
-
-                    # Filter quizzes based on accessible curricula and class levels
-                    quizzes = Quiz.objects.filter(
-                        quiz_filter,
-                        curriculum_id__in=accessible_curricula_ids,
-                        class_level_id__in=accessible_class_level_ids
-                    ).order_by('-created_at')
-
-                    featured_quizzes = Quiz.objects.filter(
-                        is_active=True,
-                        is_featured=True,
-                        curriculum_id__in=accessible_curricula_ids,
-                        class_level_id__in=accessible_class_level_ids
-                    ).order_by('-created_at')[:3]
-
-                    if not featured_quizzes.exists():
-                        featured_quizzes = Quiz.objects.filter(
-                            is_active=True,
-                            curriculum_id__in=accessible_curricula_ids,
-                            class_level_id__in=accessible_class_level_ids
-                        ).order_by('-created_at')[:3]
-            else:
-                # No active subscription, show only free tier quizzes
-                from subscription.models import SubscriptionPlan, CurriculumAccess
-
-                # Find a free subscription to determine what's available in free tier
-                free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-                if free_plan:
-                    # Find sample curriculum accesses for the free tier
-                    sample_accesses = CurriculumAccess.objects.filter(
-                        subscription__plan=free_plan
-                    )
-
-                    if sample_accesses.exists():
-                        free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True).distinct()
-                        free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True).distinct()
-
-                        quizzes = Quiz.objects.filter(
-                            quiz_filter,
-                            curriculum_id__in=free_curriculum_ids,
-                            class_level_id__in=free_class_level_ids
-                        ).order_by('-created_at')
-
-                        featured_quizzes = Quiz.objects.filter(
-                            is_active=True,
-                            is_featured=True,
-                            curriculum_id__in=free_curriculum_ids,
-                            class_level_id__in=free_class_level_ids
-                        ).order_by('-created_at')[:3]
-
-                        if not featured_quizzes.exists():
-                            featured_quizzes = Quiz.objects.filter(
-                                is_active=True,
-                                curriculum_id__in=free_curriculum_ids,
-                                class_level_id__in=free_class_level_ids
-                            ).order_by('-created_at')[:3]
-                    else:
-                        quizzes = Quiz.objects.none()
-                        featured_quizzes = Quiz.objects.none()
-                else:
-                    quizzes = Quiz.objects.none()
-                    featured_quizzes = Quiz.objects.none()
+    if is_staff or (entitlements.has_subscription and entitlements.all_curriculums):
+        # Staff, superusers and tier three see all quizzes
+        quizzes = Quiz.objects.filter(quiz_filter).order_by('-created_at')
+        # Get featured quizzes if any, otherwise get the most recent quizzes
+        featured_quizzes = Quiz.objects.filter(is_active=True, is_featured=True).order_by('-created_at')[:3]
+        if is_staff and not featured_quizzes.exists():
+            featured_quizzes = Quiz.objects.filter(is_active=True).order_by('-created_at')[:3]
     else:
-        # Not authenticated, show only free tier quizzes
-        from subscription.models import SubscriptionPlan, CurriculumAccess
-
-        # Find a free subscription to determine what's available in free tier
-        free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-        if free_plan:
-            # Find sample curriculum accesses for the free tier
-            sample_accesses = CurriculumAccess.objects.filter(
-                subscription__plan=free_plan
-            )
-
-            if sample_accesses.exists():
-                free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True).distinct()
-                free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True).distinct()
-
-                quizzes = Quiz.objects.filter(
-                    quiz_filter,
-                    curriculum_id__in=free_curriculum_ids,
-                    class_level_id__in=free_class_level_ids
-                ).order_by('-created_at')
+        # Get the curricula and class levels the user has access to, or the free tier
+        if entitlements.has_subscription:
+            allowed_curricula_ids = entitlements.accessible_curriculum_ids
+            allowed_class_level_ids = entitlements.accessible_class_level_ids
+        else:
+            allowed_curricula_ids = entitlements.free_curriculum_ids
+            allowed_class_level_ids = entitlements.free_class_level_ids
+
+        if entitlements.has_subscription or allowed_curricula_ids:
+            # Filter quizzes based on accessible curricula and class levels
+            quizzes = Quiz.objects.filter(
+                quiz_filter,
+                curriculum_id__in=allowed_curricula_ids,
+                class_level_id__in=allowed_class_level_ids
+            ).order_by('-created_at')
+
+            featured_quizzes = Quiz.objects.filter(
+                is_active=True,
+                is_featured=True,
+                curriculum_id__in=allowed_curricula_ids,
+                class_level_id__in=allowed_class_level_ids
+            ).order_by('-created_at')[:3]
 
+            if not featured_quizzes.exists():
                 featured_quizzes = Quiz.objects.filter(
                     is_active=True,
-                    is_featured=True,
-                    curriculum_id__in=free_curriculum_ids,
-                    class_level_id__in=free_class_level_ids
+                    curriculum_id__in=allowed_curricula_ids,
+                    class_level_id__in=allowed_class_level_ids
                 ).order_by('-created_at')[:3]
-
-                if not featured_quizzes.exists():
-                    featured_quizzes = Quiz.objects.filter(
-                        is_active=True,
-                        curriculum_id__in=free_curriculum_ids,
-                        class_level_id__in=free_class_level_ids
-                    ).order_by('-created_at')[:3]
-            else:
-                quizzes = Quiz.objects.none()
-                featured_quizzes = Quiz.objects.none()
         else:
             quizzes = Quiz.objects.none()
             featured_quizzes = Quiz.objects.none()
@@ -282,84 +145,36 @@ def quiz_home(request):
     from django.db.models import Count
 
     # Get all subjects the user has access to, with quiz counts
-    if request.user.is_authenticated and (request.user.is_staff or request.user.is_superuser):
-        # Staff and superusers see all subjects
+    if is_staff or (entitlements.has_subscription and entitlements.all_curriculums):
+        # Staff, superusers and tier three see all subjects
         base_query = Subject.objects.filter(is_active=True)
-
-        # If curriculum and class level are selected, filter subjects accordingly
-        if selected_curriculum and selected_class_level:
-            subjects_with_quizzes = base_query.filter(
-                curriculum__code=selected_curriculum,
-                class_level_id=selected_class_level
-            ).annotate(quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))).order_by('name')
-        else:
-            subjects_with_quizzes = base_query.annotate(
-                quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))
-            ).order_by('name')
-
-    elif request.user.is_authenticated and active_subscription:
-        # If tier three, show all subjects
-        if active_subscription.plan.all_curriculums:
-            base_query = Subject.objects.filter(is_active=True)
-
-            # If curriculum and class level are selected, filter subjects accordingly
-            if selected_curriculum and selected_class_level:
-                subjects_with_quizzes = base_query.filter(
-                    curriculum__code=selected_curriculum,
-                    class_level_id=selected_class_level
-                ).annotate(quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))).order_by('name')
-            else:
-                subjects_with_quizzes = base_query.annotate(
-                    quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))
-                ).order_by('name')
-        else:
-            # Get the curricula and class levels the user has access to
-            accessible_curricula_ids = active_subscription.curriculum_accesses.values_list('curriculum_id', flat=True)
-            accessible_class_level_ids = active_subscription.curriculum_accesses.values_list('class_level_id', flat=True)
-
-            # Base query with access restrictions
-            base_query = Subject.objects.filter(
-                curriculum_id__in=accessible_curricula_ids,
-                class_level_id__in=accessible_class_level_ids,
-                is_active=True
-            )
-
-            # If curriculum and class level are selected, filter subjects accordingly
-            if selected_curriculum and selected_class_level:
-                subjects_with_quizzes = base_query.filter(
-                    curriculum__code=selected_curriculum,
-                    class_level_id=selected_class_level
-                ).annotate(quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))).order_by('name')
-            else:
-                subjects_with_quizzes = base_query.annotate(
-                    quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))
-                ).order_by('name')
+    elif entitlements.has_subscription:
+        # Base query with access restrictions
+        base_query = Subject.objects.filter(
+            curriculum_id__in=entitlements.accessible_curriculum_ids,
+            class_level_id__in=entitlements.accessible_class_level_ids,
+            is_active=True
+        )
+    elif entitlements.free_pairs:
+        # Base query with free tier restrictions
+        base_query = Subject.objects.filter(
+            curriculum_id__in=entitlements.free_curriculum_ids,
+            class_level_id__in=entitlements.free_class_level_ids,
+            is_active=True
+        )
     else:
-        # Free tier or not authenticated
-        if free_plan:
-            # Find sample curriculum accesses for the free tier
-            free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True)
-            free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True)
-
-            # Base query with free tier restrictions
-            base_query = Subject.objects.filter(
-                curriculum_id__in=free_curriculum_ids,
-                class_level_id__in=free_class_level_ids,
-                is_active=True
-            )
+        base_query = Subject.objects.none()
 
-            # If curriculum and class level are selected, filter subjects accordingly
-            if selected_curriculum and selected_class_level:
-                subjects_with_quizzes = base_query.filter(
-                    curriculum__code=selected_curriculum,
-                    class_level_id=selected_class_level
-                ).annotate(quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))).order_by('name')
-            else:
-                subjects_with_quizzes = base_query.annotate(
-                    quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))
-                ).order_by('name')
-        else:
-            subjects_with_quizzes = Subject.objects.none()
+    # If curriculum and class level are selected, filter subjects accordingly
+    if selected_curriculum and selected_class_level:
+        subjects_with_quizzes = base_query.filter(
+            curriculum__code=selected_curriculum,
+            class_level_id=selected_class_level
+        ).annotate(quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))).order_by('name')
+    else:
+        subjects_with_quizzes = base_query.annotate(
+            quiz_count=Count('quizzes', filter=Q(quizzes__is_active=True))
+        ).order_by('name')
 
     # Group quizzes by subject
     quizzes_by_subject = {}
@@ -468,10 +283,14 @@ def quiz_home(request):
     return render(request, 'quiz/quiz_home.html', context)
 
 
+@cache_public_page()
 def quiz_class_level_list(request, curriculum_code):
     """View for listing all class levels for a specific curriculum."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_levels = ClassLevel.objects.filter(curriculum=curriculum, is_active=True).order_by('level_order')
+    tree = CurriculumTree.get()
+    curriculum = tree.get_curriculum(curriculum_code)
+    if curriculum is None:
+        raise Http404("No curriculum matches the given query.")
+    class_levels = tree.class_levels(curriculum)
 
     context = {
         'curriculum': curriculum,
@@ -480,11 +299,12 @@ def quiz_class_level_list(request, curriculum_code):
     return render(request, 'quiz/quiz_class_level_list.html', context)
 
 
+@cache_public_page()
 def quiz_subject_list(request, curriculum_code, class_level_id):
     """View for listing all subjects for a specific class level."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subjects = Subject.objects.filter(curriculum=curriculum, class_level=class_level, is_active=True).order_by('name')
+    tree = CurriculumTree.get()
+    curriculum, class_level = tree.resolve(curriculum_code, class_level_id)[:2]
+    subjects = tree.subjects(class_level)
 
     context = {
         'curriculum': curriculum,
@@ -494,11 +314,10 @@ def quiz_subject_list(request, curriculum_code, class_level_id):
     return render(request, 'quiz/quiz_subject_list.html', context)
 
 
+@cache_public_page()
 def quiz_topic_list(request, curriculum_code, class_level_id, subject_slug):
     """View for listing all topics for a specific subject."""
-    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-    class_level = get_object_or_404(ClassLevel, id=class_level_id, curriculum=curriculum, is_active=True)
-    subject = get_object_or_404(Subject, slug=subject_slug, curriculum=curriculum, class_level=class_level, is_active=True)
+    curriculum, class_level, subject = CurriculumTree.get().resolve(curriculum_code, class_level_id, subject_slug)[:3]
 
     # Get all topics for this subject
     topics = Topic.objects.filter(subject=subject, is_active=True).order_by('order', 'name')
@@ -574,13 +393,8 @@ def start_general_quiz(request, curriculum_code, class_level_id, subject_slug):
         }
     )
 
-    # Create a new quiz attempt
-    quiz_attempt = QuizAttempt.objects.create(
-        user=request.user,
-        quiz=quiz,
-        status='in_progress',
-        total_questions=quiz.question_count
-    )
+    # Create a new quiz attempt with its question plan
+    quiz_attempt = QuizService.create_quiz_attempt(request.user, quiz)
 
     # Redirect to the quiz taking page
     return redirect('quiz:take_quiz', quiz_id=quiz.id)
@@ -614,13 +428,8 @@ def start_topic_quiz(request, curriculum_code, class_level_id, subject_slug, top
         }
     )
 
-    # Create a new quiz attempt
-    quiz_attempt = QuizAttempt.objects.create(
-        user=request.user,
-        quiz=quiz,
-        status='in_progress',
-        total_questions=quiz.question_count
-    )
+    # Create a new quiz attempt with its question plan
+    quiz_attempt = QuizService.create_quiz_attempt(request.user, quiz)
 
     # Redirect to the quiz taking page
     return redirect('quiz:take_quiz', quiz_id=quiz.id)
@@ -653,29 +462,24 @@ def take_quiz(request, quiz_id):
     # For practice exams, we should already have all question attempts created
     if quiz.quiz_type == 'practice':
         # Get all question attempts for this quiz attempt
-        all_question_attempts = QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt)
+        all_question_attempts = QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt).select_related('question').order_by('id')
 
-        if all_question_attempts.count() == 0:
+        if not all_question_attempts.exists():
             messages.warning(request, "No questions are available for this practice exam. Please try a different subject or topic.")
             return redirect('quiz:quiz_home')
 
         # If a specific question is requested, use that
         if current_question_id:
             try:
-                current_question = Question.objects.get(id=current_question_id)
-                question_attempt = QuestionAttempt.objects.get(
-                    quiz_attempt=quiz_attempt,
-                    question=current_question
-                )
-            except (Question.DoesNotExist, QuestionAttempt.DoesNotExist):
+                question_attempt = all_question_attempts.get(question_id=current_question_id)
+                current_question = question_attempt.question
+            except (QuestionAttempt.DoesNotExist, ValueError):
                 # If question doesn't exist or isn't part of this quiz, get the first question
                 question_attempt = all_question_attempts.first()
                 current_question = question_attempt.question
         else:
             # Get the first unanswered question or the first question if all are answered
-            unanswered_attempt = all_question_attempts.filter(
-                Q(selected_choice__isnull=True) & Q(provided_answer='')
-            ).first()
+            unanswered_attempt = all_question_attempts.filter(is_answered=False).first()
 
             if unanswered_attempt:
                 question_attempt = unanswered_attempt
@@ -684,63 +488,57 @@ def take_quiz(request, quiz_id):
                 question_attempt = all_question_attempts.first()
                 current_question = question_attempt.question
     else:
-        # For regular quizzes, handle as before
-        # If a specific question is requested, use that
+        # For regular quizzes, serve questions from the attempt's question plan
+        question_plan = QuizService.get_question_plan(quiz_attempt)
+        current_question = None
+
+        # If a specific question is requested, use it only if it is part of the plan
         if current_question_id:
-            try:
-                current_question = Question.objects.get(id=current_question_id)
-                # Verify this question belongs to this quiz attempt
-                question_attempt, _ = QuestionAttempt.objects.get_or_create(
-                    quiz_attempt=quiz_attempt,
-                    question=current_question
-                )
-            except Question.DoesNotExist:
-                # If question doesn't exist, get the next unanswered question
-                current_question = QuizService.get_next_question(quiz_attempt)
-                if current_question:
-                    question_attempt, _ = QuestionAttempt.objects.get_or_create(
-                        quiz_attempt=quiz_attempt,
-                        question=current_question
-                    )
-                else:
-                    messages.warning(request, "No questions are available for this quiz.")
-                    return redirect('quiz:quiz_home')
-        else:
+            position = quiz_attempt.get_question_position(current_question_id)
+            if position is not None:
+                current_question = QuizService.get_question_at(quiz_attempt, position)
+
+        if not current_question:
             # Get the next question for this attempt
             current_question = QuizService.get_next_question(quiz_attempt)
-            if current_question:
-                question_attempt, _ = QuestionAttempt.objects.get_or_create(
-                    quiz_attempt=quiz_attempt,
-                    question=current_question
-                )
-            else:
-                messages.warning(request, "No questions are available for this quiz.")
-                return redirect('quiz:quiz_home')
+
+        if current_question:
+            question_attempt, _ = QuestionAttempt.objects.get_or_create(
+                quiz_attempt=quiz_attempt,
+                question=current_question
+            )
+        elif not question_plan:
+            messages.warning(request, "No questions are available for this quiz.")
+            return redirect('quiz:quiz_home')
 
     if not current_question:
         # If there are no more questions, redirect to the results page
-        quiz_attempt.status = 'completed'
-        quiz_attempt.completed_at = timezone.now()
-        quiz_attempt.save()
+        quiz_attempt.complete()
         return redirect('quiz:quiz_results', quiz_attempt_id=quiz_attempt.id)
 
     # Get all question attempts for this quiz attempt to build navigation
-    all_question_attempts = QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt).order_by('id')
-    question_ids = list(all_question_attempts.values_list('question_id', flat=True))
-
-    # Find previous and next question IDs for navigation
-    try:
-        current_index = question_ids.index(current_question.id)
+    all_question_attempts = QuestionAttempt.objects.filter(
+        quiz_attempt=quiz_attempt
+    ).select_related('question', 'selected_choice').order_by('id')
+
+    # Find previous and next question IDs from the question plan
+    question_ids = QuizService.get_question_plan(quiz_attempt)
+    current_index = quiz_attempt.get_question_position(current_question.id)
+    if current_index is not None:
         prev_question_id = question_ids[current_index - 1] if current_index > 0 else None
         next_question_id = question_ids[current_index + 1] if current_index < len(question_ids) - 1 else None
-    except (ValueError, IndexError):
+    else:
+        current_index = 0
         prev_question_id = None
         next_question_id = None
 
-    # Get randomized choices for multiple-choice questions
+    # Get the choices for multiple-choice questions, in a stable order for this attempt
     choices = []
     if current_question.question_type == 'multiple_choice':
-        choices = QuestionRandomizer.randomize_choices(current_question)
+        if quiz.randomize_choices:
+            choices = QuestionRandomizer.randomize_choices(current_question, seed=quiz_attempt.id)
+        else:
+            choices = list(QuestionBundleCache.get(current_question).choices)
 
     # Calculate progress
     total_attempted = all_question_attempts.count()
@@ -762,7 +560,7 @@ def take_quiz(request, quiz_id):
         'choices': choices,
         'per_question_time': per_question_time,
         'progress_percentage': progress_percentage,
-        'current_question_number': current_index + 1 if 'current_index' in locals() else 1,
+        'current_question_number': current_index + 1,
         'total_questions': quiz_attempt.total_questions,
         'prev_question_id': prev_question_id,
         'next_question_id': next_question_id,
@@ -785,14 +583,15 @@ def answer_question(request, quiz_attempt_id, question_id):
         return redirect('quiz:quiz_results', quiz_attempt_id=quiz_attempt.id)
 
     # Check if the quiz has timed out
-    # Calculate total time limit based on per_question_time and question_count
-    total_time_limit_seconds = quiz_attempt.quiz.per_question_time * quiz_attempt.quiz.question_count
+    # Calculate total time limit based on per_question_time and the attempt's question count
+    total_time_limit_seconds = quiz_attempt.quiz.per_question_time * quiz_attempt.total_questions
     if total_time_limit_seconds > 0:
         elapsed_seconds = (timezone.now() - quiz_attempt.started_at).total_seconds()
         if elapsed_seconds > total_time_limit_seconds:
             quiz_attempt.status = 'timed_out'
             quiz_attempt.completed_at = timezone.now()
-            quiz_attempt.save()
+            # Only the status changes; the score counters may be updated concurrently
+            quiz_attempt.save(update_fields=['status', 'completed_at'])
             messages.warning(request, "Time's up! Your quiz has been submitted.")
             return redirect('quiz:quiz_results', quiz_attempt_id=quiz_attempt.id)
 
@@ -812,21 +611,21 @@ def answer_question(request, quiz_attempt_id, question_id):
                 seed=quiz_attempt.id
             )
         else:
-            choices = list(QuestionChoice.objects.filter(question=question))
+            choices = list(QuestionBundleCache.get(question).choices)
     else:
         choices = None
 
     # Calculate time remaining
     time_remaining = None
-    # Calculate total time limit based on per_question_time and question_count
-    total_time_limit_seconds = quiz_attempt.quiz.per_question_time * quiz_attempt.quiz.question_count
+    # Calculate total time limit based on per_question_time and the attempt's question count
+    total_time_limit_seconds = quiz_attempt.quiz.per_question_time * quiz_attempt.total_questions
     if total_time_limit_seconds > 0:
         elapsed_seconds = (timezone.now() - quiz_attempt.started_at).total_seconds()
         time_remaining = max(0, total_time_limit_seconds - elapsed_seconds)
 
     # Calculate progress
     total_attempted = QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt).count()
-    progress_percentage = int((total_attempted / quiz_attempt.quiz.question_count) * 100)
+    progress_percentage = int((total_attempted / quiz_attempt.total_questions) * 100) if quiz_attempt.total_questions else 0
 
     context = {
         'quiz': quiz_attempt.quiz,
@@ -836,7 +635,7 @@ def answer_question(request, quiz_attempt_id, question_id):
         'time_remaining': time_remaining,
         'progress_percentage': progress_percentage,
         'total_attempted': total_attempted,
-        'total_questions': quiz_attempt.quiz.question_count,
+        'total_questions': quiz_attempt.total_questions,
     }
     return render(request, 'quiz/take_quiz.html', context)
 
@@ -882,55 +681,60 @@ def submit_answer(request, quiz_attempt_id, question_id):
     correct_answer_text = None
 
     if not timed_out:  # Only check correctness if not timed out
+        bundle = QuestionBundleCache.get(question)
         if question.question_type == 'multiple_choice':
             choice_id = request.POST.get('choice')
             if choice_id:
-                choice = get_object_or_404(QuestionChoice, id=choice_id, question=question)
+                choice = bundle.get_choice(choice_id)
+                if choice is None:
+                    raise Http404("Choice not found for this question.")
                 question_attempt.selected_choice = choice
                 is_correct = choice.is_correct
 
                 # Get the correct answer text for feedback
-                correct_choice = QuestionChoice.objects.filter(question=question, is_correct=True).first()
-                if correct_choice:
-                    correct_answer_text = correct_choice.text
+                correct_answer_text = bundle.correct_answer_text
         else:  # short_answer
             provided_answer = request.POST.get('answer', '').strip()
             question_attempt.provided_answer = provided_answer
 
             # Check if the answer is correct using our validator
-            correct_answers = ShortAnswer.objects.filter(question=question)
-            is_correct = ShortAnswerValidator.validate_answer(provided_answer, correct_answers)
+            is_correct = bundle.matcher.matches(provided_answer)
 
             # Get the correct answer text for feedback
-            if correct_answers.exists():
-                correct_answer_text = ", ".join([ans.text for ans in correct_answers])
+            correct_answer_text = bundle.correct_answer_text
+
+    with transaction.atomic():
+        # Remember the previous result so statistics can be adjusted if the answer changes.
+        # The row is locked so a repeated submission waits and then sees this answer.
+        previous = QuestionAttempt.objects.select_for_update().only('is_answered', 'is_correct').get(
+            pk=question_attempt.pk
+        )
+        previous_is_correct = previous.is_correct if previous.is_answered else None
 
-    # Update the question attempt
-    question_attempt.is_correct = is_correct
-    question_attempt.save()
+        # Update the question attempt
+        question_attempt.is_correct = is_correct
+        question_attempt.is_answered = True
+        question_attempt.save()
 
-    # Update the quiz attempt score
-    correct_count = QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt, is_correct=True).count()
-    quiz_attempt.correct_answers = correct_count
-    quiz_attempt.score = int((correct_count / quiz_attempt.total_questions) * 100)
-    quiz_attempt.save()
+        # Update the user's question and topic statistics
+        QuestionStatService.record_answer(request.user, question, is_correct, previous_is_correct)
+
+        # Update the quiz attempt score; a changed answer reverses the previous result
+        if previous_is_correct is None:
+            quiz_attempt.record_answer(int(is_correct), 1)
+        else:
+            quiz_attempt.record_answer(int(is_correct) - int(previous_is_correct), 0)
 
     # Get the next question ID if available
     next_question_id = request.POST.get('next_question_id')
 
-    # Get all question attempts for this quiz attempt
-    all_question_attempts = QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt)
-    attempted_count = all_question_attempts.count()
-
     # Check if this was the last question
-    is_last_question = attempted_count >= quiz_attempt.total_questions
+    is_last_question = quiz_attempt.answered_questions >= quiz_attempt.total_questions
 
     # Determine the redirect URL
     if is_last_question:
         # If this was the last question, mark the quiz as completed
-        quiz_attempt.status = 'completed'
-        quiz_attempt.completed_at = timezone.now()
-        quiz_attempt.save()
+        quiz_attempt.complete()
         redirect_url = f'/quiz/results/{quiz_attempt.id}/'
     elif next_question_id:
         # If we have a next question ID, go to that question
@@ -942,9 +746,7 @@ def submit_answer(request, quiz_attempt_id, question_id):
             redirect_url = f'/quiz/take/{quiz_attempt.quiz.id}/?question_id={next_question.id}'
         else:
             # If no more questions, go to results
-            quiz_attempt.status = 'completed'
-            quiz_attempt.completed_at = timezone.now()
-            quiz_attempt.save()
+            quiz_attempt.complete()
             redirect_url = f'/quiz/results/{quiz_attempt.id}/'
 
     # If this is an AJAX request, return JSON response
@@ -961,6 +763,42 @@ def submit_answer(request, quiz_attempt_id, question_id):
     return redirect(redirect_url)
 
 
+@login_required
+@require_POST
+def submit_answer_sheet(request, quiz_attempt_id):
+    """Grade a whole answer sheet, posted as JSON, and complete the quiz attempt."""
+    quiz_attempt = get_object_or_404(QuizAttempt, id=quiz_attempt_id, user=request.user)
+
+    import json
+    try:
+        data = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'message': "Invalid answer sheet."}, status=400)
+
+    answer_sheet = data.get('answers') if isinstance(data, dict) else None
+    if not isinstance(answer_sheet, list):
+        return JsonResponse({'success': False, 'message': "Invalid answer sheet."}, status=400)
+
+    try:
+        graded = QuizService.grade_answer_sheet(quiz_attempt, answer_sheet)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e),
+            'redirect_url': f'/quiz/results/{quiz_attempt.id}/'
+        }, status=409)
+
+    quiz_attempt.refresh_from_db()
+    return JsonResponse({
+        'success': True,
+        'graded': graded,
+        'score': quiz_attempt.score,
+        'correct_answers': quiz_attempt.correct_answers,
+        'total_questions': quiz_attempt.total_questions,
+        'redirect_url': f'/quiz/results/{quiz_attempt.id}/'
+    })
+
+
 @login_required
 def question_feedback(request, quiz_attempt_id, question_id, next_question_id=None):
     """Show feedback for a question after answering."""
@@ -972,15 +810,17 @@ def question_feedback(request, quiz_attempt_id, question_id, next_question_id=No
                                          quiz_attempt=quiz_attempt,
                                          question=question)
 
+    bundle = QuestionBundleCache.get(question)
+
     # Get all choices for multiple choice questions
     choices = None
     if question.question_type == 'multiple_choice':
-        choices = QuestionChoice.objects.filter(question=question)
+        choices = bundle.choices
 
     # Get correct answers for short answer questions
     correct_answers = None
     if question.question_type == 'short_answer':
-        correct_answers = ShortAnswer.objects.filter(question=question)
+        correct_answers = bundle.short_answers
 
     context = {
         'quiz_attempt': quiz_attempt,
@@ -1051,14 +891,12 @@ def resume_quiz(request, quiz_attempt_id):
         return redirect('quiz:quiz_results', quiz_attempt_id=quiz_attempt.id)
 
     # Check if there are any existing question attempts
-    existing_attempts = QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt)
+    existing_attempts = QuestionAttempt.objects.filter(quiz_attempt=quiz_attempt).order_by('id')
 
     # For practice exams, we should already have all question attempts created
     if quiz_attempt.quiz.quiz_type == 'practice' and existing_attempts.exists():
         # Find the first unanswered question
-        unanswered_attempt = existing_attempts.filter(
-            Q(selected_choice__isnull=True) & Q(provided_answer='')
-        ).first()
+        unanswered_attempt = existing_attempts.filter(is_answered=False).first()
 
         if unanswered_attempt:
             return redirect('quiz:answer_question',
@@ -1066,9 +904,7 @@ def resume_quiz(request, quiz_attempt_id):
                             question_id=unanswered_attempt.question.id)
         else:
             # If all questions have been answered, complete the quiz
-            quiz_attempt.status = 'completed'
-            quiz_attempt.completed_at = timezone.now()
-            quiz_attempt.save()
+            quiz_attempt.complete()
             return redirect('quiz:quiz_results', quiz_attempt_id=quiz_attempt.id)
 
     # For other quiz types, get the next unanswered question
@@ -1081,9 +917,7 @@ def resume_quiz(request, quiz_attempt_id):
                         question_id=next_question.id)
     else:
         # If all questions have been answered, complete the quiz
-        quiz_attempt.status = 'completed'
-        quiz_attempt.completed_at = timezone.now()
-        quiz_attempt.save()
+        quiz_attempt.complete()
         return redirect('quiz:quiz_results', quiz_attempt_id=quiz_attempt.id)
 
 
@@ -1277,7 +1111,9 @@ def mark_note_completed(request, note_id):
 def check_answer(request, question_id, choice_id):
     """Check if a multiple-choice answer is correct."""
     question = get_object_or_404(Question, id=question_id)
-    choice = get_object_or_404(QuestionChoice, id=choice_id, question=question)
+    choice = QuestionBundleCache.get(question).get_choice(choice_id)
+    if choice is None:
+        raise Http404("Choice not found for this question.")
 
     return JsonResponse({
         'is_correct': choice.is_correct,
@@ -1297,9 +1133,7 @@ def check_short_answer(request, question_id):
     answer = data.get('answer', '').strip()
 
     question = get_object_or_404(Question, id=question_id)
-    correct_answers = ShortAnswer.objects.filter(question=question)
-
-    is_correct = ShortAnswerValidator.validate_answer(answer, correct_answers)
+    is_correct = QuestionBundleCache.get(question).matcher.matches(answer)
 
     return JsonResponse({
         'is_correct': is_correct,
@@ -1317,118 +1151,17 @@ def get_class_levels(request):
     print(f"User authenticated: {request.user.is_authenticated}")
 
     # Get accessible class levels based on user's subscription tier
-    if request.user.is_authenticated:
-        if request.user.is_staff or request.user.is_superuser:
-            # Staff and superusers see all class levels
-            if curriculum_code:
-                try:
-                    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-                    class_levels = ClassLevel.objects.filter(curriculum=curriculum, is_active=True).order_by('level_order')
-                    print(f"Found {class_levels.count()} class levels for curriculum {curriculum_code}")
-                    for level in class_levels:
-                        print(f"  - {level.id}: {level.name}")
-                except Exception as e:
-                    print(f"Error getting class levels: {e}")
-                    class_levels = ClassLevel.objects.none()
-            else:
-                class_levels = ClassLevel.objects.filter(is_active=True).order_by('curriculum__name', 'level_order')
-        else:
-            # Get user's active subscription
-            from subscription.models import Subscription
-            from django.utils import timezone
-
-            active_subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
-
-            if active_subscription:
-                # If tier three, show all class levels
-                if active_subscription.plan.all_curriculums:
-                    if curriculum_code:
-                        curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-                        class_levels = ClassLevel.objects.filter(curriculum=curriculum, is_active=True).order_by('level_order')
-                    else:
-                        class_levels = ClassLevel.objects.filter(is_active=True).order_by('curriculum__name', 'level_order')
-                else:
-                    # Get the class levels the user has access to
-                    accessible_class_level_ids = active_subscription.curriculum_accesses.values_list('class_level_id', flat=True).distinct()
-
-                    if curriculum_code:
-                        curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-                        class_levels = ClassLevel.objects.filter(
-                            id__in=accessible_class_level_ids,
-                            curriculum=curriculum,
-                            is_active=True
-                        ).order_by('level_order')
-                    else:
-                        class_levels = ClassLevel.objects.filter(
-                            id__in=accessible_class_level_ids,
-                            is_active=True
-                        ).order_by('curriculum__name', 'level_order')
-            else:
-                # No active subscription, show only free tier class levels
-                from subscription.models import SubscriptionPlan, CurriculumAccess
-
-                # Find a free subscription to determine what's available in free tier
-                free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-                if free_plan:
-                    # Find sample curriculum accesses for the free tier
-                    sample_accesses = CurriculumAccess.objects.filter(
-                        subscription__plan=free_plan
-                    )
-
-                    if sample_accesses.exists():
-                        free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True).distinct()
-
-                        if curriculum_code:
-                            curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-                            class_levels = ClassLevel.objects.filter(
-                                id__in=free_class_level_ids,
-                                curriculum=curriculum,
-                                is_active=True
-                            ).order_by('level_order')
-                        else:
-                            class_levels = ClassLevel.objects.filter(
-                                id__in=free_class_level_ids,
-                                is_active=True
-                            ).order_by('curriculum__name', 'level_order')
-                    else:
-                        class_levels = ClassLevel.objects.none()
-                else:
-                    class_levels = ClassLevel.objects.none()
+    scope = get_entitlements(request).get_content_scope()
+    class_levels = ClassLevel.objects.filter(is_active=True)
+    if scope is not None:
+        _, class_level_ids = scope
+        class_levels = class_levels.filter(id__in=class_level_ids)
+
+    if curriculum_code:
+        curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
+        class_levels = class_levels.filter(curriculum=curriculum).order_by('level_order')
     else:
-        # Not authenticated, show only free tier class levels
-        from subscription.models import SubscriptionPlan, CurriculumAccess
-
-        # Find a free subscription to determine what's available in free tier
-        free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-        if free_plan:
-            # Find sample curriculum accesses for the free tier
-            sample_accesses = CurriculumAccess.objects.filter(
-                subscription__plan=free_plan
-            )
-
-            if sample_accesses.exists():
-                free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True).distinct()
-
-                if curriculum_code:
-                    curriculum = get_object_or_404(Curriculum, code=curriculum_code, is_active=True)
-                    class_levels = ClassLevel.objects.filter(
-                        id__in=free_class_level_ids,
-                        curriculum=curriculum,
-                        is_active=True
-                    ).order_by('level_order')
-                else:
-                    class_levels = ClassLevel.objects.filter(
-                        id__in=free_class_level_ids,
-                        is_active=True
-                    ).order_by('curriculum__name', 'level_order')
-            else:
-                class_levels = ClassLevel.objects.none()
-        else:
-            class_levels = ClassLevel.objects.none()
+        class_levels = class_levels.order_by('curriculum__name', 'level_order')
 
     # Get the selected class level from the request, if any
     selected_class_level = request.GET.get('selected_class_level', None)
@@ -1444,129 +1177,20 @@ def get_subjects(request):
     class_level_id = request.GET.get('class_level', '')
 
     # Get accessible subjects based on user's subscription tier
-    if request.user.is_authenticated:
-        if request.user.is_staff or request.user.is_superuser:
-            # Staff and superusers see all subjects
-            if class_level_id:
-                class_level = get_object_or_404(ClassLevel, id=class_level_id, is_active=True)
-                subjects = Subject.objects.filter(class_level=class_level, is_active=True).order_by('name')
-            else:
-                subjects = Subject.objects.filter(is_active=True).order_by('class_level__curriculum__name', 'class_level__level_order', 'name')
+    scope = get_entitlements(request).get_content_scope()
+    if class_level_id:
+        # Check if the user has access to this class level
+        if scope is not None and int(class_level_id) not in scope[1]:
+            subjects = Subject.objects.none()
         else:
-            # Get user's active subscription
-            from subscription.models import Subscription
-            from django.utils import timezone
-
-            active_subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
-
-            if active_subscription:
-                # If tier three, show all subjects
-                if active_subscription.plan.all_curriculums:
-                    if class_level_id:
-                        class_level = get_object_or_404(ClassLevel, id=class_level_id, is_active=True)
-                        subjects = Subject.objects.filter(class_level=class_level, is_active=True).order_by('name')
-                    else:
-                        subjects = Subject.objects.filter(is_active=True).order_by('class_level__curriculum__name', 'class_level__level_order', 'name')
-                else:
-                    # Get the curricula and class levels the user has access to
-                    accessible_curricula_ids = active_subscription.curriculum_accesses.values_list('curriculum_id', flat=True).distinct()
-                    accessible_class_level_ids = active_subscription.curriculum_accesses.values_list('class_level_id', flat=True).distinct()
-
-                    if class_level_id:
-                        # Check if the user has access to this class level
-                        if int(class_level_id) in accessible_class_level_ids:
-                            class_level = get_object_or_404(ClassLevel, id=class_level_id, is_active=True)
-                            subjects = Subject.objects.filter(
-                                class_level=class_level,
-                                curriculum_id__in=accessible_curricula_ids,
-                                is_active=True
-                            ).order_by('name')
-                        else:
-                            subjects = Subject.objects.none()
-                    else:
-                        subjects = Subject.objects.filter(
-                            curriculum_id__in=accessible_curricula_ids,
-                            class_level_id__in=accessible_class_level_ids,
-                            is_active=True
-                        ).order_by('class_level__curriculum__name', 'class_level__level_order', 'name')
-            else:
-                # No active subscription, show only free tier subjects
-                from subscription.models import SubscriptionPlan, CurriculumAccess
-
-                # Find a free subscription to determine what's available in free tier
-                free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-                if free_plan:
-                    # Find sample curriculum accesses for the free tier
-                    sample_accesses = CurriculumAccess.objects.filter(
-                        subscription__plan=free_plan
-                    )
-
-                    if sample_accesses.exists():
-                        free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True).distinct()
-                        free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True).distinct()
-
-                        if class_level_id:
-                            # Check if this class level is available in the free tier
-                            if int(class_level_id) in free_class_level_ids:
-                                class_level = get_object_or_404(ClassLevel, id=class_level_id, is_active=True)
-                                subjects = Subject.objects.filter(
-                                    class_level=class_level,
-                                    curriculum_id__in=free_curriculum_ids,
-                                    is_active=True
-                                ).order_by('name')
-                            else:
-                                subjects = Subject.objects.none()
-                        else:
-                            subjects = Subject.objects.filter(
-                                curriculum_id__in=free_curriculum_ids,
-                                class_level_id__in=free_class_level_ids,
-                                is_active=True
-                            ).order_by('class_level__curriculum__name', 'class_level__level_order', 'name')
-                    else:
-                        subjects = Subject.objects.none()
-                else:
-                    subjects = Subject.objects.none()
+            class_level = get_object_or_404(ClassLevel, id=class_level_id, is_active=True)
+            subjects = Subject.objects.filter(class_level=class_level, is_active=True).order_by('name')
+            if scope is not None:
+                subjects = subjects.filter(curriculum_id__in=scope[0])
     else:
-        # Not authenticated, show only free tier subjects
-        from subscription.models import SubscriptionPlan, CurriculumAccess
-
-        # Find a free subscription to determine what's available in free tier
-        free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-        if free_plan:
-            # Find sample curriculum accesses for the free tier
-            sample_accesses = CurriculumAccess.objects.filter(
-                subscription__plan=free_plan
-            )
-
-            if sample_accesses.exists():
-                free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True).distinct()
-                free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True).distinct()
-
-                if class_level_id:
-                    # Check if this class level is available in the free tier
-                    if int(class_level_id) in free_class_level_ids:
-                        class_level = get_object_or_404(ClassLevel, id=class_level_id, is_active=True)
-                        subjects = Subject.objects.filter(
-                            class_level=class_level,
-                            curriculum_id__in=free_curriculum_ids,
-                            is_active=True
-                        ).order_by('name')
-                    else:
-                        subjects = Subject.objects.none()
-                else:
-                    subjects = Subject.objects.filter(
-                        curriculum_id__in=free_curriculum_ids,
-                        class_level_id__in=free_class_level_ids,
-                        is_active=True
-                    ).order_by('class_level__curriculum__name', 'class_level__level_order', 'name')
-            else:
-                subjects = Subject.objects.none()
-        else:
-            subjects = Subject.objects.none()
+        subjects = Subject.objects.filter(is_active=True).order_by('class_level__curriculum__name', 'class_level__level_order', 'name')
+        if scope is not None:
+            subjects = subjects.filter(curriculum_id__in=scope[0], class_level_id__in=scope[1])
 
     return render(request, 'quiz/partials/subject_options.html', {
         'subjects': subjects
@@ -1654,11 +1278,6 @@ def subject_quizzes(request, subject_slug):
         is_active=True
     ).order_by('-created_at')
 
-    # Calculate time limit for each quiz
-    for quiz in quizzes:
-        # Calculate time limit in minutes
-        quiz.time_limit = round(quiz.question_count * quiz.per_question_time / 60)
-
     # Get all topics for this subject for filtering
     topics = Topic.objects.filter(subject=subject, is_active=True).order_by('order', 'name')
 
@@ -1704,10 +1323,22 @@ def subject_quizzes(request, subject_slug):
             if quiz.id in quiz_stats:
                 quiz.highest_score = quiz_stats[quiz.id]['highest_score']
                 quiz.attempt_count = quiz_stats[quiz.id]['attempt_count']
+
+            # The practice exam quiz is shared by every run, each with its own
+            # question count, so show the size of the user's latest run
+            if quiz.quiz_type == 'practice':
+                latest_attempt = user_attempts.filter(quiz_id=quiz.id).order_by('-started_at').first()
+                if latest_attempt:
+                    quiz.question_count = latest_attempt.total_questions
     else:
         completed_quizzes = {}
         in_progress_quizzes = {}
 
+    # Calculate time limit for each quiz
+    for quiz in quizzes:
+        # Calculate time limit in minutes
+        quiz.time_limit = round(quiz.question_count * quiz.per_question_time / 60)
+
     context = {
         'subject': subject,
         'curriculum': curriculum,
@@ -1725,118 +1356,22 @@ def get_topics(request):
     subject_slug = request.GET.get('subject', '')
 
     # Get accessible topics based on user's subscription tier
-    if request.user.is_authenticated:
-        if request.user.is_staff or request.user.is_superuser:
-            # Staff and superusers see all topics
-            if subject_slug:
-                subject = get_object_or_404(Subject, slug=subject_slug, is_active=True)
-                topics = Topic.objects.filter(subject=subject, is_active=True).order_by('order', 'name')
-            else:
-                topics = Topic.objects.filter(is_active=True).order_by('subject__name', 'order', 'name')
+    scope = get_entitlements(request).get_content_scope()
+    if subject_slug:
+        subject = get_object_or_404(Subject, slug=subject_slug, is_active=True)
+        # Check if the user has access to this subject's curriculum and class level
+        if scope is not None and not (subject.curriculum_id in scope[0] and subject.class_level_id in scope[1]):
+            topics = Topic.objects.none()
         else:
-            # Get user's active subscription
-            from subscription.models import Subscription
-            from django.utils import timezone
-
-            active_subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
-
-            if active_subscription:
-                # If tier three, show all topics
-                if active_subscription.plan.all_curriculums:
-                    if subject_slug:
-                        subject = get_object_or_404(Subject, slug=subject_slug, is_active=True)
-                        topics = Topic.objects.filter(subject=subject, is_active=True).order_by('order', 'name')
-                    else:
-                        topics = Topic.objects.filter(is_active=True).order_by('subject__name', 'order', 'name')
-                else:
-                    # Get the curricula and class levels the user has access to
-                    accessible_curricula_ids = active_subscription.curriculum_accesses.values_list('curriculum_id', flat=True).distinct()
-                    accessible_class_level_ids = active_subscription.curriculum_accesses.values_list('class_level_id', flat=True).distinct()
-
-                    if subject_slug:
-                        subject = get_object_or_404(Subject, slug=subject_slug, is_active=True)
-                        # Check if the user has access to this subject's curriculum and class level
-                        if subject.curriculum_id in accessible_curricula_ids and subject.class_level_id in accessible_class_level_ids:
-                            topics = Topic.objects.filter(subject=subject, is_active=True).order_by('order', 'name')
-                        else:
-                            topics = Topic.objects.none()
-                    else:
-                        topics = Topic.objects.filter(
-                            subject__curriculum_id__in=accessible_curricula_ids,
-                            subject__class_level_id__in=accessible_class_level_ids,
-                            is_active=True
-                        ).order_by('subject__name', 'order', 'name')
-            else:
-                # No active subscription, show only free tier topics
-                from subscription.models import SubscriptionPlan, CurriculumAccess
-
-                # Find a free subscription to determine what's available in free tier
-                free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-                if free_plan:
-                    # Find sample curriculum accesses for the free tier
-                    sample_accesses = CurriculumAccess.objects.filter(
-                        subscription__plan=free_plan
-                    )
-
-                    if sample_accesses.exists():
-                        free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True).distinct()
-                        free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True).distinct()
-
-                        if subject_slug:
-                            subject = get_object_or_404(Subject, slug=subject_slug, is_active=True)
-                            # Check if this subject is available in the free tier
-                            if subject.curriculum_id in free_curriculum_ids and subject.class_level_id in free_class_level_ids:
-                                topics = Topic.objects.filter(subject=subject, is_active=True).order_by('order', 'name')
-                            else:
-                                topics = Topic.objects.none()
-                        else:
-                            topics = Topic.objects.filter(
-                                subject__curriculum_id__in=free_curriculum_ids,
-                                subject__class_level_id__in=free_class_level_ids,
-                                is_active=True
-                            ).order_by('subject__name', 'order', 'name')
-                    else:
-                        topics = Topic.objects.none()
-                else:
-                    topics = Topic.objects.none()
+            topics = Topic.objects.filter(subject=subject, is_active=True).order_by('order', 'name')
     else:
-        # Not authenticated, show only free tier topics
-        from subscription.models import SubscriptionPlan, CurriculumAccess
-
-        # Find a free subscription to determine what's available in free tier
-        free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
-        if free_plan:
-            # Find sample curriculum accesses for the free tier
-            sample_accesses = CurriculumAccess.objects.filter(
-                subscription__plan=free_plan
+        topics = Topic.objects.filter(is_active=True).order_by('subject__name', 'order', 'name')
+        if scope is not None:
+            topics = topics.filter(
+                subject__curriculum_id__in=scope[0],
+                subject__class_level_id__in=scope[1]
             )
 
-            if sample_accesses.exists():
-                free_curriculum_ids = sample_accesses.values_list('curriculum_id', flat=True).distinct()
-                free_class_level_ids = sample_accesses.values_list('class_level_id', flat=True).distinct()
-
-                if subject_slug:
-                    subject = get_object_or_404(Subject, slug=subject_slug, is_active=True)
-                    # Check if this subject is available in the free tier
-                    if subject.curriculum_id in free_curriculum_ids and subject.class_level_id in free_class_level_ids:
-                        topics = Topic.objects.filter(subject=subject, is_active=True).order_by('order', 'name')
-                    else:
-                        topics = Topic.objects.none()
-                else:
-                    topics = Topic.objects.filter(
-                        subject__curriculum_id__in=free_curriculum_ids,
-                        subject__class_level_id__in=free_class_level_ids,
-                        is_active=True
-                    ).order_by('subject__name', 'order', 'name')
-            else:
-                topics = Topic.objects.none()
-        else:
-            topics = Topic.objects.none()
-
     return render(request, 'quiz/partials/topic_options.html', {
         'topics': topics
     })
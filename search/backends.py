@@ -0,0 +1,263 @@
+"""
+Search backends for the search app.
+The backend used by the search view is named by the SEARCH_BACKEND setting.
+"""
+
+import heapq
+from operator import itemgetter
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from curriculum.models import Subject, Topic, Note
+from quiz.models import Question
+from .index import InvertedIndex
+
+DEFAULT_BACKEND = 'search.backends.InvertedIndexBackend'
+
+# Search types accepted by the view, mapped to the document types they cover
+SEARCH_TYPES = {
+    'all': InvertedIndex.TYPES,
+    'subjects': ('subject',),
+    'topics': ('topic',),
+    'notes': ('note',),
+    'questions': ('question',),
+}
+
+
+def _truncate(text, length=200):
+    return text[:length] + '...' if len(text) > length else text
+
+
+def subject_result(subject):
+    return {
+        'type': 'subject',
+        'title': subject.name,
+        'description': subject.description,
+        'url': subject.get_absolute_url(),
+        'curriculum': subject.curriculum.name,
+        'class_level': subject.class_level.name,
+    }
+
+
+def topic_result(topic):
+    return {
+        'type': 'topic',
+        'title': topic.name,
+        'description': topic.description,
+        'url': topic.get_absolute_url(),
+        'subject': topic.subject.name,
+        'curriculum': topic.subject.curriculum.name,
+        'class_level': topic.subject.class_level.name,
+    }
+
+
+def note_result(note):
+    return {
+        'type': 'note',
+        'title': note.title,
+        'description': _truncate(note.content),
+        'url': note.get_absolute_url(),
+        'topic': note.topic.name,
+        'subject': note.topic.subject.name,
+    }
+
+
+def question_result(question):
+    return {
+        'type': 'question',
+        'title': f"Question: {question.text[:100]}...",
+        'description': _truncate(question.explanation),
+        'url': f"/quiz/question/{question.id}/",
+        'subject': question.subject.name,
+        'topic': question.topic.name if question.topic else '',
+    }
+
+
+# Model of each document type
+SEARCH_MODELS = {
+    'subject': Subject,
+    'topic': Topic,
+    'note': Note,
+    'question': Question,
+}
+
+# Per document type, the lookup behind each search filter
+FILTER_LOOKUPS = {
+    'subject': {'curriculum': 'curriculum__code', 'class_level': 'class_level__id'},
+    'topic': {
+        'curriculum': 'subject__curriculum__code',
+        'class_level': 'subject__class_level__id',
+        'subject': 'subject__slug',
+    },
+    'note': {
+        'curriculum': 'topic__subject__curriculum__code',
+        'class_level': 'topic__subject__class_level__id',
+        'subject': 'topic__subject__slug',
+    },
+    'question': {'curriculum': 'curriculum__code', 'class_level': 'class_level__id', 'subject': 'subject__slug'},
+}
+
+# Per document type: the queryset to load a page of hits from and the result builder
+RESULT_LOADERS = {
+    'subject': (lambda: Subject.objects.select_related('curriculum', 'class_level'), subject_result),
+    'topic': (lambda: Topic.objects.select_related('subject__curriculum', 'subject__class_level'), topic_result),
+    'note': (lambda: Note.objects.select_related('topic__subject__curriculum', 'topic__subject__class_level'),
+             note_result),
+    'question': (lambda: Question.objects.select_related('subject', 'topic'), question_result),
+}
+
+
+def load_results(hits):
+    """
+    Turn ranked hits into result dicts, in rank order.
+
+    Args:
+        hits: A list of (type, pk, score) tuples
+
+    Returns:
+        A list of result dicts with a 'rank' key, skipping hits whose object is gone
+    """
+    pks = {}
+    for doc_type, pk, _ in hits:
+        pks.setdefault(doc_type, []).append(pk)
+
+    objects = {
+        doc_type: RESULT_LOADERS[doc_type][0]().in_bulk(type_pks)
+        for doc_type, type_pks in pks.items()
+    }
+
+    results = []
+    for doc_type, pk, score in hits:
+        obj = objects[doc_type].get(pk)
+        if obj is None:
+            continue
+        result = RESULT_LOADERS[doc_type][1](obj)
+        result['rank'] = score
+        results.append(result)
+    return results
+
+
+class SearchResults:
+    """
+    Ranked search results that load only the slice that is asked for.
+
+    Slicing ranks the hits up to the end of the slice and loads their
+    objects, so a Paginator page costs one query per type.
+    """
+
+    def __init__(self, total, rank):
+        """
+        Args:
+            total: The number of hits
+            rank: Callable taking (start, stop) and returning that slice of the
+                ranked hits as (type, pk, score) tuples
+        """
+        self.total = total
+        self.rank = rank
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop, _ = key.indices(self.total)
+        if start >= stop:
+            return []
+        return load_results(self.rank(start, stop))
+
+
+class SearchBackend:
+    """Interface of a search backend."""
+
+    def search(self, query, types=InvertedIndex.TYPES, filters=None):
+        """
+        Search the catalogue.
+
+        Args:
+            query: The search query
+            types: Document types to include
+            filters: Optional dict restricting hits by 'curriculum' code,
+                'class_level' ID and 'subject' slug
+
+        Returns:
+            A sliceable, countable sequence of result dicts in rank order
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def filter_queryset(doc_type, queryset, filters):
+        """Apply the search filters that make sense for a document type."""
+        lookups = FILTER_LOOKUPS[doc_type]
+        return queryset.filter(**{
+            lookups[name]: value
+            for name, value in (filters or {}).items()
+            if value and name in lookups
+        })
+
+
+class InvertedIndexBackend(SearchBackend):
+    """Search backend ranking the in-memory inverted index with BM25."""
+
+    def search(self, query, types=InvertedIndex.TYPES, filters=None):
+        index = InvertedIndex.get()
+
+        restrict = None
+        if any((filters or {}).values()):
+            restrict = {
+                doc_type: set(self.filter_queryset(
+                    doc_type, SEARCH_MODELS[doc_type].objects.all(), filters
+                ).values_list('pk', flat=True))
+                for doc_type in types
+            }
+
+        scores = index.score(query, types, restrict)
+        return SearchResults(len(scores), lambda start, stop: index.top(scores, start, stop))
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Search backend ranking the stored search vectors with PostgreSQL full-text search.
+
+    Matching uses the GIN index on search_vector; each type is ranked by one
+    LIMITed query and the per-type lists are merged.
+    """
+
+    @staticmethod
+    def is_available():
+        """Whether the default database is PostgreSQL."""
+        return connection.vendor == 'postgresql'
+
+    def search(self, query, types=InvertedIndex.TYPES, filters=None):
+        search_query = SearchQuery(query)
+        querysets = {
+            doc_type: self.filter_queryset(
+                doc_type,
+                SEARCH_MODELS[doc_type].objects.filter(is_active=True, search_vector=search_query),
+                filters
+            )
+            for doc_type in types
+        }
+
+        def rank(start, stop):
+            ranked = []
+            for doc_type, queryset in querysets.items():
+                rows = queryset.annotate(
+                    rank=SearchRank(F('search_vector'), search_query)
+                ).order_by('-rank', 'pk').values_list('pk', 'rank')[:stop]
+                ranked.extend((doc_type, pk, score) for pk, score in rows)
+            return heapq.nlargest(stop, ranked, key=itemgetter(2))[start:stop]
+
+        return SearchResults(sum(queryset.count() for queryset in querysets.values()), rank)
+
+
+def get_search_backend():
+    """Return an instance of the configured search backend."""
+    return import_string(getattr(settings, 'SEARCH_BACKEND', DEFAULT_BACKEND))()
@@ -0,0 +1,190 @@
+"""
+Inverted index for the search app.
+This module tokenises catalogue content and ranks it with BM25 from an
+in-memory inverted index kept per process.
+"""
+
+import heapq
+import html
+import math
+import threading
+from collections import Counter
+
+from django.utils.html import strip_tags
+
+from core.cache import ContentVersion
+from curriculum.models import Subject, Topic, Note
+from quiz.models import Question
+from quiz.validators import ShortAnswerValidator
+
+
+def tokenize(text):
+    """
+    Split text into index terms.
+
+    HTML is stripped, then the text goes through the same normalisation as
+    short answers: lowercase, no punctuation and no stop words.
+
+    Args:
+        text: The text to tokenise, plain or HTML
+
+    Returns:
+        A list of terms
+    """
+    if not text:
+        return []
+    return ShortAnswerValidator.normalize_text(html.unescape(strip_tags(text))).split()
+
+
+class SearchIndexVersion(ContentVersion):
+    """
+    Version number of the searchable content.
+
+    Bumped whenever a subject, topic, note or question changes, so every
+    process rebuilds its index on the next search.
+    """
+
+    CACHE_KEY = 'search:index_version'
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index of the active subjects, topics, notes and questions.
+
+    Each document is a (type, pk) pair. Titles count TITLE_WEIGHT times
+    towards term frequencies, bodies once. One index is built per process
+    and per SearchIndexVersion, and replaced on the first search after the
+    version is bumped.
+    """
+
+    TYPES = ('subject', 'topic', 'note', 'question')
+    TITLE_WEIGHT = 2
+
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+
+    _index = None
+    _lock = threading.Lock()
+
+    def __init__(self, version):
+        self.version = version
+        self.doc_types = []
+        self.doc_pks = []
+        self.doc_lengths = []
+        self.average_length = 0
+        self.postings = {}
+
+    @classmethod
+    def get(cls):
+        """
+        Get the index for the current version, building it on a miss.
+
+        Returns:
+            An InvertedIndex object
+        """
+        version = SearchIndexVersion.get()
+        index = cls._index
+        if index is not None and index.version == version:
+            return index
+
+        with cls._lock:
+            index = cls._index
+            if index is None or index.version != version:
+                index = cls.build(version)
+                cls._index = index
+        return index
+
+    @classmethod
+    def build(cls, version):
+        """Load and tokenise the searchable content from the database."""
+        index = cls(version)
+
+        for pk, name, description in Subject.objects.filter(
+            is_active=True
+        ).values_list('id', 'name', 'description').iterator():
+            index.add('subject', pk, name, description)
+
+        for pk, name, description in Topic.objects.filter(
+            is_active=True
+        ).values_list('id', 'name', 'description').iterator():
+            index.add('topic', pk, name, description)
+
+        for pk, title, content, extracted_text in Note.objects.filter(
+            is_active=True
+        ).values_list('id', 'title', 'content', 'extracted_text').iterator():
+            index.add('note', pk, title, content, extracted_text)
+
+        for pk, text, explanation in Question.objects.filter(
+            is_active=True
+        ).values_list('id', 'text', 'explanation').iterator():
+            index.add('question', pk, text, explanation)
+
+        index.average_length = (sum(index.doc_lengths) / len(index.doc_lengths)) if index.doc_lengths else 0
+        return index
+
+    @classmethod
+    def clear(cls):
+        """Drop the index held by this process."""
+        with cls._lock:
+            cls._index = None
+
+    def add(self, doc_type, pk, title, *bodies):
+        """Add a document to the index."""
+        terms = Counter()
+        for term in tokenize(title):
+            terms[term] += self.TITLE_WEIGHT
+        for body in bodies:
+            terms.update(tokenize(body))
+        if not terms:
+            return
+
+        doc = len(self.doc_pks)
+        self.doc_types.append(doc_type)
+        self.doc_pks.append(pk)
+        self.doc_lengths.append(sum(terms.values()))
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, []).append((doc, frequency))
+
+    def score(self, query, types=TYPES, restrict=None):
+        """
+        Score the documents matching a query with BM25.
+
+        Args:
+            query: The search query
+            types: Document types to include
+            restrict: Optional dict mapping each type to the set of IDs allowed
+
+        Returns:
+            A dict mapping document numbers to scores
+        """
+        types = set(types)
+        count = len(self.doc_pks)
+        scores = {}
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, frequency in postings:
+                doc_type = self.doc_types[doc]
+                if doc_type not in types:
+                    continue
+                if restrict is not None and self.doc_pks[doc] not in restrict[doc_type]:
+                    continue
+                norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[doc] / self.average_length)
+                scores[doc] = scores.get(doc, 0) + idf * frequency * (self.K1 + 1) / (frequency + norm)
+        return scores
+
+    def top(self, scores, start, stop):
+        """
+        Return the ranked hits from start to stop.
+
+        Only the best stop hits are ordered, with a heap.
+
+        Returns:
+            A list of (type, pk, score) tuples
+        """
+        best = heapq.nlargest(stop, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.doc_types[doc], self.doc_pks[doc], score) for doc, score in best[start:stop]]
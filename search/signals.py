@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from curriculum.models import Subject, Topic, Note
+from quiz.models import Question
+from .index import SearchIndexVersion
+from .vectors import update_search_vectors
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def searchable_content_changed(sender, instance, **kwargs):
+    """Move to a new search index version when searchable content changes."""
+    transaction.on_commit(SearchIndexVersion.bump)
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Topic)
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender=Question)
+def searchable_content_saved(sender, instance, using, **kwargs):
+    """Recompute the stored search vector of a saved subject, topic, note or question."""
+    update_search_vectors(sender, [instance.pk], using=using)
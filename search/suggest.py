@@ -0,0 +1,213 @@
+"""
+Typeahead suggestions for the search app.
+This module keeps a prefix trie of subject, topic and note titles in process
+memory and answers prefix queries from it.
+"""
+
+import threading
+from collections import namedtuple
+
+from django.urls import reverse
+
+from core.cache import ContentVersion
+from curriculum.cache import CurriculumTree
+from curriculum.models import Note
+from quiz.validators import PUNCTUATION_RE, STOP_WORDS, simple_tokenize
+from .index import tokenize
+
+Suggestion = namedtuple('Suggestion', ['type', 'title', 'words', 'curriculum_id', 'class_level_id', 'target'])
+
+
+class SuggestionTrie:
+    """
+    Prefix trie of the titles of active subjects, topics and published notes.
+
+    Every prefix of every title word, up to MAX_PREFIX characters, maps to
+    the suggestions containing that word. Suggestions are numbered subjects
+    first, then topics, then notes, each in catalogue order, so the list at
+    each node is already ranked.
+
+    One trie is built per process and per content version from the
+    CurriculumTree, and replaced on the first read after ContentVersion is
+    bumped.
+    """
+
+    MAX_PREFIX = 20
+
+    _trie = None
+    _lock = threading.Lock()
+
+    def __init__(self, version):
+        self.version = version
+        self.suggestions = []
+        # Each node is a (children, suggestion indexes) pair
+        self.root = ({}, [])
+
+    @classmethod
+    def get(cls):
+        """
+        Get the trie for the current content version, building it on a miss.
+
+        Returns:
+            A SuggestionTrie object
+        """
+        version = ContentVersion.get()
+        trie = cls._trie
+        if trie is not None and trie.version == version:
+            return trie
+
+        with cls._lock:
+            trie = cls._trie
+            if trie is None or trie.version != version:
+                trie = cls.build(version)
+                cls._trie = trie
+        return trie
+
+    @classmethod
+    def build(cls, version):
+        """Build the trie from the curriculum tree and the published note titles."""
+        tree = CurriculumTree.get()
+        trie = cls(version)
+
+        subjects = [subject for class_level in tree.class_levels_by_id.values()
+                    for subject in tree.subjects(class_level)]
+        for subject in subjects:
+            trie.add('subject', subject.name, subject.curriculum_id, subject.class_level_id, subject)
+
+        for subject in subjects:
+            for topic in subject.topics.all():
+                if tree.get_topic_by_id(topic.id) is not None:
+                    trie.add('topic', topic.name, subject.curriculum_id, subject.class_level_id, topic)
+
+        notes = Note.objects.filter(is_active=True, is_published=True).order_by(
+            'topic_id', 'order', 'title'
+        ).values_list('id', 'title', 'topic_id')
+        for note_id, title, topic_id in notes.iterator():
+            topic = tree.get_topic_by_id(topic_id)
+            if topic is not None:
+                trie.add('note', title, topic.subject.curriculum_id, topic.subject.class_level_id, (topic, note_id))
+
+        return trie
+
+    @classmethod
+    def clear(cls):
+        """Drop the trie held by this process."""
+        with cls._lock:
+            cls._trie = None
+
+    def add(self, suggestion_type, title, curriculum_id, class_level_id, target):
+        """
+        Add a title to the trie.
+
+        Args:
+            suggestion_type: 'subject', 'topic' or 'note'
+            title: The title to index
+            curriculum_id: The curriculum ID the title belongs to
+            class_level_id: The class level ID the title belongs to
+            target: The tree object the suggestion links to, or for notes a
+                (topic, note_id) pair
+        """
+        words = tuple(dict.fromkeys(tokenize(title)))
+        if not words:
+            return
+
+        index = len(self.suggestions)
+        self.suggestions.append(Suggestion(suggestion_type, title, words, curriculum_id, class_level_id, target))
+
+        seen = set()
+        for word in words:
+            node = self.root
+            for char in word[:self.MAX_PREFIX]:
+                node = node[0].setdefault(char, ({}, []))
+                # A prefix shared by two words of the title lists the title once
+                if id(node) not in seen:
+                    seen.add(id(node))
+                    node[1].append(index)
+
+    def lookup(self, prefix):
+        """Return the ranked suggestion indexes under a prefix."""
+        node = self.root
+        for char in prefix[:self.MAX_PREFIX]:
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return node[1]
+
+    def suggest(self, query, scope=None, limit=8):
+        """
+        Suggest titles for what has been typed so far.
+
+        Every word of the query must prefix a word of the title; stop words
+        are ignored except in the last, still incomplete, word.
+
+        Args:
+            query: The text typed so far
+            scope: None for unrestricted access, otherwise the
+                (curriculum_ids, class_level_ids) pair from
+                Entitlements.get_content_scope()
+            limit: Maximum number of suggestions
+
+        Returns:
+            A list of dicts with 'type', 'title', 'url' and 'context'
+        """
+        words = simple_tokenize(PUNCTUATION_RE.sub('', query.lower()))
+        if not words:
+            return []
+        words = [word for word in words[:-1] if word not in STOP_WORDS] + words[-1:]
+
+        # Walk the longest word, whose list is the shortest, and check the others
+        words.sort(key=len, reverse=True)
+        candidates = self.lookup(words[0])
+        # Words longer than the indexed prefixes are checked in full as well
+        others = words[1:] if len(words[0]) <= self.MAX_PREFIX else words
+
+        if scope is not None:
+            curriculum_ids, class_level_ids = set(scope[0]), set(scope[1])
+
+        results = []
+        for index in candidates:
+            suggestion = self.suggestions[index]
+            if scope is not None and (suggestion.curriculum_id not in curriculum_ids or
+                                      suggestion.class_level_id not in class_level_ids):
+                continue
+            if others and not all(any(word.startswith(other) for word in suggestion.words) for other in others):
+                continue
+            results.append(self.to_dict(suggestion))
+            if len(results) >= limit:
+                break
+        return results
+
+    @staticmethod
+    def to_dict(suggestion):
+        """Build the JSON-ready form of a suggestion, with its URL."""
+        if suggestion.type == 'subject':
+            subject = suggestion.target
+            return {
+                'type': 'subject',
+                'title': suggestion.title,
+                'url': subject.get_absolute_url(),
+                'context': f"{subject.curriculum.name} - {subject.class_level.name}",
+            }
+
+        if suggestion.type == 'topic':
+            topic = suggestion.target
+            return {
+                'type': 'topic',
+                'title': suggestion.title,
+                'url': topic.get_absolute_url(),
+                'context': topic.subject.name,
+            }
+
+        topic, note_id = suggestion.target
+        return {
+            'type': 'note',
+            'title': suggestion.title,
+            'url': reverse('quiz:study_mode', kwargs={
+                'curriculum_code': topic.subject.curriculum.code,
+                'class_level_id': topic.subject.class_level_id,
+                'subject_slug': topic.subject.slug,
+                'topic_slug': topic.slug,
+                'note_id': note_id,
+            }),
+            'context': f"{topic.subject.name} - {topic.name}",
+        }
@@ -0,0 +1,69 @@
+"""
+Stored search vectors for the search app.
+This module defines the full-text document of each searchable model and
+keeps its search_vector column current on PostgreSQL.
+"""
+
+from functools import reduce
+from operator import add
+
+from django.contrib.postgres.search import SearchVector
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, Func, TextField, Value
+
+
+class StripTags(Func):
+    """Replace HTML tags in a text column with spaces, in the database."""
+
+    function = 'REGEXP_REPLACE'
+    output_field = TextField()
+
+    def __init__(self, expression, **extra):
+        super().__init__(F(expression), Value('<[^>]*>'), Value(' '), Value('g'), **extra)
+
+
+# Per model label, the weighted parts of its full-text document
+SEARCH_DOCUMENTS = {
+    'curriculum.Subject': (('name', 'A'), ('description', 'B')),
+    'curriculum.Topic': (('name', 'A'), ('description', 'B')),
+    'curriculum.Note': (('title', 'A'), (lambda: StripTags('content'), 'B'), ('extracted_text', 'C')),
+    'quiz.Question': (('text', 'A'), ('explanation', 'B')),
+}
+
+
+def search_vector(label):
+    """
+    Build the search vector expression of a model.
+
+    Args:
+        label: The model label, e.g. 'curriculum.Note'
+
+    Returns:
+        A SearchVector expression
+    """
+    return reduce(add, [
+        SearchVector(part() if callable(part) else part, weight=weight)
+        for part, weight in SEARCH_DOCUMENTS[label]
+    ])
+
+
+def update_search_vectors(model, pks=None, using=DEFAULT_DB_ALIAS):
+    """
+    Recompute the stored search vectors of a model in one UPDATE.
+
+    Does nothing on databases other than PostgreSQL.
+
+    Args:
+        model: The model class, which may be a historical model in migrations
+        pks: IDs of the rows to update, or None for every row
+        using: The database alias
+
+    Returns:
+        The number of rows updated
+    """
+    if connections[using].vendor != 'postgresql':
+        return 0
+    queryset = model._default_manager.using(using)
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+    return queryset.update(search_vector=search_vector(model._meta.label))
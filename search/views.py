@@ -1,10 +1,15 @@
 from django.shortcuts import render
-from django.db.models import Q
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
 from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 
-from curriculum.models import Subject, Topic, Note
-from quiz.models import Question
+from curriculum.models import Curriculum, ClassLevel, Subject
+from subscription.entitlements import get_entitlements
+from .backends import SEARCH_TYPES, PostgresSearchBackend, get_search_backend
+from .suggest import SuggestionTrie
+
+# Upper bound on the number of typeahead suggestions a caller may ask for
+MAX_SUGGESTIONS = 20
 
 
 def search(request):
@@ -17,87 +22,10 @@ def search(request):
     total_count = 0
 
     if query:
-        if search_type == 'all' or search_type == 'subjects':
-            # Search subjects
-            subjects = Subject.objects.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query)
-            ).filter(is_active=True)
-
-            for subject in subjects:
-                results.append({
-                    'type': 'subject',
-                    'title': subject.name,
-                    'description': subject.description,
-                    'url': subject.get_absolute_url(),
-                    'curriculum': subject.curriculum.name,
-                    'class_level': subject.class_level.name,
-                })
-
-            total_count += subjects.count()
-
-        if search_type == 'all' or search_type == 'topics':
-            # Search topics
-            topics = Topic.objects.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query)
-            ).filter(is_active=True)
-
-            for topic in topics:
-                results.append({
-                    'type': 'topic',
-                    'title': topic.name,
-                    'description': topic.description,
-                    'url': topic.get_absolute_url(),
-                    'subject': topic.subject.name,
-                    'curriculum': topic.subject.curriculum.name,
-                    'class_level': topic.subject.class_level.name,
-                })
-
-            total_count += topics.count()
-
-        if search_type == 'all' or search_type == 'notes':
-            # Search notes
-            notes = Note.objects.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query)
-            ).filter(is_active=True)
-
-            for note in notes:
-                results.append({
-                    'type': 'note',
-                    'title': note.title,
-                    'description': note.content[:200] + '...' if len(note.content) > 200 else note.content,
-                    'url': note.get_absolute_url(),
-                    'topic': note.topic.name,
-                    'subject': note.topic.subject.name,
-                })
-
-            total_count += notes.count()
-
-        if search_type == 'all' or search_type == 'questions':
-            # Search questions
-            questions = Question.objects.filter(
-                Q(text__icontains=query)
-            ).filter(is_active=True)
+        results = get_search_backend().search(query, SEARCH_TYPES.get(search_type, SEARCH_TYPES['all']))
+        total_count = results.count()
 
-            for question in questions:
-                results.append({
-                    'type': 'question',
-                    'title': f"Question: {question.text[:100]}...",
-                    'description': question.explanation[:200] + '...' if len(question.explanation) > 200 else question.explanation,
-                    'url': f"/quiz/question/{question.id}/",
-                    'subject': question.subject.name,
-                    'topic': question.topic.name if question.topic else '',
-                })
-
-            total_count += questions.count()
-
-    # Sort results by relevance (simple implementation)
-    # In a real implementation, you might want to use more sophisticated ranking
-    results.sort(key=lambda x: query.lower() in x['title'].lower(), reverse=True)
-
-    # Paginate results
+    # Paginate results; only the current page's rows are loaded
     paginator = Paginator(results, 10)  # Show 10 results per page
     page_obj = paginator.get_page(page)
 
@@ -124,129 +52,24 @@ def advanced_search(request):
     total_count = 0
 
     if query:
-        search_query = SearchQuery(query)
-
-        if search_type == 'all' or search_type == 'subjects':
-            # Search subjects with full-text search
-            subject_vector = SearchVector('name', weight='A') + SearchVector('description', weight='B')
-            subjects = Subject.objects.annotate(
-                rank=SearchRank(subject_vector, search_query)
-            ).filter(rank__gt=0).filter(is_active=True).order_by('-rank')
-
-            # Apply filters
-            if curriculum:
-                subjects = subjects.filter(curriculum__code=curriculum)
-            if class_level:
-                subjects = subjects.filter(class_level__id=class_level)
-
-            for subject in subjects:
-                results.append({
-                    'type': 'subject',
-                    'title': subject.name,
-                    'description': subject.description,
-                    'url': subject.get_absolute_url(),
-                    'curriculum': subject.curriculum.name,
-                    'class_level': subject.class_level.name,
-                    'rank': subject.rank,
-                })
-
-            total_count += subjects.count()
-
-        if search_type == 'all' or search_type == 'topics':
-            # Search topics with full-text search
-            topic_vector = SearchVector('name', weight='A') + SearchVector('description', weight='B')
-            topics = Topic.objects.annotate(
-                rank=SearchRank(topic_vector, search_query)
-            ).filter(rank__gt=0).filter(is_active=True).order_by('-rank')
-
-            # Apply filters
-            if curriculum:
-                topics = topics.filter(subject__curriculum__code=curriculum)
-            if class_level:
-                topics = topics.filter(subject__class_level__id=class_level)
-            if subject:
-                topics = topics.filter(subject__slug=subject)
-
-            for topic in topics:
-                results.append({
-                    'type': 'topic',
-                    'title': topic.name,
-                    'description': topic.description,
-                    'url': topic.get_absolute_url(),
-                    'subject': topic.subject.name,
-                    'curriculum': topic.subject.curriculum.name,
-                    'class_level': topic.subject.class_level.name,
-                    'rank': topic.rank,
-                })
-
-            total_count += topics.count()
-
-        if search_type == 'all' or search_type == 'notes':
-            # Search notes with full-text search
-            note_vector = SearchVector('title', weight='A') + SearchVector('content', weight='B')
-            notes = Note.objects.annotate(
-                rank=SearchRank(note_vector, search_query)
-            ).filter(rank__gt=0).filter(is_active=True).order_by('-rank')
-
-            # Apply filters
-            if curriculum:
-                notes = notes.filter(topic__subject__curriculum__code=curriculum)
-            if class_level:
-                notes = notes.filter(topic__subject__class_level__id=class_level)
-            if subject:
-                notes = notes.filter(topic__subject__slug=subject)
-
-            for note in notes:
-                results.append({
-                    'type': 'note',
-                    'title': note.title,
-                    'description': note.content[:200] + '...' if len(note.content) > 200 else note.content,
-                    'url': note.get_absolute_url(),
-                    'topic': note.topic.name,
-                    'subject': note.topic.subject.name,
-                    'rank': note.rank,
-                })
-
-            total_count += notes.count()
-
-        if search_type == 'all' or search_type == 'questions':
-            # Search questions with full-text search
-            question_vector = SearchVector('text', weight='A') + SearchVector('explanation', weight='B')
-            questions = Question.objects.annotate(
-                rank=SearchRank(question_vector, search_query)
-            ).filter(rank__gt=0).filter(is_active=True).order_by('-rank')
-
-            # Apply filters
-            if curriculum:
-                questions = questions.filter(curriculum__code=curriculum)
-            if class_level:
-                questions = questions.filter(class_level__id=class_level)
-            if subject:
-                questions = questions.filter(subject__slug=subject)
-
-            for question in questions:
-                results.append({
-                    'type': 'question',
-                    'title': f"Question: {question.text[:100]}...",
-                    'description': question.explanation[:200] + '...' if len(question.explanation) > 200 else question.explanation,
-                    'url': f"/quiz/question/{question.id}/",
-                    'subject': question.subject.name,
-                    'topic': question.topic.name if question.topic else '',
-                    'rank': question.rank,
-                })
-
-            total_count += questions.count()
-
-    # Sort results by rank
-    results.sort(key=lambda x: x.get('rank', 0), reverse=True)
-
-    # Paginate results
+        # Stored search vectors need PostgreSQL; other databases use the configured backend
+        if PostgresSearchBackend.is_available():
+            backend = PostgresSearchBackend()
+        else:
+            backend = get_search_backend()
+
+        results = backend.search(
+            query,
+            SEARCH_TYPES.get(search_type, SEARCH_TYPES['all']),
+            filters={'curriculum': curriculum, 'class_level': class_level, 'subject': subject}
+        )
+        total_count = results.count()
+
+    # Paginate results; only the current page's rows are loaded
     paginator = Paginator(results, 10)  # Show 10 results per page
     page_obj = paginator.get_page(page)
 
     # Get data for filter dropdowns
-    from curriculum.models import Curriculum, ClassLevel, Subject
-
     curricula = Curriculum.objects.filter(is_active=True)
     class_levels = ClassLevel.objects.filter(is_active=True)
     subjects = Subject.objects.filter(is_active=True)
@@ -265,3 +88,22 @@ def advanced_search(request):
     }
 
     return render(request, 'search/advanced_search.html', context)
+
+
+@require_GET
+def suggest(request):
+    """JSON endpoint with typeahead suggestions for the text typed so far."""
+    query = request.GET.get('q', '').strip()
+
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), MAX_SUGGESTIONS)
+    except ValueError:
+        limit = 8
+
+    suggestions = []
+    if query:
+        # Only suggest content the caller may browse
+        scope = get_entitlements(request).get_content_scope()
+        suggestions = SuggestionTrie.get().suggest(query, scope, limit)
+
+    return JsonResponse({'query': query, 'suggestions': suggestions})
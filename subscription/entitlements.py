@@ -0,0 +1,339 @@
+"""
+Entitlements for the subscription app.
+This module resolves what a user may access once per request and caches it per user.
+"""
+
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Subscription, SubscriptionPlan, CurriculumAccess
+
+
+class FreeTierCatalogue:
+    """
+    The (curriculum_id, class_level_id) pairs that make up the free tier.
+
+    The free tier is defined by the curriculum accesses of subscriptions on the
+    free plan, in the order they were created. The pairs are kept in process
+    memory for a short time and in the shared cache until a plan, subscription
+    or curriculum access changes.
+    """
+
+    CACHE_KEY = 'subscription:free_tier'
+    CACHE_TIMEOUT = 60 * 60 * 24
+    LOCAL_TIMEOUT = 30
+
+    _pairs = None
+    _expires_at = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_pairs(cls):
+        """
+        Get the free-tier pairs, loading them on a miss.
+
+        Returns:
+            A tuple of (curriculum_id, class_level_id) pairs
+        """
+        pairs = cls._pairs
+        if pairs is not None and time.monotonic() < cls._expires_at:
+            return pairs
+
+        pairs = cache.get(cls.CACHE_KEY)
+        if pairs is None:
+            pairs = cls.build()
+            cache.set(cls.CACHE_KEY, pairs, cls.CACHE_TIMEOUT)
+
+        with cls._lock:
+            cls._pairs = pairs
+            cls._expires_at = time.monotonic() + cls.LOCAL_TIMEOUT
+        return pairs
+
+    @staticmethod
+    def build():
+        """Load the free-tier pairs from the database."""
+        free_plan = SubscriptionPlan.objects.filter(plan_type='free').first()
+        if not free_plan:
+            return ()
+
+        # Every free subscriber has access rows; group them so each pair comes back once, in first-seen order
+        return tuple(CurriculumAccess.objects.filter(
+            subscription__plan=free_plan
+        ).values_list('curriculum_id', 'class_level_id').annotate(
+            first_id=Min('id')
+        ).order_by('first_id').values_list('curriculum_id', 'class_level_id'))
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the free-tier pairs from the shared cache and this process."""
+        cache.delete(cls.CACHE_KEY)
+        with cls._lock:
+            cls._pairs = None
+            cls._expires_at = 0
+
+
+class Entitlements:
+    """
+    Snapshot of a user's access: their active subscription, plan flags and
+    accessible (curriculum, class level) pairs.
+
+    Access checks take IDs and answer from in-memory sets.
+    """
+
+    CACHE_PREFIX = 'subscription:entitlements'
+    CACHE_TIMEOUT = 60 * 60
+
+    def __init__(self, user_id=None, is_staff=False, subscription_id=None, plan_type=None,
+                 all_curriculums=False, all_grade_levels=False, start_date=None, end_date=None,
+                 access_pairs=()):
+        self.user_id = user_id
+        self.is_staff = is_staff
+        self.subscription_id = subscription_id
+        self.plan_type = plan_type
+        self.all_curriculums = all_curriculums
+        self.all_grade_levels = all_grade_levels
+        self.start_date = start_date
+        self.end_date = end_date
+        self.access_pairs = tuple(access_pairs)
+        self._access_pair_set = set(self.access_pairs)
+        self._subscription = None
+        self._free_pairs = None
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        Get the entitlements for a user, using the per-user cache.
+
+        Args:
+            user: The User object, or an anonymous user
+
+        Returns:
+            An Entitlements object
+        """
+        if not user.is_authenticated:
+            return cls()
+
+        key = cls.make_key(user.pk)
+        data = cache.get(key)
+        if data is None:
+            data = cls.build(user).to_dict()
+            cache.set(key, data, cls.CACHE_TIMEOUT)
+        return cls.from_dict(data)
+
+    @classmethod
+    def build(cls, user):
+        """Load a user's entitlements from the database."""
+        subscription = Subscription.objects.filter(
+            user=user,
+            status='active',
+            end_date__gt=timezone.now()
+        ).select_related('plan').first()
+
+        if not subscription:
+            return cls(user_id=user.pk, is_staff=user.is_staff or user.is_superuser)
+
+        entitlements = cls(
+            user_id=user.pk,
+            is_staff=user.is_staff or user.is_superuser,
+            subscription_id=subscription.id,
+            plan_type=subscription.plan.plan_type,
+            all_curriculums=subscription.plan.all_curriculums,
+            all_grade_levels=subscription.plan.all_grade_levels,
+            start_date=subscription.start_date,
+            end_date=subscription.end_date,
+            access_pairs=subscription.curriculum_accesses.order_by('id').values_list('curriculum_id', 'class_level_id'),
+        )
+        entitlements._subscription = subscription
+        return entitlements
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'is_staff': self.is_staff,
+            'subscription_id': self.subscription_id,
+            'plan_type': self.plan_type,
+            'all_curriculums': self.all_curriculums,
+            'all_grade_levels': self.all_grade_levels,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'access_pairs': list(self.access_pairs),
+        }
+
+    @classmethod
+    def make_key(cls, user_id):
+        return f"{cls.CACHE_PREFIX}:{user_id}"
+
+    @classmethod
+    def invalidate(cls, user_id):
+        """
+        Drop the cached entitlements for a user.
+
+        Args:
+            user_id: The ID of the user
+        """
+        cache.delete(cls.make_key(user_id))
+
+    @classmethod
+    def invalidate_many(cls, user_ids):
+        """
+        Drop the cached entitlements for several users at once.
+
+        Args:
+            user_ids: Iterable of user IDs
+        """
+        cache.delete_many([cls.make_key(user_id) for user_id in user_ids])
+
+    @property
+    def has_subscription(self):
+        """Whether the user has a subscription that is active right now."""
+        if self.subscription_id is None:
+            return False
+        now = timezone.now()
+        return self.start_date <= now < self.end_date
+
+    @property
+    def subscription(self):
+        """The active Subscription object, loaded on first use."""
+        if not self.has_subscription:
+            return None
+        if self._subscription is None:
+            self._subscription = Subscription.objects.select_related('plan').filter(
+                pk=self.subscription_id
+            ).first()
+        return self._subscription
+
+    @property
+    def accessible_curriculum_ids(self):
+        """IDs of the curricula the subscription grants access to, in access order."""
+        return list(dict.fromkeys(curriculum_id for curriculum_id, _ in self.access_pairs))
+
+    @property
+    def accessible_class_level_ids(self):
+        """IDs of the class levels the subscription grants access to, in access order."""
+        return list(dict.fromkeys(class_level_id for _, class_level_id in self.access_pairs))
+
+    @property
+    def free_pairs(self):
+        """The (curriculum_id, class_level_id) pairs of the free tier."""
+        if self._free_pairs is None:
+            self._free_pairs = FreeTierCatalogue.get_pairs()
+        return self._free_pairs
+
+    @property
+    def free_curriculum_ids(self):
+        """IDs of the curricula in the free tier, in access order."""
+        return list(dict.fromkeys(curriculum_id for curriculum_id, _ in self.free_pairs))
+
+    @property
+    def free_class_level_ids(self):
+        """IDs of the class levels in the free tier, in access order."""
+        return list(dict.fromkeys(class_level_id for _, class_level_id in self.free_pairs))
+
+    @property
+    def free_sample(self):
+        """The first free-tier (curriculum_id, class_level_id) pair, or (None, None)."""
+        return self.free_pairs[0] if self.free_pairs else (None, None)
+
+    @property
+    def cache_class(self):
+        """
+        Label shared by every user who is shown the same catalogue.
+
+        Cached pages and template fragments vary on this label instead of on
+        the user: 'anonymous', 'staff', 'free' with a hash of the free tier, or
+        the plan type with a hash of the plan flags and accessible pairs.
+        """
+        if self.user_id is None:
+            return 'anonymous'
+        if self.is_staff:
+            return 'staff'
+        if not self.has_subscription:
+            return f"free:{self._digest(self.free_pairs)}"
+        scope = (self.all_curriculums, self.all_grade_levels, sorted(self._access_pair_set, key=repr))
+        return f"{self.plan_type}:{self._digest(scope)}"
+
+    @staticmethod
+    def _digest(value):
+        return hashlib.blake2b(repr(value).encode(), digest_size=8).hexdigest()
+
+    def get_content_scope(self):
+        """
+        Get the curricula and class levels the user may browse.
+
+        Returns:
+            None when browsing is unrestricted (staff and all-curriculum plans),
+            otherwise a (curriculum_ids, class_level_ids) pair of lists taken from
+            the subscription or, without one, from the free tier
+        """
+        if self.is_staff or (self.has_subscription and self.all_curriculums):
+            return None
+        if self.has_subscription:
+            return self.accessible_curriculum_ids, self.accessible_class_level_ids
+        return self.free_curriculum_ids, self.free_class_level_ids
+
+    def free_class_level_id_for(self, curriculum_id):
+        """Return the first free-tier class level ID within a curriculum, or None."""
+        for free_curriculum_id, class_level_id in self.free_pairs:
+            if free_curriculum_id == curriculum_id:
+                return class_level_id
+        return None
+
+    def is_free_sample(self, curriculum_id, class_level_id):
+        """Check if a curriculum and class level are the free-tier sample content."""
+        free_curriculum_id, free_class_level_id = self.free_sample
+        return (
+            free_curriculum_id is not None and free_class_level_id is not None and
+            free_curriculum_id == curriculum_id and free_class_level_id == class_level_id
+        )
+
+    def has_access_to_curriculum(self, curriculum_id):
+        """Check if the subscription grants access to a curriculum."""
+        if self.is_staff:
+            return True
+        if not self.has_subscription:
+            return False
+        if self.all_curriculums:
+            return True
+        return any(access_curriculum_id == curriculum_id for access_curriculum_id, _ in self.access_pairs)
+
+    def has_access_to_class_level(self, curriculum_id, class_level_id):
+        """Check if the subscription grants access to a class level within a curriculum."""
+        if self.is_staff:
+            return True
+        if not self.has_access_to_curriculum(curriculum_id):
+            return False
+        if self.all_grade_levels:
+            return True
+        return (
+            (curriculum_id, class_level_id) in self._access_pair_set or
+            (curriculum_id, None) in self._access_pair_set
+        )
+
+
+def get_entitlements(request):
+    """
+    Get the entitlements for the current request, resolving them at most once.
+
+    Args:
+        request: The HttpRequest object
+
+    Returns:
+        An Entitlements object
+    """
+    entitlements = getattr(request, '_entitlements', None)
+    if entitlements is None:
+        if request.user.is_authenticated:
+            entitlements = request.user.get_entitlements()
+        else:
+            entitlements = Entitlements.for_user(request.user)
+        request._entitlements = entitlements
+    return entitlements
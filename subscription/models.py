@@ -170,6 +170,12 @@ class Subscription(models.Model):
         delta = self.end_date - timezone.now()
         return max(0, delta.days)
 
+    def get_access_pairs(self):
+        """Get the (curriculum_id, class_level_id) pairs granted by this subscription, loaded once per instance."""
+        if not hasattr(self, '_access_pairs'):
+            self._access_pairs = set(self.curriculum_accesses.values_list('curriculum_id', 'class_level_id'))
+        return self._access_pairs
+
     def has_access_to_curriculum(self, curriculum):
         """Check if the subscription has access to a specific curriculum."""
         if not self.is_active:
@@ -180,7 +186,7 @@ class Subscription(models.Model):
             return True
 
         # Check if there's a specific access for this curriculum
-        return self.curriculum_accesses.filter(curriculum=curriculum).exists()
+        return any(curriculum_id == curriculum.id for curriculum_id, _ in self.get_access_pairs())
 
     def has_access_to_class_level(self, curriculum, class_level):
         """Check if the subscription has access to a specific class level within a curriculum."""
@@ -196,13 +202,8 @@ class Subscription(models.Model):
             return True
 
         # Check if there's a specific access for this class level
-        return self.curriculum_accesses.filter(
-            curriculum=curriculum,
-            class_level=class_level
-        ).exists() or self.curriculum_accesses.filter(
-            curriculum=curriculum,
-            class_level=None
-        ).exists()
+        access_pairs = self.get_access_pairs()
+        return (curriculum.id, class_level.id) in access_pairs or (curriculum.id, None) in access_pairs
 
     def has_access_to_content(self, note):
         """Check if the subscription has access to a specific note."""
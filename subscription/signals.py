@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import SubscriptionPlan, Subscription, CurriculumAccess, Payment
+from .entitlements import Entitlements, FreeTierCatalogue
+
+
+def invalidate_entitlements_for_subscription(subscription_id):
+    """Drop the cached entitlements of the user owning a subscription once the transaction commits."""
+    user_id = Subscription.objects.filter(pk=subscription_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        transaction.on_commit(lambda: Entitlements.invalidate(user_id))
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    """Refresh a user's entitlements and the free tier when a subscription changes."""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: Entitlements.invalidate(user_id))
+    transaction.on_commit(FreeTierCatalogue.invalidate)
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def subscription_plan_changed(sender, instance, **kwargs):
+    """Refresh the free tier and the entitlements of the plan's subscribers when a subscription plan changes."""
+    # The cached entitlements carry the plan flags of each subscriber
+    user_ids = list(Subscription.objects.filter(plan_id=instance.pk).values_list('user_id', flat=True).distinct())
+    if user_ids:
+        transaction.on_commit(lambda: Entitlements.invalidate_many(user_ids))
+    transaction.on_commit(FreeTierCatalogue.invalidate)
+
+
+@receiver(post_save, sender=CurriculumAccess)
+@receiver(post_delete, sender=CurriculumAccess)
+def curriculum_access_changed(sender, instance, **kwargs):
+    """Refresh a user's entitlements and the free tier when a curriculum access is granted or removed."""
+    invalidate_entitlements_for_subscription(instance.subscription_id)
+    transaction.on_commit(FreeTierCatalogue.invalidate)
+
+
+@receiver(post_save, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    """Refresh a user's entitlements when a payment for their subscription changes."""
+    invalidate_entitlements_for_subscription(instance.subscription_id)